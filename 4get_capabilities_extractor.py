@@ -1,28 +1,225 @@
 import os
 import re
+import sys
 import json
+import time
+import hashlib
+import argparse
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
 
 SCRAPER_DIR = "4get-repo/scraper"
 OUTPUT_FILE = "4get_engine_specs.json"
+CACHE_FILE = ".4get_specs_cache.json"
+
+# Bump when the analysis changes so cached specs from older runs are recomputed
+EXTRACTOR_VERSION = 2
 
 # --- Regex Patterns ---
 GET_PARAM_REGEX = re.compile(r'\$get\s*\[\s*["\']([a-zA-Z0-9_]+)["\']\s*\]')
 FILTER_PARAM_REGEX = re.compile(r'^\s*["\']([a-zA-Z0-9_]+)["\']\s*=>\s*\[', re.MULTILINE)
 FUNCTION_REGEX = re.compile(r"function\s+([a-zA-Z0-9_]+)\s*\(")
 
-# --- Helpers ---
+# One pass over a scraper: comments and strings are consumed whole so braces inside them never count.
+# Group names double as token kinds.
+PHP_TOKEN_REGEX = re.compile(
+    r"""
+      (?P<comment>//[^\n]*|\#(?!\[)[^\n]*|/\*.*?\*/)
+    | (?P<heredoc><<<[ \t]*(?P<q>['"]?)(?P<tag>[A-Za-z_][A-Za-z0-9_]*)(?P=q)\r?\n.*?\n[ \t]*(?P=tag)\b)
+    | (?P<string>'(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*")
+    | (?P<function>\bfunction\s+(?P<name>[a-zA-Z0-9_]+)\s*\()
+    | (?P<open>\{)
+    | (?P<close>\})
+    """,
+    re.DOTALL | re.IGNORECASE | re.VERBOSE,
+)
+
+KNOWN_FIELDS = ["title", "url", "description", "thumb", "date", "duration", "views", "author", "source"]
+FIELD_REGEXES = {
+    field: re.compile(r'["\']' + field + r'["\']\s*=>\s*([^,;\]]+)')
+    for field in KNOWN_FIELDS
+}
+NULL_URL_REGEX = re.compile(r'["\']url["\']\s*=>\s*null', re.IGNORECASE)
+
+METHOD_MAP = {
+    "web": ["web", "image", "video", "news"],
+    "image": ["image"],
+    "video": ["video", "livestream", "reel"],
+    "news": ["news"],
+    "music": ["song", "album", "playlist", "podcast"]
+}
+
+# --- Tokenizer ---
+
+class FunctionIndex:
+    """Every named function body in one PHP file, found in a single tokenizer pass."""
+
+    def __init__(self, content):
+        self.content = content
+        self.spans = {}       # lowercased name -> (body_start, body_end), first definition wins
+        self.comments = []    # (start, end) of every comment, in file order
+        self._bodies = {}
+        self._scan()
+
+    def _scan(self):
+        stack = []            # one entry per open brace: function name or None
+        pending = None
+        for match in PHP_TOKEN_REGEX.finditer(self.content):
+            kind = match.lastgroup
+            if kind == "comment":
+                self.comments.append(match.span())
+            elif kind == "function":
+                pending = match.group("name").lower()
+            elif kind == "open":
+                stack.append((pending, match.end()))
+                pending = None
+            elif kind == "close" and stack:
+                name, start = stack.pop()
+                if name is not None and name not in self.spans:
+                    self.spans[name] = (start, match.start())
+        # unbalanced file: like the brace walker, an unclosed body runs to EOF
+        for name, start in stack:
+            if name is not None and name not in self.spans:
+                self.spans[name] = (start, len(self.content))
+
+    def body(self, name):
+        """Function body with comments removed, or None if the file doesn't define it."""
+        name = name.lower()
+        if name in self._bodies:
+            return self._bodies[name]
+        span = self.spans.get(name)
+        if span is None:
+            return None
+
+        start, end = span
+        parts = []
+        cursor = start
+        for c_start, c_end in self.comments[bisect_left(self.comments, (start, start)):]:
+            if c_start >= end:
+                break
+            parts.append(self.content[cursor:c_start])
+            cursor = min(c_end, end)
+        parts.append(self.content[cursor:end])
+
+        body = "".join(parts)
+        self._bodies[name] = body
+        return body
+
+# --- Analysis ---
+
+def analyze_inputs(content, index):
+    inputs = set(GET_PARAM_REGEX.findall(content))
+
+    getfilters_body = index.body("getfilters")
+    if getfilters_body:
+        inputs.update(FILTER_PARAM_REGEX.findall(getfilters_body))
+
+    return sorted(inputs)
+
+def derive_capabilities(inputs):
+    caps = {
+        "paging": False,
+        "time": False,
+        "nsfw": False,
+        "language": False,
+        "country": False
+    }
+
+    if "npt" in inputs or "offset" in inputs or "cursor" in inputs:
+        caps["paging"] = True
+    if "time" in inputs or "date" in inputs or "newer" in inputs or "older" in inputs:
+        caps["time"] = True
+    if "nsfw" in inputs or "safe" in inputs or "safesearch" in inputs:
+        caps["nsfw"] = True
+    if "country" in inputs or "region" in inputs:
+        caps["country"] = True
+    if "lang" in inputs or "language" in inputs:
+        caps["language"] = True
+
+    return caps
+
+def analyze_outputs(index):
+    outputs = {}
+
+    for func_name, possible_categories in METHOD_MAP.items():
+        body = index.body(func_name)
+        if not body:
+            continue
+
+        # field verdicts depend only on the body, the category just gates them
+        fields = None
+        for category in possible_categories:
+            if f'"{category}"' not in body and f"'{category}'" not in body:
+                continue
+            if fields is None:
+                fields = analyze_fields(body)
+            if fields:
+                if category not in outputs:
+                    outputs[category] = dict(fields)
+                else:
+                    outputs[category].update(fields)
+
+    return outputs
+
+def _is_real_value(body, field, match):
+    """Whether one `"field" => value` assignment sets something other than null/empty."""
+    val = match.group(1).strip().lower()
+    if val in ('null', '[]', 'array()'):
+        return False
+    if field == "thumb" and val.startswith('['):
+        snippet_start = match.end()
+        if NULL_URL_REGEX.search(body, snippet_start, snippet_start + 200):
+            return False
+    return True
+
+def analyze_fields(body):
+    fields = {}
+
+    for field, regex in FIELD_REGEXES.items():
+        found_any = False
+        is_supported = False
+
+        # false means never set: scrapers start fields out null and fill them in later
+        for match in regex.finditer(body):
+            found_any = True
+            if _is_real_value(body, field, match):
+                is_supported = True
+
+        if found_any:
+            fields[field] = is_supported
+
+    return fields
+
+def analyze_content(content):
+    index = FunctionIndex(content)
+    inputs = analyze_inputs(content, index)
+    return {
+        "inputs": inputs,
+        "capabilities": derive_capabilities(inputs),
+        "outputs": analyze_outputs(index)
+    }
+
+def analyze_file(filepath):
+    """Process-pool entry point: (spec, error)."""
+    try:
+        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
+            return analyze_content(f.read()), None
+    except Exception as e:
+        return None, str(e)
+
+# --- Legacy (reference implementation, kept for --timing) ---
 
 def extract_function_body(content, function_name):
     pattern = r"function\s+" + re.escape(function_name) + r"\s*\("
     match = re.search(pattern, content, re.IGNORECASE)
     if not match:
         return None
-    
+
     start_index = match.end()
     open_brace_index = content.find('{', start_index)
     if open_brace_index == -1:
         return None
-        
+
     brace_count = 1
     current_index = open_brace_index + 1
     while brace_count > 0 and current_index < len(content):
@@ -30,16 +227,16 @@ def extract_function_body(content, function_name):
         if char == '{': brace_count += 1
         elif char == '}': brace_count -= 1
         current_index += 1
-        
+
     body = content[open_brace_index+1:current_index-1]
-    
+
     # Strip comments to prevent false positives
     body = re.sub(r'//.*', '', body)
     body = re.sub(r'/\*.*?\*/', '', body, flags=re.DOTALL)
-    
+
     return body
 
-def analyze_inputs(content):
+def legacy_analyze_inputs(content):
     inputs = set()
     matches = GET_PARAM_REGEX.findall(content)
     for m in matches:
@@ -50,46 +247,17 @@ def analyze_inputs(content):
         filter_matches = FILTER_PARAM_REGEX.findall(getfilters_body)
         for m in filter_matches:
             inputs.add(m)
-            
-    return sorted(list(inputs))
 
-def derive_capabilities(inputs):
-    caps = {
-        "paging": False,
-        "time": False,
-        "nsfw": False,
-        "language": False,
-        "country": False
-    }
-    
-    if "npt" in inputs or "offset" in inputs or "cursor" in inputs:
-        caps["paging"] = True
-    if "time" in inputs or "date" in inputs or "newer" in inputs or "older" in inputs:
-        caps["time"] = True
-    if "nsfw" in inputs or "safe" in inputs or "safesearch" in inputs:
-        caps["nsfw"] = True
-    if "country" in inputs or "region" in inputs:
-        caps["country"] = True
-    if "lang" in inputs or "language" in inputs:
-        caps["language"] = True
-        
-    return caps
+    return sorted(list(inputs))
 
-def analyze_outputs(content):
+def legacy_analyze_outputs(content):
     outputs = {}
-    method_map = {
-        "web": ["web", "image", "video", "news"],
-        "image": ["image"],
-        "video": ["video", "livestream", "reel"],
-        "news": ["news"],
-        "music": ["song", "album", "playlist", "podcast"]
-    }
 
-    for func_name, possible_categories in method_map.items():
+    for func_name, possible_categories in METHOD_MAP.items():
         body = extract_function_body(content, func_name)
         if not body:
             continue
-            
+
         for category in possible_categories:
             fields = analyze_output_assignment(body, category)
             if fields:
@@ -97,82 +265,201 @@ def analyze_outputs(content):
                     outputs[category] = fields
                 else:
                     outputs[category].update(fields)
-                    
+
     return outputs
 
 def analyze_output_assignment(body, category):
     if f'"{category}"' not in body and f"'{category}'" not in body:
         return None
-        
+
     fields = {}
-    known_fields = ["title", "url", "description", "thumb", "date", "duration", "views", "author", "source"]
-    
-    for field in known_fields:
+
+    for field in KNOWN_FIELDS:
         # We look for "field" => ...
         # and try to check if it's set to null
-        
+
         # Regex to find the key assignment
         # Matches: "title" =>
         pattern = r'["\']' + field + r'["\']\s*=>\s*([^,;\]]+)'
         matches = re.finditer(pattern, body)
-        
+
         found_any = False
-        is_supported = True
-        
+        is_supported = False
+
         for match in matches:
             found_any = True
-            val = match.group(1).strip().lower()
-            
-            if val == 'null':
-                is_supported = False
-            elif val == '[]' or val == 'array()':
-                is_supported = False
-            
-            if field == "thumb" and val.startswith('['):
-                snippet_start = match.end()
-                snippet = body[snippet_start:snippet_start+200]
-                if re.search(r'["\']url["\']\s*=>\s*null', snippet, re.IGNORECASE):
-                    is_supported = False
+            if _is_real_value(body, field, match):
+                is_supported = True
 
         if found_any:
             fields[field] = is_supported
-            
+
     return fields if fields else None
 
-def main():
-    if not os.path.exists(SCRAPER_DIR):
-        print(f"Error: {SCRAPER_DIR} not found.")
+def legacy_analyze_content(content):
+    inputs = legacy_analyze_inputs(content)
+    return {
+        "inputs": inputs,
+        "capabilities": derive_capabilities(inputs),
+        "outputs": legacy_analyze_outputs(content)
+    }
+
+# --- Driver ---
+
+def list_scrapers(scraper_dir):
+    return sorted([f for f in os.listdir(scraper_dir) if f.endswith('.php')])
+
+def file_digest(filepath):
+    with open(filepath, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+def load_cache(path):
+    if not path or not os.path.isfile(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != EXTRACTOR_VERSION:
+        return {}
+    return cache.get("specs", {})
+
+def save_cache(path, entries):
+    if not path:
         return
-        
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump({"version": EXTRACTOR_VERSION, "specs": entries}, f)
+    os.replace(tmp, path)
+
+def build_specs(scraper_dir, cache_path=None, jobs=None, quiet=False):
+    """Specs for every scraper in SCRAPER_DIR; returns (specs, analyzed_count, cached_count)."""
+    cache = load_cache(cache_path)
+    files = list_scrapers(scraper_dir)
+    if not quiet:
+        print(f"Scanning {len(files)} engines...")
+
     specs = {}
-    
-    files = sorted([f for f in os.listdir(SCRAPER_DIR) if f.endswith('.php')])
-    print(f"Scanning {len(files)} engines...")
-    
+    digests = {}
+    todo = []
     for filename in files:
-        engine_name = filename.replace('.php', '')
-        filepath = os.path.join(SCRAPER_DIR, filename)
-        
+        filepath = os.path.join(scraper_dir, filename)
         try:
-            with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-                content = f.read()
-                
-            inputs = analyze_inputs(content)
-            caps = derive_capabilities(inputs)
-            outputs = analyze_outputs(content)
-            
-            specs[engine_name] = {
-                "inputs": inputs,
-                "capabilities": caps,
-                "outputs": outputs
-            }
-        except Exception as e:
+            digest = file_digest(filepath)
+        except OSError as e:
             print(f"Error processing {filename}: {e}")
-            
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
+            continue
+        digests[filename] = digest
+        hit = cache.get(digest)
+        if hit is not None:
+            specs[filename] = hit
+        else:
+            todo.append(filename)
+
+    paths = [os.path.join(scraper_dir, f) for f in todo]
+    pool = None
+    if jobs == 1 or len(paths) < 2:
+        results = map(analyze_file, paths)
+    else:
+        pool = ProcessPoolExecutor(max_workers=jobs)
+        workers = jobs or os.cpu_count() or 1
+        results = pool.map(analyze_file, paths, chunksize=max(1, len(paths) // (4 * workers)))
+
+    try:
+        for filename, (spec, error) in zip(todo, results):
+            if error is not None:
+                print(f"Error processing {filename}: {error}")
+                continue
+            specs[filename] = spec
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # INVARIANT: Output order (and so the JSON file) doesn't depend on cache hits or pool scheduling.
+    ordered = {}
+    for filename in files:
+        if filename in specs:
+            ordered[filename.replace('.php', '')] = specs[filename]
+
+    save_cache(cache_path, {digests[f]: specs[f] for f in files if f in specs})
+    return ordered, len(todo), len(files) - len(todo)
+
+def build_legacy_specs(scraper_dir):
+    specs = {}
+    for filename in list_scrapers(scraper_dir):
+        with open(os.path.join(scraper_dir, filename), 'r', encoding='utf-8', errors='ignore') as f:
+            specs[filename.replace('.php', '')] = legacy_analyze_content(f.read())
+    return specs
+
+def run_timing(scraper_dir, rounds, jobs):
+    """Compare legacy vs. new (serial, pooled, warm cache) on a copy of the scraper tree."""
+    import tempfile
+
+    def best_of(fn):
+        best = None
+        result = None
+        for _ in range(rounds):
+            start = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, CACHE_FILE)
+
+        legacy_time, legacy = best_of(lambda: build_legacy_specs(scraper_dir))
+        serial_time, (serial, _, _) = best_of(lambda: build_specs(scraper_dir, jobs=1, quiet=True))
+        pooled_time, _ = best_of(lambda: build_specs(scraper_dir, jobs=jobs, quiet=True))
+        build_specs(scraper_dir, cache_path=cache_path, jobs=jobs, quiet=True)
+        warm_time, _ = best_of(lambda: build_specs(scraper_dir, cache_path=cache_path, jobs=jobs, quiet=True))
+
+    files = len(list_scrapers(scraper_dir))
+    print(f"{files} scrapers, best of {rounds}")
+    print(f"{'mode':<18}{'seconds':>10}{'speedup':>10}")
+    for label, elapsed in (("legacy", legacy_time), ("tokenizer", serial_time),
+                           (f"tokenizer x{jobs or os.cpu_count()}", pooled_time), ("warm cache", warm_time)):
+        print(f"{label:<18}{elapsed:>10.4f}{legacy_time / elapsed if elapsed else 0:>9.1f}x")
+
+    # The tokenizer skips braces and `//` inside strings, which the legacy walker didn't
+    changed = sorted(name for name in legacy if legacy[name] != serial.get(name))
+    if changed:
+        print(f"specs differing from legacy ({len(changed)}): {', '.join(changed)}")
+    else:
+        print("specs identical to legacy")
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract 4get scraper capabilities into 4get_engine_specs.json")
+    parser.add_argument("--scraper-dir", default=SCRAPER_DIR)
+    parser.add_argument("-o", "--output", default=OUTPUT_FILE)
+    parser.add_argument("--cache", default=CACHE_FILE, help="content-hash cache file")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: cpu count)")
+    parser.add_argument("--timing", action="store_true", help="compare against the legacy extractor, writes nothing")
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    if not os.path.exists(args.scraper_dir):
+        print(f"Error: {args.scraper_dir} not found.")
+        return 1
+
+    if args.timing:
+        run_timing(args.scraper_dir, max(1, args.rounds), args.jobs)
+        return 0
+
+    start = time.perf_counter()
+    specs, analyzed, cached = build_specs(
+        args.scraper_dir,
+        cache_path=None if args.no_cache else args.cache,
+        jobs=args.jobs
+    )
+
+    with open(args.output, 'w', encoding='utf-8') as f:
         json.dump(specs, f, indent=2)
-        
-    print(f"Specs generated at {OUTPUT_FILE}")
+
+    print(f"Specs generated at {args.output} ({analyzed} analyzed, {cached} cached, {time.perf_counter() - start:.2f}s)")
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
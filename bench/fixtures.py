@@ -0,0 +1,180 @@
+"""
+Synthetic 4get harness payloads shaped after 4get_engine_specs.json.
+
+Generates the same structure harness.php would return for a given engine and
+category, using only the result types and fields the spec says the scraper
+produces. Deterministic per (engine, category, seed) so runs are comparable.
+"""
+import json
+import os
+import random
+import time
+from urllib.parse import quote
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SPECS_FILE = os.path.join(ROOT_DIR, "4get_engine_specs.json")
+
+# 4get method -> result types the method can emit (mirrors the extractor's method_map)
+CATEGORY_TYPES = {
+    "web": ["web", "image", "video", "news"],
+    "image": ["image"],
+    "video": ["video", "livestream", "reel"],
+    "news": ["news"],
+    "music": ["song", "album", "playlist", "podcast"],
+}
+
+# Items per type when an engine emits it as the main result vs. as a side array
+MAIN_COUNTS = {"web": 20, "image": 150, "video": 40, "news": 30, "song": 30, "podcast": 20}
+SIDE_COUNT = 8
+
+# Image-heavy CDNs; hosts and paths repeat across items like real responses do
+CDN_HOSTS = ["i.pinimg.com", "i.imgur.com", "live.staticflickr.com", "images.unsplash.com", "cdn.example.net"]
+PAGE_HOSTS = ["www.example.com", "en.wikipedia.org", "news.example.org", "blog.example.io", "www.youtube.com"]
+
+LOREM = (
+    "Lorem ipsum dolor sit amet, consectetur adipiscing elit &amp; sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua. Ut enim ad minim veniam, quis nostrud "
+    "exercitation ullamco laboris nisi ut aliquip ex ea commodo consequat."
+)
+
+
+def load_specs(path: str = SPECS_FILE) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _proxied(url: str, rng: random.Random) -> str:
+    # 4get wraps thumbnails in its own image proxy; the client unwraps these
+    if rng.random() < 0.5:
+        return f"/proxy?url={quote(url, safe='')}&s=thumb"
+    return f"https://4get.example/proxy?url={quote(url, safe='')}&amp;s=thumb"
+
+
+def _image_url(rng: random.Random, broken_ratio: float = 0.03) -> str:
+    host = rng.choice(CDN_HOSTS)
+    if rng.random() < broken_ratio:
+        return f"https://{host}/assets/placeholder.png"
+    # INVARIANT: Small id space so the same CDN URLs recur within and across payloads.
+    return f"https://{host}/originals/{rng.randrange(400):03x}/{rng.randrange(2000)}.jpg"
+
+
+def _page_url(rng: random.Random, i: int) -> str:
+    return f"https://{rng.choice(PAGE_HOSTS)}/article/{rng.randrange(5000)}-{i}"
+
+
+def _thumb(rng: random.Random) -> dict:
+    url = _image_url(rng)
+    return {"url": _proxied(url, rng) if rng.random() < 0.6 else url, "ratio": "16:9"}
+
+
+def _description(rng: random.Random) -> str:
+    return LOREM[: rng.randrange(40, len(LOREM))]
+
+
+def _item(result_type: str, fields: dict, rng: random.Random, i: int, now: int) -> dict:
+    if result_type == "image":
+        full = _image_url(rng)
+        item = {
+            "title": f"Image {i} {rng.choice(['sunset', 'cat', 'chart', 'logo'])}",
+            "source": [
+                {"url": full, "width": 1200, "height": 800},
+                {"url": _proxied(_image_url(rng), rng), "width": 236, "height": 157},
+            ],
+            "url": _page_url(rng, i),
+        }
+        return item
+
+    item = {"title": f"{result_type.title()} result {i}", "url": _page_url(rng, i)}
+    if fields.get("description", True):
+        item["description"] = _description(rng)
+    if fields.get("thumb", True):
+        item["thumb"] = _thumb(rng) if rng.random() < 0.8 else {"url": None, "ratio": None}
+    if fields.get("date", True):
+        # A few future-dated items exercise _has_invalid_date
+        item["date"] = now + 86400 * 30 if rng.random() < 0.02 else now - rng.randrange(86400 * 365)
+    if result_type in ("video", "livestream", "reel", "song", "podcast", "album", "playlist"):
+        if fields.get("duration", True):
+            item["duration"] = rng.randrange(30, 7200)
+        if fields.get("views", True):
+            item["views"] = rng.randrange(10**6)
+        if fields.get("author", True):
+            item["author"] = {"name": f"Channel {rng.randrange(50)}", "url": _page_url(rng, i), "avatar": None}
+    elif result_type == "news" and fields.get("author", True):
+        item["author"] = rng.choice(["Reuters", "AP", "BBC", None])
+    if result_type in ("song", "podcast"):
+        item["stream"] = {"endpoint": rng.choice(["sc", "spotify", "mp3"]), "url": _page_url(rng, i)}
+    if result_type == "web" and rng.random() < 0.2:
+        item["sublink"] = {"Docs": _page_url(rng, i + 1), "About": _page_url(rng, i + 2)}
+        item["table"] = {"Rating": "4.5", "Votes": str(rng.randrange(900))}
+    return item
+
+
+def generate_payload(engine: str, category: str, specs: dict, seed: int = 0, scale: float = 1.0) -> dict:
+    """Build one harness response for ENGINE answering CATEGORY."""
+    rng = random.Random(f"{engine}:{category}:{seed}")
+    now = int(time.time())
+    outputs = specs.get(engine, {}).get("outputs", {})
+    types = [t for t in CATEGORY_TYPES.get(category, [category]) if t in outputs]
+
+    payload = {"status": "ok", "spelling": {"type": "no_correction", "using": None, "correction": None}, "npt": None}
+    if rng.random() < 0.5:
+        payload["npt"] = f"{rng.getrandbits(128):032x}"
+
+    for position, result_type in enumerate(types):
+        main = position == 0 or result_type == category
+        count = MAIN_COUNTS.get(result_type, 20) if main else SIDE_COUNT
+        fields = outputs.get(result_type, {})
+        payload[result_type] = [_item(result_type, fields, rng, i, now) for i in range(max(1, int(count * scale)))]
+
+    if category == "web" and types:
+        payload["related"] = [f"related search {i}" for i in range(rng.randrange(0, 8))]
+    return payload
+
+
+def iter_payloads(specs: dict, engines=None, categories=None, seed: int = 0, scale: float = 1.0):
+    """Yield (engine, category, payload) for every engine/category the spec covers."""
+    for engine in sorted(engines or specs):
+        outputs = specs.get(engine, {}).get("outputs", {})
+        for category, types in CATEGORY_TYPES.items():
+            if categories and category not in categories:
+                continue
+            # INVARIANT: Side arrays alone don't make a method; pinterest has no `web`.
+            if category != "music" and types[0] not in outputs:
+                continue
+            if not any(t in outputs for t in types):
+                continue
+            yield engine, category, generate_payload(engine, category, specs, seed=seed, scale=scale)
+
+
+def load_recorded(directory: str):
+    """Yield (engine, category, payload) from recorded `<engine>.<category>[.<n>].json` files."""
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        parts = name[: -len(".json")].split(".")
+        engine = parts[0]
+        category = parts[1] if len(parts) > 1 else "web"
+        with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+            yield engine, category, json.load(f)
+
+
+def write_fixtures(directory: str, specs: dict, seed: int = 0, scale: float = 1.0) -> int:
+    """Dump synthetic payloads in the same layout load_recorded() reads."""
+    os.makedirs(directory, exist_ok=True)
+    count = 0
+    for engine, category, payload in iter_payloads(specs, seed=seed, scale=scale):
+        with open(os.path.join(directory, f"{engine}.{category}.json"), "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write synthetic 4get harness payloads")
+    parser.add_argument("directory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scale", type=float, default=1.0)
+    args = parser.parse_args()
+    print(f"Wrote {write_fixtures(args.directory, load_specs(), seed=args.seed, scale=args.scale)} payloads")
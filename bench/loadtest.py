@@ -0,0 +1,274 @@
+"""
+End-to-end load test of one or more running sidecars.
+
+N keep-alive clients send harness.php requests drawn from a weighted mix of
+engines and categories. Meanwhile a sampler polls health.php for the sidecar's
+resident memory and APCu use. For each target it reports:
+
+- throughput and p50/p95/p99 latency, overall and per engine;
+- error rates: transport, HTTP, error payloads, empty answers;
+- mean Server-Timing phases;
+- memory over time.
+
+Targets run one after the other with the same mix, so Apache settings, worker
+mode and other changes can be compared head to head. `--baseline` compares a
+run to the JSON of an earlier one.
+
+Point the sidecars at bench/replay_server.py (FOURGET_REPLAY) so the scrapers
+parse recorded pages instead of going out to the network:
+
+    python bench/replay_server.py -d bench/recordings --latency-ms 300 --jitter-ms 100 &
+    docker run -d -p 8081:80 -e FOURGET_REPLAY=http://host.docker.internal:8099 4get-hijacked
+    docker run -d -p 8082:80 -e FOURGET_REPLAY=http://host.docker.internal:8099 -e FOURGET_SIDECAR_MODE=worker 4get-hijacked
+    python bench/loadtest.py apache=http://127.0.0.1:8081 worker=http://127.0.0.1:8082 --clients 32 --seconds 60
+    python bench/loadtest.py worker=http://127.0.0.1:8082 --wire --json after.json --baseline before.json
+    python bench/loadtest.py worker=http://127.0.0.1:8082 --project   # send the client's field projection
+"""
+import argparse
+import gzip
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "searx", "engines"))
+
+import fourget_wire  # noqa: E402
+from fourget_projection import Projection  # noqa: E402
+from fourget_stream import CATEGORY_MAIN_TYPES  # noqa: E402
+from fourget_metrics import parse_server_timing  # noqa: E402
+
+DEFAULT_MIX = "google:web=4,brave:web=3,duckduckgo:web=2,mojeek:web=1,duckduckgo:image=1,yandex:video=1,brave:news=1"
+DEFAULT_QUERIES = ("weather", "python asyncio", "linux kernel", "pizza near me", "climate change", "world cup",
+                   "rust borrow checker", "cat pictures", "stock market", "how to tie a tie")
+PHASES = ("manifest", "include", "upstream", "parse", "project", "encode", "total")
+
+
+class FakeResponse:
+    def __init__(self, content: bytes, headers: dict):
+        self.content = content
+        self.headers = headers
+
+
+def parse_mix(spec: str):
+    """"google:web=4,duckduckgo:image=1" -> [("google", "web", 4.0), ("ddg", "image", 1.0)]"""
+    mix = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        target, _, weight = part.partition("=")
+        engine, _, category = target.partition(":")
+        mix.append((engine, category or "web", float(weight or 1)))
+    return mix
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+def _result_count(payload, category):
+    if not isinstance(payload, dict):
+        return 0
+    main = payload.get(category) or payload.get("web") or []
+    return len(main) if isinstance(main, list) else 0
+
+
+class Run:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = []
+        self.per_engine = defaultdict(list)
+        self.outcomes = defaultdict(int)
+        self.phases = defaultdict(list)
+        self.results = 0
+        self.timeline = []
+
+    def add(self, key, outcome, ms=None, timing=None, results=0):
+        with self.lock:
+            self.outcomes[outcome] += 1
+            # latency and phases of answers only; errors are counted, not timed
+            if ms is None or outcome not in ("ok", "empty"):
+                return
+            self.latencies.append(ms)
+            self.per_engine[key].append(ms)
+            self.results += results
+            for name in PHASES:
+                if timing and name in timing:
+                    self.phases[name].append(timing[name])
+
+
+def drive(base: str, mix, queries, clients: int, seconds: float, wire: bool, sample: float,
+          project: bool = False) -> dict:
+    parts = urlsplit(base)
+    host, port = parts.hostname, parts.port or 80
+    run = Run()
+    stop = time.monotonic() + seconds
+    weights = [w for _, _, w in mix]
+    headers = {"Content-Type": "application/json"}
+    headers.update(fourget_wire.request_headers() if wire else {"Accept": "application/json"})
+    # main types and answers only; the real client adds whatever else the engine's plan normalizes
+    projection = Projection(enabled=True)
+
+    def client(seed):
+        rng = random.Random(seed)
+        conn = http.client.HTTPConnection(host, port, timeout=30)
+        while time.monotonic() < stop:
+            engine, category, _ = rng.choices(mix, weights)[0]
+            job = {"engine": engine, "category": category, "params": {"s": rng.choice(queries)}}
+            if project:
+                job["project"] = projection.build(CATEGORY_MAIN_TYPES.get(category, (category,)), 10000)
+            body = json.dumps(job)
+            key = f"{engine}:{category}"
+            started = time.perf_counter()
+            try:
+                conn.request("POST", "/harness.php", body=body.encode(), headers=headers)
+                resp = conn.getresponse()
+                content = resp.read()
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=30)
+                run.add(key, "transport_error")
+                continue
+            ms = (time.perf_counter() - started) * 1000
+            if resp.status != 200:
+                run.add(key, f"http_{resp.status}", ms)
+                continue
+            resp_headers = {k.lower(): v for k, v in resp.getheaders()}
+            if resp_headers.get("content-encoding") == "gzip":
+                content = gzip.decompress(content)
+                resp_headers.pop("content-encoding")
+            try:
+                payload = fourget_wire.decode_body(FakeResponse(content, resp_headers))
+            except ValueError:
+                run.add(key, "undecodable", ms)
+                continue
+            timing = parse_server_timing(resp_headers.get("server-timing"))
+            if isinstance(payload, dict) and payload.get("status") == "error":
+                run.add(key, "error_payload", ms, timing)
+                continue
+            count = _result_count(payload, category)
+            run.add(key, "ok" if count else "empty", ms, timing, count)
+        conn.close()
+
+    def sampler():
+        started = time.monotonic()
+        last = 0
+        while time.monotonic() < stop:
+            time.sleep(sample)
+            with run.lock:
+                done = len(run.latencies)
+            point = {"t": round(time.monotonic() - started, 1), "rps": round((done - last) / sample, 1)}
+            last = done
+            try:
+                conn = http.client.HTTPConnection(host, port, timeout=5)
+                conn.request("GET", "/health.php")
+                health = json.loads(conn.getresponse().read())
+                conn.close()
+                point["rss_mb"] = (health.get("memory") or {}).get("rss_mb")
+                point["processes"] = (health.get("memory") or {}).get("processes")
+                point["apcu_mb"] = round((health.get("apcu_memory") or {}).get("used_mb") or 0, 1)
+            except (OSError, http.client.HTTPException, ValueError):
+                point["rss_mb"] = None
+            run.timeline.append(point)
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    threads.append(threading.Thread(target=sampler, daemon=True))
+    for t in threads:
+        t.start()
+    for t in threads[:-1]:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    total = sum(run.outcomes.values())
+    rss = [p["rss_mb"] for p in run.timeline if p.get("rss_mb") is not None]
+    return {
+        "requests": total,
+        "rps": len(run.latencies) / elapsed,
+        "p50_ms": percentile(run.latencies, 50),
+        "p95_ms": percentile(run.latencies, 95),
+        "p99_ms": percentile(run.latencies, 99),
+        "results_per_request": run.results / max(1, len(run.latencies)),
+        "outcomes": dict(run.outcomes),
+        "error_rate": 1 - (run.outcomes["ok"] + run.outcomes["empty"]) / total if total else 0.0,
+        "empty_rate": run.outcomes["empty"] / total if total else 0.0,
+        "engines": {
+            key: {"requests": len(v), "p50_ms": percentile(v, 50), "p95_ms": percentile(v, 95)}
+            for key, v in sorted(run.per_engine.items())
+        },
+        "phases_ms": {name: sum(v) / len(v) for name, v in run.phases.items() if v},
+        "rss_mb": {"min": min(rss), "max": max(rss), "last": rss[-1]} if rss else None,
+        "timeline": run.timeline,
+    }
+
+
+def report(name: str, row: dict, baseline: dict = None) -> None:
+    def delta(field):
+        if not baseline or not baseline.get(field):
+            return ""
+        return f" ({(row[field] / baseline[field] - 1) * 100:+.0f}%)"
+
+    print(f"\n== {name}")
+    print(f"  {row['requests']} requests, {row['rps']:.1f} req/s{delta('rps')}, "
+          f"{row['results_per_request']:.1f} results/request")
+    print(f"  latency p50 {row['p50_ms']:.0f} ms{delta('p50_ms')}, p95 {row['p95_ms']:.0f} ms{delta('p95_ms')}, "
+          f"p99 {row['p99_ms']:.0f} ms{delta('p99_ms')}")
+    print(f"  errors {row['error_rate'] * 100:.2f}%, empty {row['empty_rate'] * 100:.1f}%  {row['outcomes']}")
+    if row["phases_ms"]:
+        print("  phases " + "  ".join(f"{k} {v:.1f}" for k, v in row["phases_ms"].items()))
+    if row["rss_mb"]:
+        print(f"  sidecar RSS {row['rss_mb']['min']:.0f} -> {row['rss_mb']['max']:.0f} MB (last {row['rss_mb']['last']:.0f})")
+    for key, engine in row["engines"].items():
+        print(f"    {key:<18}{engine['requests']:>7}  p50 {engine['p50_ms']:>7.0f}  p95 {engine['p95_ms']:>7.0f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load test running sidecars with a mix of engines and categories")
+    parser.add_argument("targets", nargs="+", help="name=http://host:port")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="engine:category=weight,... (default: %(default)s)")
+    parser.add_argument("--queries", help="file with one query per line")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=30.0)
+    parser.add_argument("--sample", type=float, default=2.0, help="seconds between health.php samples")
+    parser.add_argument("--wire", action="store_true", help="negotiate msgpack/zstd like the client does")
+    parser.add_argument("--project", action="store_true", help="send a field projection (FOURGET_PROJECTION=1)")
+    parser.add_argument("--json", help="write raw results to this file")
+    parser.add_argument("--baseline", help="JSON of an earlier run to compare against (matched by target name)")
+    args = parser.parse_args(argv)
+
+    queries = DEFAULT_QUERIES
+    if args.queries:
+        with open(args.queries, encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    mix = parse_mix(args.mix)
+    rows = {}
+    for target in args.targets:
+        name, _, base = target.partition("=")
+        if not base:
+            name, base = urlsplit(target).netloc, target
+        rows[name] = drive(base, mix, queries, args.clients, args.seconds, args.wire, args.sample, args.project)
+        report(name, rows[name], baseline.get(name))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,278 @@
+"""
+Offline benchmark for FourgetHijackerClient.normalize_results.
+
+Replays recorded harness payloads (or synthetic ones from fixtures.py) through
+the client with no network and reports, per engine and category:
+
+  - items/sec for a plain normalize_results() pass
+  - inclusive time per normalizer and URL helper
+  - peak allocations via tracemalloc
+
+Needs SearXNG importable (run inside the searxng container, or with a searxng
+checkout on PYTHONPATH), same as the engines themselves.
+
+    python bench/normalize_bench.py                       # synthetic, all engines
+    python bench/normalize_bench.py -e pinterest -e imgur -c image
+    python bench/normalize_bench.py --payloads recorded/ --json out.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "searx", "engines"))
+sys.path.insert(0, BENCH_DIR)
+
+from fourget_hijacker_client import FourgetHijackerClient  # noqa: E402
+import fourget_urls  # noqa: E402
+import fixtures  # noqa: E402
+
+# Helpers timed in the profile pass (inclusive: media -> video is counted in both)
+PROFILED = (
+    "_normalize_web_result",
+    "_normalize_image_result",
+    "_normalize_video_result",
+    "_normalize_media_result",
+    "_normalize_news_result",
+    "_normalize_answer_result",
+    "_normalize_thumbnail_url",
+    "_sanitize_url",
+    "_is_valid_url",
+    "_truncate_content",
+    "_has_invalid_date",
+)
+
+# fourget_urls functions, timed in every fourget_* module that binds them (the client and
+# fourget_dedup import them by name); the memoized classifiers call the others on a miss only
+URL_PROFILED = (
+    "sanitize_url",
+    "is_valid_url",
+    "extract_proxied_url",
+    "is_broken_image_url",
+    "is_root_path_url",
+    "classify_thumbnail",
+    "classify_image_source",
+    "canonical_url",
+)
+
+RESULT_TYPES = frozenset(
+    ("web", "image", "video", "news", "livestream", "reel", "song", "podcast", "playlist", "album", "author", "user")
+)
+
+
+def count_items(payload: dict) -> int:
+    return sum(len(v) for k, v in payload.items() if k in RESULT_TYPES and isinstance(v, list))
+
+
+def run_throughput(payload: dict, rounds: int, **plan) -> dict:
+    emitted = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        emitted = len(FourgetHijackerClient.normalize_results(payload, **plan))
+    elapsed = time.perf_counter() - start
+    items = count_items(payload) * rounds
+    return {
+        "items": count_items(payload),
+        "emitted": emitted,
+        "seconds": elapsed,
+        "items_per_sec": items / elapsed if elapsed else 0.0,
+    }
+
+
+class Profiler:
+    """Swap the client's helpers and the fourget_urls functions for timing wrappers, restore on exit."""
+
+    def __init__(self, names=PROFILED, url_names=URL_PROFILED):
+        self.names = names
+        self.url_names = url_names
+        self.totals = defaultdict(float)
+        self.calls = defaultdict(int)
+        self._saved = {}
+        self._rebound = []
+
+    def _wrap(self, name, func):
+        totals, calls, clock = self.totals, self.calls, time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                totals[name] += clock() - start
+                calls[name] += 1
+
+        return timed
+
+    def __enter__(self):
+        for name in self.names:
+            raw = FourgetHijackerClient.__dict__.get(name)
+            if not isinstance(raw, staticmethod):
+                continue
+            self._saved[name] = raw
+            setattr(FourgetHijackerClient, name, staticmethod(self._wrap(name, raw.__func__)))
+        modules = [m for n, m in list(sys.modules.items()) if n.startswith("fourget_")]
+        for name in self.url_names:
+            func = getattr(fourget_urls, name)
+            timed = self._wrap(name, func)
+            for module in modules:
+                if getattr(module, name, None) is func:
+                    self._rebound.append((module, name, func))
+                    setattr(module, name, timed)
+        # INVARIANT: Normalizer table and engine plans cache functions; rebuild them so they pick up the wrappers.
+        self._saved_normalizers = FourgetHijackerClient._NORMALIZERS
+        self._saved_plans = FourgetHijackerClient._PLANS
+        FourgetHijackerClient._NORMALIZERS = {}
+        FourgetHijackerClient._PLANS = {}
+        return self
+
+    def __exit__(self, *exc):
+        for name, raw in self._saved.items():
+            setattr(FourgetHijackerClient, name, raw)
+        for module, name, func in self._rebound:
+            setattr(module, name, func)
+        FourgetHijackerClient._NORMALIZERS = self._saved_normalizers
+        FourgetHijackerClient._PLANS = self._saved_plans
+        return False
+
+
+def run_profile(payload: dict, rounds: int, **plan) -> dict:
+    with Profiler() as prof:
+        for _ in range(rounds):
+            FourgetHijackerClient.normalize_results(payload, **plan)
+    return {
+        name: {"ms": prof.totals[name] * 1000 / rounds, "calls": prof.calls[name] // rounds}
+        for name in sorted(prof.totals, key=prof.totals.get, reverse=True)
+    }
+
+
+def run_memory(payload: dict, **plan) -> dict:
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        results = FourgetHijackerClient.normalize_results(payload, **plan)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del results
+    return {"peak_kib": peak / 1024, "retained_kib": current / 1024}
+
+
+def run_url_memo(payload: dict, rounds: int, **plan) -> dict:
+    """Cold (memo cleared every pass) vs warm passes, and the warm hit rate."""
+    def lookups():
+        stats = fourget_urls.memo_stats()
+        return sum(s["hits"] for s in stats.values()), sum(s["misses"] for s in stats.values())
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        fourget_urls.clear_memo()
+        FourgetHijackerClient.normalize_results(payload, **plan)
+    cold = time.perf_counter() - start
+
+    hits0, misses0 = lookups()
+    start = time.perf_counter()
+    for _ in range(rounds):
+        FourgetHijackerClient.normalize_results(payload, **plan)
+    warm = time.perf_counter() - start
+    hits, misses = lookups()
+
+    total = (hits - hits0) + (misses - misses0)
+    return {
+        "cold_ms": cold * 1000 / rounds,
+        "warm_ms": warm * 1000 / rounds,
+        "saved_pct": (1 - warm / cold) * 100 if cold else 0.0,
+        "hit_rate": (hits - hits0) / total if total else None,
+    }
+
+
+def bench_one(engine: str, category: str, payload: dict, rounds: int, profile: bool, generic: bool = False) -> dict:
+    # generic: the full normalizer table instead of the engine's spec plan
+    plan = {} if generic else {"engine_id": engine, "category": category}
+    FourgetHijackerClient.normalize_results(payload, **plan)  # warm regex/normalizer table
+    row = {"engine": engine, "category": category}
+    row.update(run_throughput(payload, rounds, **plan))
+    row["memory"] = run_memory(payload, **plan)
+    row["url_memo"] = run_url_memo(payload, max(1, rounds // 4), **plan)
+    if profile:
+        row["profile"] = run_profile(payload, max(1, rounds // 4), **plan)
+    return row
+
+
+def print_report(rows: list, top: int) -> None:
+    print(f"{'engine':<14}{'category':<10}{'items':>7}{'emitted':>9}{'items/s':>12}{'peak KiB':>11}")
+    total_items = total_seconds = 0.0
+    for row in rows:
+        print(
+            f"{row['engine']:<14}{row['category']:<10}{row['items']:>7}{row['emitted']:>9}"
+            f"{row['items_per_sec']:>12.0f}{row['memory']['peak_kib']:>11.1f}"
+        )
+        total_items += row["items_per_sec"] * row["seconds"]
+        total_seconds += row["seconds"]
+    if total_seconds:
+        print(f"\noverall: {total_items / total_seconds:.0f} items/s over {len(rows)} payloads")
+
+    cold = sum(row["url_memo"]["cold_ms"] for row in rows)
+    warm = sum(row["url_memo"]["warm_ms"] for row in rows)
+    if cold:
+        print(f"url memo: cold {cold:.2f} ms/pass, warm {warm:.2f} ms/pass ({(1 - warm / cold) * 100:.0f}% saved)")
+        # lifetime counters across every payload, i.e. cross-engine/category reuse included
+        for name, stat in fourget_urls.memo_stats().items():
+            if stat["hit_rate"] is not None:
+                print(f"  {name:<14}hit rate {stat['hit_rate'] * 100:5.1f}%  size {stat['size']}/{stat['maxsize']}")
+
+    profiled = [row for row in rows if "profile" in row]
+    if not profiled:
+        return
+    merged = defaultdict(lambda: {"ms": 0.0, "calls": 0})
+    for row in profiled:
+        for name, stat in row["profile"].items():
+            merged[name]["ms"] += stat["ms"]
+            merged[name]["calls"] += stat["calls"]
+    print(f"\n{'helper (inclusive)':<28}{'ms/pass':>10}{'calls/pass':>12}{'us/call':>10}")
+    for name, stat in sorted(merged.items(), key=lambda kv: kv[1]["ms"], reverse=True)[:top]:
+        per_call = stat["ms"] * 1000 / stat["calls"] if stat["calls"] else 0.0
+        print(f"{name:<28}{stat['ms']:>10.2f}{stat['calls']:>12}{per_call:>10.2f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark 4get result normalization offline")
+    parser.add_argument("--payloads", help="directory of recorded <engine>.<category>.json harness payloads")
+    parser.add_argument("-e", "--engine", action="append", help="limit to engine (repeatable)")
+    parser.add_argument("-c", "--category", action="append", choices=sorted(fixtures.CATEGORY_TYPES))
+    parser.add_argument("-n", "--rounds", type=int, default=50, help="normalize passes per payload")
+    parser.add_argument("--scale", type=float, default=1.0, help="multiply synthetic item counts")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-profile", action="store_true", help="skip the per-helper timing pass")
+    parser.add_argument("--generic", action="store_true", help="bypass per-engine spec plans")
+    parser.add_argument("--top", type=int, default=len(PROFILED) + len(URL_PROFILED))
+    parser.add_argument("--json", help="write raw results to this file")
+    args = parser.parse_args(argv)
+
+    if args.payloads:
+        source = (
+            (e, c, p) for e, c, p in fixtures.load_recorded(args.payloads)
+            if (not args.engine or e in args.engine) and (not args.category or c in args.category)
+        )
+    else:
+        source = fixtures.iter_payloads(
+            fixtures.load_specs(), engines=args.engine, categories=args.category, seed=args.seed, scale=args.scale
+        )
+
+    rows = [bench_one(e, c, p, args.rounds, not args.no_profile, args.generic) for e, c, p in source]
+    if not rows:
+        print("No payloads matched.")
+        return 1
+
+    print_report(rows, args.top)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
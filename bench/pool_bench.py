@@ -0,0 +1,163 @@
+"""
+Throughput of the client endpoint pool against local sidecar stand-ins.
+
+Each stand-in is a threaded HTTP server that behaves like one sidecar
+container: a fixed number of "Apache workers" (a semaphore) and a fixed
+scrape time per request, plus a health.php. The bench drives the real
+EndpointPool from fourget_pool with N client threads and reports requests/s
+for 1..N replicas, so the scaling of the selection strategy is visible
+without any upstream engines.
+
+    python bench/pool_bench.py                         # 1, 2, 4 replicas
+    python bench/pool_bench.py --replicas 1 2 4 8 --strategy ewma --affinity
+    python bench/pool_bench.py --fail 1                # replica 0 starts answering 503 halfway
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "searx", "engines"))
+
+from fourget_pool import EndpointPool  # noqa: E402
+
+ENGINES = ("google", "brave", "ddg", "yandex", "mojeek", "qwant", "startpage", "wiby")
+
+
+class StandIn:
+    """One fake sidecar on 127.0.0.1:<ephemeral port>."""
+
+    def __init__(self, workers: int, service_ms: float):
+        self.workers = threading.BoundedSemaphore(workers)
+        self.service = service_ms / 1000
+        self.failing = False
+        self.served = 0
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code, body):
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._send(503 if stand_in.failing else 200, b'{"status":"ok"}')
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if stand_in.failing:
+                    self._send(503, b"{}")
+                    return
+                # Apache queues beyond MaxRequestWorkers; so do we
+                with stand_in.workers:
+                    time.sleep(stand_in.service)
+                stand_in.served += 1
+                self._send(200, b'{"status":"ok","web":[]}')
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def drive(pool: EndpointPool, clients: int, seconds: float, fail_at: float = None, failing: StandIn = None) -> dict:
+    done = 0
+    errors = 0
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+    started = time.monotonic()
+
+    def client(n):
+        nonlocal done, errors
+        i = n
+        while time.monotonic() < stop:
+            engine = ENGINES[i % len(ENGINES)]
+            i += 1
+            ticket = pool.acquire(engine)
+            req = urllib.request.Request(
+                ticket.endpoint.url("/harness.php"), data=b'{"engine":"%s"}' % engine.encode(), method="POST"
+            )
+            ok = True
+            try:
+                with urllib.request.urlopen(req, timeout=5) as resp:
+                    resp.read()
+            except (urllib.error.URLError, OSError):
+                ok = False
+            pool.release(ticket, ok=ok)
+            with lock:
+                if ok:
+                    done += 1
+                else:
+                    errors += 1
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    if failing is not None and fail_at is not None:
+        time.sleep(fail_at)
+        failing.failing = True
+    for t in threads:
+        t.join()
+
+    elapsed = time.monotonic() - started
+    return {"requests": done, "errors": errors, "rps": done / elapsed, "pool": pool.stats()}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the sidecar endpoint pool against local stand-ins")
+    parser.add_argument("--replicas", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--workers", type=int, default=4, help="concurrent requests per stand-in")
+    parser.add_argument("--service-ms", type=float, default=25.0, help="scrape time per request")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--strategy", choices=("least", "ewma"), default="least")
+    parser.add_argument("--affinity", action="store_true")
+    parser.add_argument("--fail", type=int, default=0, help="1: replica 0 starts failing halfway through")
+    parser.add_argument("--json", help="write raw results to this file")
+    args = parser.parse_args(argv)
+
+    rows = []
+    base_rps = None
+    print(f"{'replicas':>8}{'req/s':>10}{'scaling':>9}{'errors':>8}  per replica")
+    for n in args.replicas:
+        stand_ins = [StandIn(args.workers, args.service_ms) for _ in range(n)]
+        try:
+            pool = EndpointPool([s.base for s in stand_ins], strategy=args.strategy, affinity=args.affinity,
+                                eject_for=args.seconds)
+            failing = stand_ins[0] if args.fail and n > 1 else None
+            row = drive(pool, args.clients, args.seconds, fail_at=args.seconds / 2, failing=failing)
+            row["replicas"] = n
+            row["served"] = [s.served for s in stand_ins]
+        finally:
+            for s in stand_ins:
+                s.close()
+
+        base_rps = base_rps or row["rps"] / n
+        print(f"{n:>8}{row['rps']:>10.0f}{row['rps'] / base_rps:>8.2f}x{row['errors']:>8}  {row['served']}")
+        rows.append(row)
+
+    ideal = 1000 / args.service_ms * args.workers
+    print(f"\nideal per replica: {ideal:.0f} req/s ({args.workers} workers x {args.service_ms:g} ms)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
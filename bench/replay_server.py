@@ -0,0 +1,173 @@
+"""
+Local stand-in for every upstream the 4get scrapers talk to.
+
+With FOURGET_REPLAY=http://<this host>:<port> on the sidecar, backend::assign_proxy
+rewrites each scraper request to `/replay?url=<original url>` here. The scraper
+then receives recorded HTML/JSON after a configurable delay, and the whole
+sidecar path (mock.php, scraper parse, encoding) runs with no network.
+
+Recordings are one JSON file per response under DIR/<host>/. A request is
+answered by the exact URL if it was recorded, otherwise by any recording for
+the same host and path, otherwise the same host. So one recorded "weather"
+search serves every query in a load test.
+
+    python bench/replay_server.py --record -d bench/recordings     # pass through upstream, save
+    python bench/replay_server.py -d bench/recordings --latency-ms 300 --jitter-ms 100 --error-rate 0.01
+
+GET /_stats reports served / missing / errors per host.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+FORWARDED_HEADERS = ("User-Agent", "Accept", "Accept-Language", "Cookie", "Referer", "Content-Type")
+
+
+class Recordings:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.exact = {}
+        self.by_path = defaultdict(list)
+        self.by_host = defaultdict(list)
+        self._lock = threading.Lock()
+        if os.path.isdir(directory):
+            for host in sorted(os.listdir(directory)):
+                host_dir = os.path.join(directory, host)
+                for name in sorted(os.listdir(host_dir)) if os.path.isdir(host_dir) else ():
+                    if name.endswith(".json"):
+                        with open(os.path.join(host_dir, name), encoding="utf-8") as f:
+                            self._index(json.load(f))
+
+    def _index(self, record: dict) -> None:
+        parts = urlsplit(record["url"])
+        self.exact[record["url"]] = record
+        self.by_path[(parts.hostname, parts.path)].append(record)
+        self.by_host[parts.hostname].append(record)
+
+    def find(self, url: str):
+        parts = urlsplit(url)
+        record = self.exact.get(url)
+        if record is not None:
+            return record
+        for candidates in (self.by_path.get((parts.hostname, parts.path)), self.by_host.get(parts.hostname)):
+            if candidates:
+                return random.choice(candidates)
+        return None
+
+    def save(self, record: dict) -> None:
+        host = urlsplit(record["url"]).hostname or "unknown"
+        os.makedirs(os.path.join(self.directory, host), exist_ok=True)
+        name = hashlib.sha1(record["url"].encode("utf-8")).hexdigest()[:16] + ".json"
+        with open(os.path.join(self.directory, host, name), "w", encoding="utf-8") as f:
+            json.dump(record, f)
+        with self._lock:
+            self._index(record)
+
+
+def fetch_upstream(url: str, method: str, headers: dict, body: bytes) -> dict:
+    req = urllib.request.Request(url, data=body or None, method=method,
+                                 headers={k: v for k, v in headers.items() if k in FORWARDED_HEADERS})
+    req.add_header("Accept-Encoding", "identity")
+    try:
+        with urllib.request.urlopen(req, timeout=15) as resp:
+            status, content_type, raw = resp.status, resp.headers.get("Content-Type", "text/html"), resp.read()
+    except urllib.error.HTTPError as e:
+        status, content_type, raw = e.code, e.headers.get("Content-Type", "text/html"), e.read()
+    return {"url": url, "status": status, "content_type": content_type, "body": raw.decode("utf-8", "replace")}
+
+
+def make_handler(recordings: Recordings, args, stats):
+    lock = threading.Lock()
+
+    def count(host, what):
+        with lock:
+            stats[host or "?"][what] += 1
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *a):
+            pass
+
+        def _send(self, status, content_type, body: bytes):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _replay(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            parts = urlsplit(self.path)
+            if parts.path == "/_stats":
+                self._send(200, "application/json", json.dumps(stats, indent=2).encode())
+                return
+            url = parse_qs(parts.query).get("url", [""])[0]
+            host = urlsplit(url).hostname
+            if parts.path != "/replay" or not url:
+                self._send(404, "text/plain", b"not a replay request")
+                return
+
+            delay = max(0.0, random.gauss(args.latency_ms, args.jitter_ms)) / 1000 if args.jitter_ms else args.latency_ms / 1000
+            time.sleep(delay)
+
+            if args.error_rate and random.random() < args.error_rate:
+                count(host, "errors")
+                self._send(503, "text/plain", b"replay: injected error")
+                return
+
+            record = recordings.find(url)
+            if record is None and args.record:
+                record = fetch_upstream(url, self.command, dict(self.headers), body)
+                recordings.save(record)
+                count(host, "recorded")
+            if record is None:
+                count(host, "missing")
+                self._send(404, "text/html", b"<html><body>no recording</body></html>")
+                return
+
+            count(host, "served")
+            self._send(record["status"], record["content_type"], record["body"].encode("utf-8"))
+
+        do_GET = _replay
+        do_POST = _replay
+
+    return Handler
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Replay recorded upstream responses to the 4get scrapers")
+    parser.add_argument("-d", "--recordings", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings"))
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency-ms", type=float, default=250.0, help="mean upstream latency")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="standard deviation of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered 503")
+    parser.add_argument("--record", action="store_true", help="fetch and save URLs that have no recording")
+    args = parser.parse_args(argv)
+
+    recordings = Recordings(args.recordings)
+    stats = defaultdict(lambda: defaultdict(int))
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(recordings, args, stats))
+    server.daemon_threads = True
+    print(f"replaying {len(recordings.exact)} recordings on {args.host}:{args.port}"
+          f" ({args.latency_ms:g}±{args.jitter_ms:g} ms{', recording' if args.record else ''})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
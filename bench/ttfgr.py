@@ -0,0 +1,170 @@
+"""
+Time to first good response of a freshly started sidecar container.
+
+For each target, N times: `docker run` the image and start the clock. Then
+poll health.php until it answers 200, and harness.php with a first-page
+search until one comes back with results. After that, one request to each
+--engine shows what the first search still pays per engine (Server-Timing
+`include` is the scraper's compile and load). Then remove the container.
+
+Targets are name="extra docker run args", so warm start can be compared to
+the old cold start on the same image:
+
+    python bench/replay_server.py -d bench/recordings &
+    python bench/ttfgr.py cold="-e FOURGET_WARMUP=0" warm="" \\
+        --env FOURGET_REPLAY=http://host.docker.internal:8099 --add-host host.docker.internal:host-gateway
+    python bench/ttfgr.py worker="-e FOURGET_SIDECAR_MODE=worker" --runs 5 --json ttfgr.json
+
+Without FOURGET_REPLAY the searches go to the real engines.
+"""
+import argparse
+import http.client
+import json
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "searx", "engines"))
+
+from fourget_metrics import parse_server_timing  # noqa: E402
+
+DEFAULT_ENGINES = ("google", "brave", "duckduckgo", "mojeek", "yandex", "qwant", "startpage")
+
+
+def _request(port: int, method: str, path: str, body: bytes = None, timeout: float = 10.0):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=timeout)
+    try:
+        conn.request(method, path, body=body, headers={"Content-Type": "application/json"} if body else {})
+        resp = conn.getresponse()
+        return resp.status, dict((k.lower(), v) for k, v in resp.getheaders()), resp.read()
+    finally:
+        conn.close()
+
+
+def _search(port: int, engine: str, query: str):
+    """(good, ms, Server-Timing phases) for one first-page web search."""
+    body = json.dumps({"engine": engine, "category": "web", "params": {"s": query}}).encode()
+    started = time.perf_counter()
+    try:
+        status, headers, content = _request(port, "POST", "/harness.php", body, timeout=30.0)
+    except (OSError, http.client.HTTPException):
+        return False, None, {}
+    ms = (time.perf_counter() - started) * 1000
+    try:
+        payload = json.loads(content)
+    except ValueError:
+        return False, ms, {}
+    good = status == 200 and isinstance(payload, dict) and payload.get("status") != "error" and bool(payload.get("web"))
+    return good, ms, parse_server_timing(headers.get("server-timing"))
+
+
+def run_once(image: str, docker_args, port: int, engine: str, engines, query: str, limit: float) -> dict:
+    cmd = ["docker", "run", "-d", "--rm", "-p", f"{port}:80"] + docker_args + [image]
+    started = time.monotonic()
+    container = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout.strip()
+    row = {"healthy_s": None, "first_good_s": None, "first_good_ms": None, "engines": {}}
+    try:
+        deadline = started + limit
+        while time.monotonic() < deadline and row["first_good_s"] is None:
+            if row["healthy_s"] is None:
+                try:
+                    if _request(port, "GET", "/health.php", timeout=2.0)[0] == 200:
+                        row["healthy_s"] = round(time.monotonic() - started, 3)
+                except (OSError, http.client.HTTPException):
+                    pass
+            good, ms, _ = _search(port, engine, query)
+            if good:
+                row["first_good_s"] = round(time.monotonic() - started, 3)
+                row["first_good_ms"] = round(ms, 1)
+            else:
+                time.sleep(0.1)
+
+        while row["healthy_s"] is None and time.monotonic() < deadline:
+            try:
+                if _request(port, "GET", "/health.php", timeout=2.0)[0] == 200:
+                    row["healthy_s"] = round(time.monotonic() - started, 3)
+            except (OSError, http.client.HTTPException):
+                time.sleep(0.1)
+
+        # first search per engine on this container
+        for name in engines:
+            if name == engine:
+                continue
+            good, ms, phases = _search(port, name, query)
+            row["engines"][name] = {"good": good, "ms": round(ms, 1) if ms else None,
+                                    "include_ms": phases.get("include")}
+    finally:
+        subprocess.run(["docker", "rm", "-f", container], capture_output=True)
+    return row
+
+
+def summarize(rows) -> dict:
+    def stats(values):
+        values = [v for v in values if v is not None]
+        if not values:
+            return None
+        return {"median": round(statistics.median(values), 3), "min": min(values), "max": max(values)}
+
+    engines = sorted({name for row in rows for name in row["engines"]})
+    return {
+        "runs": len(rows),
+        "healthy_s": stats([r["healthy_s"] for r in rows]),
+        "first_good_s": stats([r["first_good_s"] for r in rows]),
+        "first_good_ms": stats([r["first_good_ms"] for r in rows]),
+        "engines": {name: {"ms": stats([r["engines"].get(name, {}).get("ms") for r in rows]),
+                           "include_ms": stats([r["engines"].get(name, {}).get("include_ms") for r in rows])}
+                    for name in engines},
+    }
+
+
+def report(name: str, summary: dict) -> None:
+    def fmt(stat, unit):
+        return "never" if not stat else f"{stat['median']:g}{unit} (min {stat['min']:g}, max {stat['max']:g})"
+
+    print(f"\n== {name} ({summary['runs']} runs)")
+    print(f"  health 200 after     {fmt(summary['healthy_s'], 's')}")
+    print(f"  first good response  {fmt(summary['first_good_s'], 's')}, that request took {fmt(summary['first_good_ms'], ' ms')}")
+    for engine, stat in summary["engines"].items():
+        include = stat["include_ms"]["median"] if stat["include_ms"] else None
+        print(f"    {engine:<14} first search {fmt(stat['ms'], ' ms')}"
+              + (f", include {include:.1f} ms" if include is not None else ""))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Measure time to first good response of fresh sidecar containers")
+    parser.add_argument("targets", nargs="+", help='name="extra docker run args"')
+    parser.add_argument("--image", default="4get-hijacked")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE for every container")
+    parser.add_argument("--add-host", action="append", default=[], help="passed to docker run")
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--engine", default="google", help="engine polled for the first good response")
+    parser.add_argument("--engines", default=",".join(DEFAULT_ENGINES), help="first search per engine after that")
+    parser.add_argument("--query", default="weather")
+    parser.add_argument("--limit", type=float, default=120.0, help="give up on a container after this many seconds")
+    parser.add_argument("--json", help="write raw runs and summaries to this file")
+    args = parser.parse_args(argv)
+
+    common = [a for env in args.env for a in ("-e", env)] + [a for host in args.add_host for a in ("--add-host", host)]
+    engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+    out = {}
+    for target in args.targets:
+        name, _, extra = target.partition("=")
+        rows = [run_once(args.image, common + shlex.split(extra), args.port, args.engine, engines, args.query,
+                         args.limit)
+                for _ in range(args.runs)]
+        out[name] = {"summary": summarize(rows), "runs": rows}
+        report(name, out[name]["summary"])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(out, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,140 @@
+"""
+Compare harness wire formats on recorded (or synthetic) payloads.
+
+For each format: encoded size, encode time, transfer time at a given link
+speed, and client decode time (through fourget_wire.decode_body, the same path
+dispatch_response uses). Encode times are Python's and only a proxy for the
+sidecar's PHP encoders; sizes and decode times are the real numbers.
+
+    python bench/wire_bench.py -c image --mbps 100
+    python bench/wire_bench.py --payloads recorded/ --json wire.json
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "searx", "engines"))
+sys.path.insert(0, BENCH_DIR)
+
+import fixtures  # noqa: E402
+import fourget_wire  # noqa: E402
+from fourget_wire import msgpack, orjson, zstandard  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, content: bytes, content_type: str, content_encoding: str = ""):
+        self.content = content
+        self.headers = {"content-type": content_type, "content-encoding": content_encoding}
+
+
+def _json_encode(payload):
+    return json.dumps(payload, separators=(",", ":")).encode("utf-8")
+
+
+def formats():
+    """name -> (encode, content_type, content_encoding, pre-decode step)"""
+    out = {"json": (_json_encode, "application/json", "", None)}
+    out["json+gzip"] = (lambda p: gzip.compress(_json_encode(p), 1), "application/json", "gzip", gzip.decompress)
+    if zstandard is not None:
+        out["json+zstd"] = (
+            lambda p: zstandard.ZstdCompressor(level=3).compress(_json_encode(p)), "application/json", "zstd", None
+        )
+    if msgpack is not None:
+        out["msgpack"] = (msgpack.packb, fourget_wire.MSGPACK_TYPE, "", None)
+        out["msgpack+gzip"] = (
+            lambda p: gzip.compress(msgpack.packb(p), 1), fourget_wire.MSGPACK_TYPE, "gzip", gzip.decompress
+        )
+        if zstandard is not None:
+            out["msgpack+zstd"] = (
+                lambda p: zstandard.ZstdCompressor(level=3).compress(msgpack.packb(p)),
+                fourget_wire.MSGPACK_TYPE, "zstd", None
+            )
+    return out
+
+
+def _timed(func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        value = func()
+    return value, (time.perf_counter() - start) / rounds
+
+
+def bench_payload(payload, rounds, mbps):
+    rows = {}
+    for name, (encode, content_type, content_encoding, undo) in formats().items():
+        body, encode_s = _timed(lambda: encode(payload), rounds)
+
+        def decode():
+            # gzip is undone by the HTTP client before decode_body sees it; time it here too
+            content = undo(body) if undo else body
+            encoding = "" if undo else content_encoding
+            return fourget_wire.decode_body(FakeResponse(content, content_type, encoding))
+
+        decoded, decode_s = _timed(decode, rounds)
+        assert decoded == json.loads(_json_encode(payload)), f"{name} does not round-trip"
+        transfer_s = len(body) * 8 / (mbps * 1_000_000)
+        rows[name] = {
+            "bytes": len(body),
+            "encode_ms": encode_s * 1000,
+            "transfer_ms": transfer_s * 1000,
+            "decode_ms": decode_s * 1000,
+            "total_ms": (encode_s + transfer_s + decode_s) * 1000,
+        }
+    return rows
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare sidecar wire formats offline")
+    parser.add_argument("--payloads", help="directory of recorded <engine>.<category>.json harness payloads")
+    parser.add_argument("-e", "--engine", action="append")
+    parser.add_argument("-c", "--category", action="append", choices=sorted(fixtures.CATEGORY_TYPES))
+    parser.add_argument("-n", "--rounds", type=int, default=20)
+    parser.add_argument("--mbps", type=float, default=100.0, help="link speed between client and sidecar")
+    parser.add_argument("--scale", type=float, default=1.0)
+    parser.add_argument("--json", help="write raw results to this file")
+    args = parser.parse_args(argv)
+
+    if args.payloads:
+        source = [
+            (e, c, p) for e, c, p in fixtures.load_recorded(args.payloads)
+            if (not args.engine or e in args.engine) and (not args.category or c in args.category)
+        ]
+    else:
+        source = list(fixtures.iter_payloads(
+            fixtures.load_specs(), engines=args.engine, categories=args.category, scale=args.scale
+        ))
+    if not source:
+        print("No payloads matched.")
+        return 1
+
+    print(f"decoders available: {fourget_wire.available()}  link: {args.mbps:g} Mbit/s")
+    totals = {}
+    raw = []
+    for engine, category, payload in source:
+        rows = bench_payload(payload, args.rounds, args.mbps)
+        raw.append({"engine": engine, "category": category, "formats": rows})
+        for name, row in rows.items():
+            agg = totals.setdefault(name, dict.fromkeys(row, 0.0))
+            for key, value in row.items():
+                agg[key] += value
+
+    print(f"\n{'format':<14}{'KiB':>10}{'encode ms':>11}{'xfer ms':>10}{'decode ms':>11}{'total ms':>10}")
+    for name, agg in sorted(totals.items(), key=lambda kv: kv[1]["total_ms"]):
+        print(
+            f"{name:<14}{agg['bytes'] / 1024:>10.1f}{agg['encode_ms']:>11.2f}{agg['transfer_ms']:>10.2f}"
+            f"{agg['decode_ms']:>11.2f}{agg['total_ms']:>10.2f}"
+        )
+    print(f"\nsummed over {len(source)} payloads; orjson={'on' if orjson else 'off'} for JSON decode")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(raw, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,135 @@
+"""
+Apache vs worker mode on real sidecars.
+
+Drives one or more running sidecars (e.g. one container per FOURGET_SIDECAR_MODE)
+with the same harness requests from N keep-alive client connections and reports
+requests/s, latency percentiles and the mean Server-Timing phases per target.
+
+The default `overhead` workload asks for page 2 of a query nobody searched:
+the harness looks up the manifest, includes and instantiates the scraper and
+answers `[]` without going upstream, so the numbers are the per-request cost
+the worker mode removes. `--live` sends first-page searches instead.
+
+    docker run -d -p 8081:80 4get-hijacked
+    docker run -d -p 8082:80 -e FOURGET_SIDECAR_MODE=worker 4get-hijacked
+    python bench/worker_bench.py apache=http://127.0.0.1:8081 worker=http://127.0.0.1:8082
+    python bench/worker_bench.py worker=http://127.0.0.1:8082 -e brave -e mojeek --live --clients 4
+"""
+import argparse
+import http.client
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from urllib.parse import urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(BENCH_DIR), "searx", "engines"))
+
+from fourget_metrics import parse_server_timing  # noqa: E402
+
+PHASES = ("manifest", "include", "upstream", "parse", "encode", "total")
+
+
+def _percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))]
+
+
+def _body(engine: str, live: bool, query: str) -> bytes:
+    params = {"s": query} if live else {"s": f"bench {uuid.uuid4().hex}", "offset": 10}
+    return json.dumps({"engine": engine, "category": "web", "params": params}).encode()
+
+
+def drive(base: str, engines, clients: int, seconds: float, live: bool, query: str) -> dict:
+    parts = urlsplit(base)
+    latencies = []
+    phases = {name: [] for name in PHASES}
+    errors = 0
+    lock = threading.Lock()
+    stop = time.monotonic() + seconds
+
+    def client(n):
+        nonlocal errors
+        conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        i = n
+        while time.monotonic() < stop:
+            engine = engines[i % len(engines)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                conn.request("POST", "/harness.php", body=_body(engine, live, query),
+                             headers={"Content-Type": "application/json", "Accept": "application/json"})
+                resp = conn.getresponse()
+                resp.read()
+                ok = resp.status == 200
+                timing = parse_server_timing(resp.getheader("Server-Timing"))
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+                ok, timing = False, {}
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                if not ok:
+                    errors += 1
+                    continue
+                latencies.append(elapsed)
+                for name in PHASES:
+                    if name in timing:
+                        phases[name].append(timing[name])
+        conn.close()
+
+    started = time.monotonic()
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.monotonic() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": len(latencies) / elapsed,
+        "p50_ms": _percentile(latencies, 50),
+        "p95_ms": _percentile(latencies, 95),
+        "phases_ms": {name: sum(v) / len(v) for name, v in phases.items() if v},
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare sidecar modes (Apache vs worker) on the same workload")
+    parser.add_argument("targets", nargs="+", help="name=http://host:port")
+    parser.add_argument("-e", "--engine", action="append", help="engines to cycle through (default: google, brave, duckduckgo)")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--live", action="store_true", help="real first-page searches instead of the overhead workload")
+    parser.add_argument("--query", default="weather")
+    parser.add_argument("--json", help="write raw results to this file")
+    args = parser.parse_args(argv)
+
+    engines = args.engine or ["google", "brave", "duckduckgo"]
+    rows = {}
+    print(f"{'target':>10}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}" + "".join(f"{p:>10}" for p in PHASES))
+    for target in args.targets:
+        name, _, base = target.partition("=")
+        if not base:
+            name, base = urlsplit(target).netloc, target
+        row = drive(base, engines, args.clients, args.seconds, args.live, args.query)
+        rows[name] = row
+        mean = "".join(f"{row['phases_ms'].get(p, 0):>10.2f}" for p in PHASES)
+        print(f"{name:>10}{row['rps']:>9.0f}{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['errors']:>8}{mean}")
+
+    print("\nphases: mean Server-Timing in ms; worker mode should bring `include` close to 0")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Coalesce the per-engine harness requests of one SearXNG search into a single
+POST to the sidecar's batch.php.
+
+SearXNG calls each engine's request() on its own thread at roughly the same
+time. The first 4get engine to arrive for a search becomes the leader: it waits
+a short window for the others to join, then sends every job in one request.
+Followers block until the leader's response has been split, then answer locally.
+SearXNG never calls response() for a leader that timed out, so the leader's
+batch fails itself at that timeout, and a follower never waits past half its
+own timeout (the rest is for its fallback request).
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Batch:
+    def __init__(self, group: Hashable):
+        self.group = group
+        self.jobs: Dict[str, Dict[str, Any]] = {}
+        self.cache_keys: Dict[str, str] = {}
+        self.categories: Dict[str, str] = {}
+        self.sealed = False
+        self.results: Dict[str, Any] = {}
+        self.done = threading.Event()
+        self.timer: Optional[threading.Timer] = None
+
+    def resolve(self, results: Any) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+        if isinstance(results, dict) and not self.done.is_set():
+            self.results = results
+        self.done.set()
+
+
+class BatchCoalescer:
+    """Group concurrent jobs by search; one leader per group sends them all."""
+
+    def __init__(self, enabled: bool = False, window: float = 0.015, max_jobs: int = 32, wait: float = 3.0):
+        self.enabled = enabled
+        self.window = window
+        self.max_jobs = max_jobs
+        self.wait = wait
+        self._open: Dict[Hashable, Batch] = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self.batches = 0
+        self.batched_jobs = 0
+        self.follower_timeouts = 0
+        self.abandoned = 0
+
+    @classmethod
+    def from_env(cls) -> "BatchCoalescer":
+        return cls(
+            enabled=os.environ.get("FOURGET_BATCH", "0") == "1",
+            window=float(os.environ.get("FOURGET_BATCH_WINDOW", 0.015)),
+            max_jobs=int(os.environ.get("FOURGET_BATCH_MAX_JOBS", 32)),
+            wait=float(os.environ.get("FOURGET_BATCH_WAIT", 3.0)),
+        )
+
+    def join(self, group: Hashable, engine_id: str, category: str, fourget_params: Dict[str, Any],
+             cache_key: Optional[str] = None, limit: int = 0,
+             project: Optional[Dict[str, Any]] = None) -> Tuple[Batch, str, bool]:
+        """Add a job to the open batch for GROUP. Returns (batch, job_id, is_leader)."""
+        job_id = f"{engine_id}:{next(self._ids)}"
+        job = {"id": job_id, "engine": engine_id, "category": category, "params": fourget_params}
+        if limit:
+            job["limit"] = limit
+        if project:
+            job["project"] = project
+        with self._lock:
+            batch = self._open.get(group)
+            leader = batch is None
+            if leader:
+                batch = Batch(group)
+                self._open[group] = batch
+            batch.jobs[job_id] = job
+            batch.categories[job_id] = category
+            if cache_key:
+                batch.cache_keys[job_id] = cache_key
+            if len(batch.jobs) >= self.max_jobs:
+                self._seal(batch)
+        return batch, job_id, leader
+
+    def _seal(self, batch: Batch) -> None:
+        # INVARIANT: Caller holds the lock. A sealed batch accepts no more jobs.
+        batch.sealed = True
+        if self._open.get(batch.group) is batch:
+            del self._open[batch.group]
+
+    def collect(self, batch: Batch) -> list:
+        """Leader: wait out the window, seal, and return the jobs to send."""
+        if not batch.sealed:
+            time.sleep(self.window)
+        with self._lock:
+            self._seal(batch)
+            jobs = list(batch.jobs.values())
+        if len(jobs) > 1:
+            self.batches += 1
+            self.batched_jobs += len(jobs)
+        return jobs
+
+    def watch(self, batch: Batch, timeout: float) -> None:
+        """Leader: fail the batch for its followers once SearXNG has given up on the leader."""
+        batch.timer = threading.Timer(timeout, self._abandon, (batch,))
+        batch.timer.daemon = True
+        batch.timer.start()
+
+    def _abandon(self, batch: Batch) -> None:
+        if not batch.done.is_set():
+            self.abandoned += 1
+            batch.resolve({})
+
+    def await_result(self, batch: Batch, job_id: str, budget: Optional[float] = None) -> Optional[Any]:
+        """Follower: the leader's payload for JOB_ID, or None to fall back to a direct request.
+
+        Waits at most `wait`, and at most BUDGET seconds (what the follower can spare of its own timeout).
+        """
+        wait = self.wait if budget is None else max(0.0, min(self.wait, budget))
+        if not batch.done.wait(wait):
+            self.follower_timeouts += 1
+            return None
+        return batch.results.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "batches": self.batches,
+            "batched_jobs": self.batched_jobs,
+            "jobs_per_batch": self.batched_jobs / self.batches if self.batches else 0.0,
+            "follower_timeouts": self.follower_timeouts,
+            "abandoned": self.abandoned,
+        }
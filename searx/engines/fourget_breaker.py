@@ -0,0 +1,176 @@
+"""
+Circuit breaker per 4get engine, shared by every SearXNG worker and instance.
+
+SearXNG suspends an engine per worker process, so a broken scraper keeps
+costing a sidecar worker and an upstream request on every search in every
+other worker. `CircuitBreaker` counts consecutive errors and consecutive
+empty first pages per engine in valkey (via SharedStore, per-worker LRU
+without it). Past a threshold it opens: dispatch_request skips the engine
+for a cooldown. After the cooldown one request, whichever worker wins a
+SET NX, goes through as a half-open probe; success closes the breaker,
+failure reopens it with a doubled cooldown.
+
+Sidecar answers that ask for a suspension (captcha, 429, blocked) trip the
+breaker at once for that long, which shares SearXNG's suspension across
+workers.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from fourget_cache import SharedStore, has_results
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# outcomes
+OK = "ok"
+EMPTY = "empty"
+ERROR = "error"
+
+
+def classify(payload: Any, first_page: bool = True) -> Optional[str]:
+    """OK/EMPTY/ERROR for a harness payload; None when it says nothing about engine health."""
+    if isinstance(payload, dict) and payload.get("status") == "error":
+        return ERROR
+    if has_results(payload):
+        return OK
+    # HAZARD: Later pages run out legitimately; only an empty first page is suspicious.
+    return EMPTY if first_page else None
+
+
+class CircuitBreaker:
+    def __init__(self, enabled: bool = False, errors: int = 5, empties: int = 10, window: float = 300.0,
+                 cooldown: float = 60.0, max_cooldown: float = 900.0, probe_timeout: float = 30.0,
+                 suspend_trip: float = 60.0, use_valkey: bool = True):
+        self.enabled = enabled
+        self.errors = errors
+        self.empties = empties
+        self.window = window
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.probe_timeout = probe_timeout
+        self.suspend_trip = suspend_trip
+        self.store = SharedStore("breaker", maxsize=1024, use_valkey=use_valkey)
+        self._lock = threading.Lock()
+        self._seen = set()
+        self.skipped = 0
+        self.probes = 0
+        self.trips = 0
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreaker":
+        return cls(
+            enabled=os.environ.get("FOURGET_BREAKER", "0") == "1",
+            errors=int(os.environ.get("FOURGET_BREAKER_ERRORS", 5)),
+            empties=int(os.environ.get("FOURGET_BREAKER_EMPTY", 10)),
+            cooldown=float(os.environ.get("FOURGET_BREAKER_COOLDOWN", 60.0)),
+            max_cooldown=float(os.environ.get("FOURGET_BREAKER_MAX_COOLDOWN", 900.0)),
+            use_valkey=os.environ.get("FOURGET_CACHE_VALKEY", "1") != "0",
+        )
+
+    # --- dispatch side ---
+
+    def allow(self, engine_id: str) -> Optional[bool]:
+        """None: closed, send normally. True: send as the half-open probe. False: skip."""
+        if not self.enabled:
+            return None
+        self._seen.add(engine_id)
+        state = self.store.get(f"{engine_id}:state")
+        if not isinstance(state, dict):
+            return None
+        if time.time() < state.get("until", 0):
+            self.skipped += 1
+            return False
+        # INVARIANT: One probe across all workers; it expires so a probe lost to a timeout can't wedge the breaker.
+        if self.store.add(f"{engine_id}:probe", 1, self.probe_timeout):
+            self.probes += 1
+            logger.info(f'4get {engine_id} breaker half-open, probing')
+            return True
+        self.skipped += 1
+        return False
+
+    # --- response side ---
+
+    def record(self, engine_id: str, outcome: Optional[str], suspend: float = 0) -> None:
+        if not self.enabled or outcome is None:
+            return
+        state = self.store.get(f"{engine_id}:state")
+        if outcome == OK:
+            if isinstance(state, dict):
+                self.store.delete(f"{engine_id}:state")
+                self.store.delete(f"{engine_id}:probe")
+                logger.info(f'4get {engine_id} breaker closed')
+            self.store.delete(f"{engine_id}:errors")
+            self.store.delete(f"{engine_id}:empty")
+            return
+
+        if isinstance(state, dict):
+            # a failed probe (or a straggler from before the trip): back off harder
+            if time.time() >= state.get("until", 0):
+                self._trip(engine_id, f"probe {outcome}", state.get("cooldown", self.cooldown) * 2,
+                           state.get("trips", 0))
+            return
+
+        if outcome == ERROR and suspend >= self.suspend_trip:
+            self._trip(engine_id, f"sidecar asked to suspend {int(suspend)}s", suspend, 0)
+            return
+
+        if outcome == ERROR:
+            count, limit = self.store.incr(f"{engine_id}:errors", self.window), self.errors
+        else:
+            count, limit = self.store.incr(f"{engine_id}:empty", self.window), self.empties
+        if count >= limit:
+            self._trip(engine_id, f"{count} consecutive {'errors' if outcome == ERROR else 'empty responses'}",
+                       self.cooldown, 0)
+
+    def _trip(self, engine_id: str, reason: str, cooldown: float, trips: int) -> None:
+        cooldown = min(self.max_cooldown, max(1.0, cooldown))
+        now = time.time()
+        state = {"until": now + cooldown, "cooldown": cooldown, "reason": reason, "since": now, "trips": trips + 1}
+        # stays readable past `until` so the half-open step can tell a probe result from a fresh failure
+        self.store.set(f"{engine_id}:state", state, cooldown + self.max_cooldown)
+        self.store.delete(f"{engine_id}:probe")
+        self.store.delete(f"{engine_id}:errors")
+        self.store.delete(f"{engine_id}:empty")
+        with self._lock:
+            self.trips += 1
+        logger.warning(f'4get {engine_id} breaker open for {cooldown:g}s: {reason}')
+
+    # --- inspection ---
+
+    def state(self, engine_id: str) -> Dict[str, Any]:
+        state = self.store.get(f"{engine_id}:state")
+        errors = self.store.get(f"{engine_id}:errors") or 0
+        empty = self.store.get(f"{engine_id}:empty") or 0
+        if not isinstance(state, dict):
+            return {"state": CLOSED, "errors": errors, "empty": empty}
+        remaining = state.get("until", 0) - time.time()
+        return {
+            "state": OPEN if remaining > 0 else HALF_OPEN,
+            "reopens_in": round(max(0.0, remaining), 1),
+            "reason": state.get("reason"),
+            "cooldown": state.get("cooldown"),
+            "trips": state.get("trips"),
+            "errors": errors,
+            "empty": empty,
+        }
+
+    def reset(self, engine_id: str) -> None:
+        for suffix in ("state", "probe", "errors", "empty"):
+            self.store.delete(f"{engine_id}:{suffix}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "backend": self.store.backend,
+            "skipped": self.skipped,
+            "probes": self.probes,
+            "trips": self.trips,
+            "engines": {engine_id: self.state(engine_id) for engine_id in sorted(self._seen)},
+        }
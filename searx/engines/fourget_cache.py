@@ -0,0 +1,473 @@
+"""
+Shared state for the 4get hijacked engines.
+
+`SharedStore` keeps JSON values in SearXNG's valkey when one is configured and
+falls back to a bounded in-process LRU otherwise (or when valkey errors), so
+every feature built on it degrades to per-worker state instead of failing.
+`ResultCache` sits in front of the sidecar and stores raw harness payloads.
+`SideArrays` keeps the image/video/news arrays a web scrape brought along.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from fourget_stream import CATEGORY_MAIN_TYPES
+
+logger = logging.getLogger(__name__)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def valkey_client():
+    """SearXNG's shared valkey connection, or None when it isn't configured."""
+    try:
+        from searx import valkeydb
+        return valkeydb.client()
+    except Exception:
+        pass
+    try:
+        # HAZARD: Older SearXNG releases still ship the module as `redisdb`.
+        from searx import redisdb
+        return redisdb.client()
+    except Exception:
+        return None
+
+
+class LRUStore:
+    """Thread-safe bounded LRU with per-entry expiry."""
+
+    def __init__(self, maxsize: int = 2048):
+        self.maxsize = maxsize
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires and expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float = 0) -> None:
+        expires = time.monotonic() + ttl if ttl else 0
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def _live(self, key: str) -> Optional[tuple]:
+        # INVARIANT: Caller holds the lock.
+        entry = self._data.get(key)
+        if entry is not None and entry[0] and entry[0] < time.monotonic():
+            del self._data[key]
+            return None
+        return entry
+
+    def add(self, key: str, value: Any, ttl: float = 0) -> bool:
+        """Set KEY only if it is absent. True if this call set it."""
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+        # HAZARD: Another thread can win between the check and the set; the callers only need
+        # "usually one", cross-worker exclusivity comes from valkey.
+        self.set(key, value, ttl)
+        return True
+
+    def incr(self, key: str, ttl: float = 0) -> int:
+        """Increment an integer counter; TTL starts when the counter is created."""
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                expires, value = (time.monotonic() + ttl if ttl else 0), 0
+            else:
+                expires, value = entry
+            value = (value if isinstance(value, int) else 0) + 1
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            return value
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SharedStore:
+    """JSON key/value store in valkey with an LRUStore fallback."""
+
+    # seconds between lookups of a valkey client that wasn't there
+    VALKEY_RETRY = 30.0
+
+    def __init__(self, namespace: str, maxsize: int = 2048, use_valkey: bool = True):
+        self.namespace = namespace
+        self.local = LRUStore(maxsize)
+        self._use_valkey = use_valkey
+        self._valkey = None
+        self._valkey_retry_at = 0.0
+
+    def _client(self):
+        # INVARIANT: Resolve lazily; valkeydb is initialised by the webapp after engines are imported.
+        if not self._use_valkey or self._valkey is not None:
+            return self._valkey
+        # HAZARD: A miss is remembered too; valkey_client() imports on every call, on the request path.
+        now = time.monotonic()
+        if now >= self._valkey_retry_at:
+            self._valkey = valkey_client()
+            self._valkey_retry_at = now + self.VALKEY_RETRY
+        return self._valkey
+
+    @property
+    def backend(self) -> str:
+        return "valkey" if self._client() is not None else "local"
+
+    def _key(self, key: str) -> str:
+        return f"fourget:{self.namespace}:{key}"
+
+    def get(self, key: str) -> Any:
+        client = self._client()
+        if client is not None:
+            try:
+                raw = client.get(self._key(key))
+                return json.loads(raw) if raw is not None else None
+            except Exception as e:
+                logger.debug(f'valkey get failed for {self.namespace}, using local store: {e}')
+        return self.local.get(key)
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        client = self._client()
+        if client is not None:
+            try:
+                client.set(self._key(key), json.dumps(value, separators=(",", ":")), ex=max(1, int(ttl)))
+                return
+            except Exception as e:
+                logger.debug(f'valkey set failed for {self.namespace}, using local store: {e}')
+        self.local.set(key, value, ttl)
+
+    def delete(self, key: str) -> None:
+        client = self._client()
+        if client is not None:
+            try:
+                client.delete(self._key(key))
+            except Exception as e:
+                logger.debug(f'valkey delete failed for {self.namespace}: {e}')
+        self.local.delete(key)
+
+    def add(self, key: str, value: Any, ttl: float) -> bool:
+        """SET NX: store VALUE only if KEY is absent. True if this caller won."""
+        client = self._client()
+        if client is not None:
+            try:
+                return bool(client.set(self._key(key), json.dumps(value, separators=(",", ":")),
+                                       ex=max(1, int(ttl)), nx=True))
+            except Exception as e:
+                logger.debug(f'valkey add failed for {self.namespace}, using local store: {e}')
+        return self.local.add(key, value, ttl)
+
+    def incr(self, key: str, ttl: float) -> int:
+        """Atomic counter that expires TTL seconds after its first increment."""
+        client = self._client()
+        if client is not None:
+            try:
+                name = self._key(key)
+                value = int(client.incr(name))
+                if value == 1:
+                    client.expire(name, max(1, int(ttl)))
+                return value
+            except Exception as e:
+                logger.debug(f'valkey incr failed for {self.namespace}, using local store: {e}')
+        return self.local.incr(key, ttl)
+
+
+def normalize_query(query: Any) -> str:
+    """Case/whitespace-insensitive form of a query for use in keys."""
+    if not isinstance(query, str):
+        return ""
+    return " ".join(query.split()).casefold()
+
+
+def request_key(engine_id: str, category: str, fourget_params: Dict[str, Any]) -> str:
+    """Stable key for one harness request; identical searches map to the same key."""
+    keyed = dict(fourget_params)
+    keyed["s"] = normalize_query(keyed.get("s"))
+
+    # INVARIANT: get_4get_params stamps newer/older with the current time; bucket them or no
+    # time-ranged key would ever repeat.
+    newer, older = keyed.pop("newer", None), keyed.pop("older", None)
+    if isinstance(newer, int) and isinstance(older, int) and older > newer:
+        span = older - newer
+        bucket = max(600, span // 144)
+        keyed["time"] = f"{span}@{older // bucket}"
+
+    blob = json.dumps(keyed, sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.sha1(blob.encode("utf-8")).hexdigest()
+    return f"{engine_id}:{category}:{digest}"
+
+
+def has_results(payload: Any) -> bool:
+    """True if a harness payload carries anything normalize_results would emit."""
+    if not isinstance(payload, dict):
+        return False
+    for key, value in payload.items():
+        if key in ("status", "npt", "spelling"):
+            continue
+        if isinstance(value, list) and value:
+            return True
+    spelling = payload.get("spelling")
+    return isinstance(spelling, dict) and bool(spelling.get("correction"))
+
+
+class ResultCache:
+    """Raw harness payloads keyed by request_key(), with per-category TTLs."""
+
+    # Seconds; news goes stale fast, image/web result sets barely move
+    TTLS = {"web": 3600, "image": 21600, "video": 3600, "news": 300, "music": 3600}
+    DEFAULT_TTL = 1800
+    NEGATIVE_TTL = 120
+
+    def __init__(self, enabled: bool = True, maxsize: int = 2048, use_valkey: bool = True):
+        self.enabled = enabled
+        self.store = SharedStore("rc", maxsize=maxsize, use_valkey=use_valkey)
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.negative_stores = 0
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        return cls(
+            enabled=os.environ.get("FOURGET_CACHE", "1") != "0",
+            maxsize=_env_int("FOURGET_CACHE_SIZE", 2048),
+            use_valkey=os.environ.get("FOURGET_CACHE_VALKEY", "1") != "0",
+        )
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached payload, `[]` for a negative entry, or None on miss."""
+        if not self.enabled:
+            return None
+        payload = self.store.get(key)
+        if payload is None:
+            self.misses += 1
+            return None
+        if has_results(payload):
+            self.hits += 1
+        else:
+            self.negative_hits += 1
+        return payload
+
+    def put(self, key: str, category: str, payload: Any) -> None:
+        if not self.enabled:
+            return
+        # INVARIANT: Never cache upstream errors; suspension must be decided on a live response.
+        if isinstance(payload, dict) and payload.get("status") == "error":
+            return
+        if has_results(payload):
+            self.store.set(key, payload, self.TTLS.get(category, self.DEFAULT_TTL))
+            self.stores += 1
+        else:
+            self.store.set(key, [], self.NEGATIVE_TTL)
+            self.negative_stores += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": self.store.backend,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits + self.negative_hits) / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "negative_stores": self.negative_stores,
+            "local_entries": len(self.store.local),
+            "local_evictions": self.store.local.evictions,
+        }
+
+
+class PageTokens:
+    """npt values handed out by the harness, keyed by the request that will need them.
+
+    The key is request_key() of the *next* page, so the follow-up request finds its
+    token whichever SearXNG worker serves it and whichever sidecar replica answers.
+    """
+
+    # Matches the sidecar's token lifetime (backend::TOKEN_TTL)
+    TTL = 3600
+
+    def __init__(self, enabled: bool = True, maxsize: int = 4096, use_valkey: bool = True):
+        self.enabled = enabled
+        self.store = SharedStore("npt", maxsize=maxsize, use_valkey=use_valkey)
+        self.stored = 0
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "PageTokens":
+        return cls(
+            enabled=os.environ.get("FOURGET_TOKENS", "1") != "0",
+            maxsize=_env_int("FOURGET_TOKENS_SIZE", 4096),
+            use_valkey=os.environ.get("FOURGET_CACHE_VALKEY", "1") != "0",
+        )
+
+    def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        token = self.store.get(key)
+        if isinstance(token, str) and token:
+            self.hits += 1
+            return token
+        self.misses += 1
+        return None
+
+    def put(self, key: str, payload: Any) -> None:
+        if not self.enabled or not isinstance(payload, dict):
+            return
+        token = payload.get("npt")
+        if isinstance(token, str) and token:
+            self.store.set(key, token, self.TTL)
+            self.stored += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": self.store.backend,
+            "stored": self.stored,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def _side_minimums_from_env() -> Dict[str, int]:
+    # FOURGET_SIDE_MIN=image:10,video:4 -> items a stash needs to answer that tab
+    minimums = dict(SideArrays.DEFAULT_MINIMUMS)
+    for part in os.environ.get("FOURGET_SIDE_MIN", "").split(","):
+        name, _, value = part.strip().partition(":")
+        if name in minimums and value.isdigit():
+            minimums[name] = int(value)
+    return minimums
+
+
+class SideArrays:
+    """Image/video/news arrays of a first web page, for the same search's first page of those tabs.
+
+    Many `web` scrapers return them next to the web results. Keyed by request_key() of the
+    page-1 params, so engine, query, locale, safesearch and time range all have to match.
+    """
+
+    CATEGORIES = ("image", "video", "news")
+    DEFAULT_MINIMUMS = {"image": 10, "video": 4, "news": 4}
+    DEFAULT_TTL = 300
+
+    def __init__(self, enabled: bool = False, ttl: float = DEFAULT_TTL, minimums: Optional[Dict[str, int]] = None,
+                 maxsize: int = 1024, use_valkey: bool = True):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.minimums = minimums if minimums is not None else dict(self.DEFAULT_MINIMUMS)
+        self.store = SharedStore("side", maxsize=maxsize, use_valkey=use_valkey)
+        self.stored = 0
+        self.hits = {c: 0 for c in self.CATEGORIES}
+        self.short = {c: 0 for c in self.CATEGORIES}
+        self.misses = {c: 0 for c in self.CATEGORIES}
+
+    @classmethod
+    def from_env(cls) -> "SideArrays":
+        return cls(
+            enabled=os.environ.get("FOURGET_SIDE_ARRAYS", "0") == "1",
+            ttl=_env_int("FOURGET_SIDE_TTL", cls.DEFAULT_TTL),
+            minimums=_side_minimums_from_env(),
+            maxsize=_env_int("FOURGET_SIDE_SIZE", 1024),
+            use_valkey=os.environ.get("FOURGET_CACHE_VALKEY", "1") != "0",
+        )
+
+    @staticmethod
+    def key(engine_id: str, fourget_params: Dict[str, Any]) -> str:
+        return request_key(engine_id, "side", fourget_params)
+
+    def stashed_types(self) -> set:
+        """Result types put() keeps, for a web projection that must not drop them."""
+        return {name for category in self.CATEGORIES for name in CATEGORY_MAIN_TYPES.get(category, (category,))}
+
+    def put(self, key: str, payload: Any) -> None:
+        """Stash the side arrays of a web payload, if it has any."""
+        if not self.enabled or not isinstance(payload, dict) or payload.get("status") == "error":
+            return
+        side = {}
+        for category in self.CATEGORIES:
+            for name in CATEGORY_MAIN_TYPES.get(category, (category,)):
+                items = payload.get(name)
+                if isinstance(items, list) and items:
+                    side[name] = items
+        if side:
+            self.store.set(key, side, self.ttl)
+            self.stored += 1
+
+    def get(self, key: str, category: str) -> Optional[Dict[str, Any]]:
+        """A harness-shaped payload for CATEGORY, or None when the stash can't fill the page."""
+        if not self.enabled or category not in self.CATEGORIES:
+            return None
+        side = self.store.get(key)
+        if not isinstance(side, dict):
+            self.misses[category] += 1
+            return None
+        payload = {name: side[name] for name in CATEGORY_MAIN_TYPES.get(category, (category,))
+                   if isinstance(side.get(name), list)}
+        if sum(len(items) for items in payload.values()) < max(1, self.minimums.get(category, 1)):
+            self.short[category] += 1
+            return None
+        self.hits[category] += 1
+        return payload
+
+    # A tab whose first page came from here has no page token for its second page
+
+    def mark_served(self, next_page_key: str) -> None:
+        # as long as the token it stands in for would have lived
+        self.store.set("served:" + next_page_key, 1, PageTokens.TTL)
+
+    def was_served(self, page_key: str) -> bool:
+        return self.enabled and self.store.get("served:" + page_key) is not None
+
+    def stats(self) -> Dict[str, Any]:
+        categories = {}
+        for category in self.CATEGORIES:
+            hits, short, misses = self.hits[category], self.short[category], self.misses[category]
+            lookups = hits + short + misses
+            categories[category] = {
+                "hits": hits,
+                "short": short,
+                "misses": misses,
+                "hit_ratio": hits / lookups if lookups else 0.0,
+            }
+        hits = sum(self.hits.values())
+        lookups = hits + sum(self.short.values()) + sum(self.misses.values())
+        return {
+            "enabled": self.enabled,
+            "backend": self.store.backend,
+            "ttl": self.ttl,
+            "minimums": self.minimums,
+            "stored": self.stored,
+            "hits": hits,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "categories": categories,
+        }
@@ -0,0 +1,105 @@
+"""
+In-response deduplication of normalized 4get results.
+
+Web methods (google, brave, qwant, startpage...) return the same URL in their
+`web`, `news` and `video` arrays. `ResultIndex` keeps one result per canonical
+URL with a dict index (O(n) per response): the richest variant wins and the
+fields it lacks are filled in from the others. Images are keyed on `img_src`
+and only collapse with other images.
+"""
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from fourget_urls import canonical_url
+
+# Fields that make a variant "richer"; also the ones filled in from a dropped duplicate
+RICH_FIELDS = ("thumbnail", "thumbnail_src", "publishedDate", "author", "length", "views")
+
+
+def richness(result: Dict[str, Any]) -> int:
+    score = sum(1 for field in RICH_FIELDS if result.get(field))
+    return score + 1 if result.get("content") else score
+
+
+def dedup_key(result: Any):
+    """(namespace, canonical url), or None for results that are never deduplicated."""
+    if not isinstance(result, dict) or "infobox" in result:
+        return None
+    if result.get("template") == "images.html":
+        url = canonical_url(result.get("img_src"))
+        return ("image", url) if url else None
+    url = canonical_url(result.get("url"))
+    return ("link", url) if url else None
+
+
+class ResultIndex:
+    """Dedup normalized results of one response as they are appended."""
+
+    __slots__ = ("results", "enabled", "_index", "unique", "duplicates", "dropped_chars")
+
+    def __init__(self, results: List[Any], enabled: bool = True):
+        self.results = results
+        self.enabled = enabled
+        self._index = {}
+        self.unique = 0
+        self.duplicates = 0
+        self.dropped_chars = 0
+
+    def add(self, result: Any) -> bool:
+        """Append RESULT, or merge it into an earlier duplicate. True if it was appended."""
+        key = dedup_key(result) if self.enabled else None
+        if key is None:
+            self.results.append(result)
+            return True
+
+        pos = self._index.get(key)
+        if pos is None:
+            self._index[key] = len(self.results)
+            self.unique += 1
+            self.results.append(result)
+            return True
+
+        kept = self.results[pos]
+        if richness(result) > richness(kept):
+            kept, result = result, kept
+            # INVARIANT: The winner takes the loser's slot, so result order is still first-seen.
+            self.results[pos] = kept
+
+        for field in RICH_FIELDS:
+            if not kept.get(field) and result.get(field):
+                kept[field] = result[field]
+        if not kept.get("content") and result.get("content"):
+            kept["content"] = result["content"]
+
+        self.duplicates += 1
+        self.dropped_chars += sum(len(v) for v in result.values() if isinstance(v, str))
+        return False
+
+
+class DedupReport:
+    """Per-engine duplicate ratio, for seeing how much payload dedup saves."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engines = defaultdict(lambda: {"responses": 0, "results": 0, "duplicates": 0, "dropped_chars": 0})
+
+    def record(self, engine_id: str, index: ResultIndex) -> None:
+        with self._lock:
+            stats = self._engines[engine_id or "unknown"]
+            stats["responses"] += 1
+            stats["results"] += index.unique + index.duplicates
+            stats["duplicates"] += index.duplicates
+            stats["dropped_chars"] += index.dropped_chars
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            engines = {name: dict(stats) for name, stats in self._engines.items()}
+        for stats in engines.values():
+            stats["duplicate_ratio"] = stats["duplicates"] / stats["results"] if stats["results"] else 0.0
+        return engines
+
+
+def enabled_from_env() -> bool:
+    return os.environ.get("FOURGET_DEDUP", "1") != "0"
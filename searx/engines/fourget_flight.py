@@ -0,0 +1,164 @@
+"""
+Singleflight for identical harness requests.
+
+A trending query makes every worker send the same {engine, category, params}
+to the sidecar at once, and each one scrapes upstream again. `Singleflight`
+lets the first request for a cache key lead and the others follow:
+
+- inside a worker, followers wait on the leader's Flight and get copies of
+  its normalized results;
+- across workers and SearXNG instances, leaders race for a SET NX lock in
+  valkey; the losers poll the result cache, where the winner's response()
+  puts the payload.
+
+A follower whose leader fails, times out or never answers sends its own
+request, so coalescing can only delay a search by `wait`, never lose it.
+SearXNG never calls response() for a request that timed out, so a leader can
+vanish without finish(); a flight older than `wait` is dropped and the next
+request for its key leads a fresh one.
+"""
+import copy
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from fourget_cache import ResultCache, SharedStore
+
+logger = logging.getLogger(__name__)
+
+
+class Flight:
+    __slots__ = ("key", "done", "results", "followers", "started")
+
+    def __init__(self, key: str):
+        self.key = key
+        self.done = threading.Event()
+        self.results: Optional[List[Any]] = None
+        self.followers = 0
+        self.started = time.monotonic()
+
+
+class Singleflight:
+    def __init__(self, enabled: bool = False, wait: float = 3.0, lock_ttl: float = 10.0, poll: float = 0.05,
+                 cache: Optional[ResultCache] = None, use_valkey: bool = True):
+        self.enabled = enabled
+        self.wait = wait
+        self.lock_ttl = lock_ttl
+        self.poll = poll
+        self.cache = cache
+        self.locks = SharedStore("flight", maxsize=1024, use_valkey=use_valkey)
+        self._flights: Dict[str, Flight] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.local_followers = 0
+        self.remote_followers = 0
+        self.fallbacks = 0
+        self.abandoned = 0
+
+    @classmethod
+    def from_env(cls, cache: Optional[ResultCache] = None) -> "Singleflight":
+        return cls(
+            enabled=os.environ.get("FOURGET_SINGLEFLIGHT", "0") == "1",
+            wait=float(os.environ.get("FOURGET_SINGLEFLIGHT_WAIT", 3.0)),
+            cache=cache,
+            use_valkey=os.environ.get("FOURGET_CACHE_VALKEY", "1") != "0",
+        )
+
+    # --- inside this worker ---
+
+    def join(self, key: str) -> Tuple[Flight, bool]:
+        """The in-flight request for KEY and whether the caller leads it."""
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is not None and time.monotonic() - flight.started < self.wait:
+                flight.followers += 1
+                return flight, False
+            if flight is not None:
+                # HAZARD: Its leader timed out inside SearXNG and will never finish(); don't queue behind it.
+                self.abandoned += 1
+            flight = self._flights[key] = Flight(key)
+        return flight, True
+
+    def await_results(self, flight: Flight) -> Optional[List[Any]]:
+        """Follower: copies of the leader's normalized results, or None to send our own request."""
+        if not flight.done.wait(max(0.0, flight.started + self.wait - time.monotonic())):
+            self._evict(flight)
+            self.fallbacks += 1
+            return None
+        if flight.results is None:
+            self.fallbacks += 1
+            return None
+        self.local_followers += 1
+        return copy.deepcopy(flight.results)
+
+    def finish(self, flight: Flight, results: Optional[List[Any]]) -> None:
+        """Leader: publish RESULTS (None = failed) and retire the flight."""
+        if flight.done.is_set():
+            return
+        # HAZARD: SearXNG annotates and merges results in place (engine, positions, infobox urls);
+        # snapshot before the leader's search gets them, and followers deep-copy the snapshot.
+        flight.results = copy.deepcopy(results) if results is not None else None
+        self._evict(flight)
+        flight.done.set()
+
+    def _evict(self, flight: Flight) -> None:
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+    # --- across workers ---
+
+    @property
+    def shared(self) -> bool:
+        # INVARIANT: Remote followers read the leader's payload from the result cache; both must be in valkey.
+        return (self.cache is not None and self.cache.enabled and self.cache.store.backend == "valkey"
+                and self.locks.backend == "valkey")
+
+    def claim(self, key: str) -> bool:
+        """True if this worker should call the sidecar for KEY."""
+        if not self.shared:
+            self.leaders += 1
+            return True
+        if self.locks.add(key, os.getpid(), self.lock_ttl):
+            self.leaders += 1
+            return True
+        return False
+
+    def release(self, key: str) -> None:
+        self.locks.delete(key)
+
+    def await_payload(self, key: str) -> Optional[Any]:
+        """Remote follower: poll for the winner's payload until it lands or the winner gives up."""
+        deadline = time.monotonic() + self.wait
+        while time.monotonic() < deadline:
+            time.sleep(self.poll)
+            payload = self.cache.store.get(key)
+            if payload is not None:
+                self.remote_followers += 1
+                return payload
+            if self.locks.get(key) is None:
+                # released without a cache entry: the winner failed or got an error payload
+                payload = self.cache.store.get(key)
+                if payload is not None:
+                    self.remote_followers += 1
+                    return payload
+                break
+        self.fallbacks += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        followers = self.local_followers + self.remote_followers
+        total = self.leaders + followers
+        return {
+            "enabled": self.enabled,
+            "shared": self.shared if self.enabled else False,
+            "leaders": self.leaders,
+            "local_followers": self.local_followers,
+            "remote_followers": self.remote_followers,
+            "fallbacks": self.fallbacks,
+            "abandoned": self.abandoned,
+            "in_flight": len(self._flights),
+            "coalescing_ratio": followers / total if total else 0.0,
+        }
@@ -1,15 +1,36 @@
+import os
 import re
+from collections import Counter
 from typing import Dict, Any, Optional
 from datetime import datetime
 import time
-from urllib.parse import urlparse, unquote_plus
 from html import unescape
 from searx.result_types import Answer
+from fourget_batch import BatchCoalescer
+from fourget_breaker import ERROR, CircuitBreaker, classify as classify_outcome
+from fourget_cache import PageTokens, ResultCache, SideArrays, has_results, normalize_query, request_key
+from fourget_dedup import DedupReport, ResultIndex, enabled_from_env as dedup_enabled
+from fourget_flight import Singleflight
+from fourget_stream import (
+    CATEGORY_MAIN_TYPES, HarnessStreamParser, ResponseStats, StreamConfig, StreamReport, StreamTruncated,
+    iter_body_chunks, traced_peak
+)
+from fourget_metrics import Metrics, PhaseReport
+from fourget_pool import EndpointPool
+from fourget_projection import Projection, ProjectionReport
+from fourget_specs import engine_spec
+from fourget_timeouts import AdaptiveTimeouts, engine_timeout
+from fourget_urls import (
+    BROKEN, INVALID, NUL, ROOT, classify_image_source, classify_thumbnail, is_valid_url, memo_stats,
+    rejection_reason, sanitize_url,
+)
+from fourget_wire import decode_body, request_headers
 from searx.exceptions import (
     SearxEngineCaptchaException,
     SearxEngineTooManyRequestsException,
     SearxEngineResponseException
 )
+from searx.network.raise_for_httperror import raise_for_httperror
 import logging
 
 logger = logging.getLogger(__name__)
@@ -22,24 +43,48 @@ about = {
 }
 
 # PRE-COMPILED REGEX
-_BROKEN_IMAGE_RE = re.compile(
-    r'''(?x)
-    # Data URI for 1x1 transparent GIF (exact prefix)
-    ^data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP
-    |
-    # Pixel trackers - specific filenames only (consistent extensions)
-    /(?:1x1|spacer|blank|tracking)\.(gif|png|jpg|jpeg|webp)(?:\?|$)
-    |
-    # Placeholder patterns - exact filenames (consistent extensions)
-    /(?:placeholder|no[-_]?image|image[-_]?not[-_]?found|default[-_]?(?:image|thumb)|broken[-_]?image)\.(gif|png|jpg|jpeg|svg|webp)(?:\?|$)
-    ''',
-    re.IGNORECASE
-)
 _WHITESPACE_RE = re.compile(r'\s+')
 
+_POOL = EndpointPool.from_env()
+_RESULT_CACHE = ResultCache.from_env()
+_PAGE_TOKENS = PageTokens.from_env()
+_SIDE = SideArrays.from_env()
+_BATCHER = BatchCoalescer.from_env()
+_STREAM = StreamConfig.from_env()
+_STREAM_REPORT = StreamReport()
+_DEDUP = dedup_enabled()
+_DEDUP_REPORT = DedupReport()
+_AVOIDED_CALLS = Counter()  # (engine_id, reason) -> sidecar calls answered locally
+_METRICS = Metrics.from_env()
+_PHASES = PhaseReport(_METRICS)
+_TIMEOUTS = AdaptiveTimeouts.from_env()
+_BREAKER = CircuitBreaker.from_env()
+_FLIGHTS = Singleflight.from_env(_RESULT_CACHE)
+_PROJECTION = Projection.from_env()
+_PROJECTED = ProjectionReport()
+# Send the sidecar the moment SearXNG stops waiting, so it can stop scraping too
+_DEADLINE = os.environ.get("FOURGET_DEADLINE", "0") == "1"
+# fourget_urls verdicts -> metric labels
+_URL_DROP_REASONS = {INVALID: 'invalid_url', BROKEN: 'broken_image', ROOT: 'root_path', NUL: 'nul_bytes'}
+
+
+def _page_windows_from_env() -> Dict[str, int]:
+    # FOURGET_PAGE_WINDOW=web:10,image:50 -> fixed-size pages cut by the sidecar from scraper pages
+    windows = {}
+    for part in os.environ.get("FOURGET_PAGE_WINDOW", "").split(","):
+        name, _, value = part.partition(":")
+        if name.strip() and value.strip().isdigit() and int(value) > 0:
+            windows[name.strip()] = int(value)
+    return windows
+
+
+_PAGE_WINDOWS = _page_windows_from_env()
+
 class FourgetHijackerClient:
     MAX_CONTENT_LENGTH = 5000
-    DEFAULT_PAGE_SIZE = 10  # 4get engines return ~10 results per page
+    # Offset step per SearXNG page. Only a key for the sidecar's stored npt (PAGING_CLIENT_STEP in paging.php);
+    # real page sizes are learned by the sidecar.
+    DEFAULT_PAGE_SIZE = 10
 
     # --- Constants ---
     NSFW_MAP = {0: "yes", 1: "maybe", 2: "no"}
@@ -50,12 +95,36 @@ class FourgetHijackerClient:
     YANDEX_LANGS = frozenset(["en", "ru", "be", "fr", "de", "id", "kk", "tt", "tr", "uk"])
 
     _NORMALIZERS = {}  # Populated at end of class to avoid undefined references
+    _PLANS = {}  # (engine_id, category) -> normalizer table specialized from 4get_engine_specs.json
+    _PROJECTIONS = {}  # (engine_id, category) -> projection sent with harness requests (FOURGET_PROJECTION=1)
+
+    # Result types the capabilities extractor never looks for; always kept in engine plans
+    UNSPECCED_TYPES = frozenset(["author", "user"])
+    # Params we derive from SearXNG state; dropped when the scraper never reads them (spec `inputs`)
+    FILTERABLE_PARAMS = ("nsfw", "lang", "country", "newer", "older")
     _TEMPLATES = {"image": "images.html", "video": "videos.html"}
 
+    # Sidecar base URLs come from the endpoint pool (FOURGET_SIDECARS); these are paths on any of them
+    HARNESS_PATH = '/harness.php'
+    BATCH_PATH = '/batch.php'
+    # Static file on the sidecar; lets a locally answered request still reach response()
+    LOCAL_ANSWER_PATH = '/local.json'
+    # Opt-in replacement for LOCAL_ANSWER_PATH, e.g. SearXNG's own /healthz, so cache hits don't
+    # depend on a sidecar. HAZARD: It goes through SearXNG's outgoing proxies and waits for a free
+    # SearXNG worker, the same pool serving the search.
+    LOCAL_ANSWER_URL = os.environ.get('FOURGET_LOCAL_URL', '')
+
 
     @staticmethod
     def dispatch_request(engine_id: str, query: str, params: Dict[str, Any]) -> Dict[str, Any]:
         """ROUTE: Centralized request handler for all 4get hijacked engines."""
+        unsupported = FourgetHijackerClient._unsupported_request(engine_id, params)
+        if unsupported:
+            # INVARIANT: The scraper can't answer this; don't spend a sidecar worker finding out.
+            _AVOIDED_CALLS[(engine_id, unsupported)] += 1
+            params['url'] = None
+            return params
+
         fourget_params = FourgetHijackerClient.get_4get_params(query, params, engine_name=engine_id)
 
         # HAZARD: SearXNG params might be dict or OnlineParams object. getattr() is safer here.
@@ -73,30 +142,502 @@ class FourgetHijackerClient:
             category = 'video'
 
 
+        params['fourget_category'] = category
+        limit = _PAGE_WINDOWS.get(category, 0)
+
+        # INVARIANT: Windowed and full pages of one offset differ; keep them apart in the cache.
+        cache_key = request_key(engine_id, category, dict(fourget_params, limit=limit) if limit else fourget_params)
+        cached = _RESULT_CACHE.get(cache_key)
+        if cached is not None:
+            return FourgetHijackerClient._answer_locally(params, cached)
+        params['fourget_cache_key'] = cache_key
+
+        if _SIDE.enabled and not limit and not fourget_params.get('offset') and not fourget_params.get('npt'):
+            if category == 'web':
+                params['fourget_side_key'] = SideArrays.key(engine_id, fourget_params)
+            else:
+                side = FourgetHijackerClient._from_side_arrays(engine_id, category, fourget_params, params)
+                if side is not None:
+                    return side
+
+        # INVARIANT: After the cache; an open breaker still serves what we already have.
+        if _BREAKER.allow(engine_id) is False:
+            _AVOIDED_CALLS[(engine_id, 'breaker')] += 1
+            params['url'] = None
+            return params
+
+        if _FLIGHTS.enabled:
+            shared = FourgetHijackerClient._coalesce(cache_key, params)
+            if shared is not None:
+                return shared
+
+        # INVARIANT: Tokens travel with the client so any sidecar replica can serve the next page.
+        # Window mode keeps its npt in the sidecar's buffer instead.
+        if not limit:
+            FourgetHijackerClient._attach_page_token(engine_id, category, fourget_params, params)
+            if _SIDE.enabled:
+                FourgetHijackerClient._after_side_page(engine_id, category, fourget_params)
+
+        if _BATCHER.enabled:
+            batched = FourgetHijackerClient._join_batch(engine_id, query, category, fourget_params, params, limit)
+            if batched is not None:
+                return batched
+
+        # INVARIANT: The stream parser only understands JSON; don't negotiate msgpack under it.
+        body = {
+            'engine': engine_id,
+            'category': category,
+            'params': fourget_params
+        }
+        if limit:
+            body['limit'] = limit
+        if _DEADLINE:
+            body['deadline'] = round(time.time() + engine_timeout(engine_id), 3)
+        if _PROJECTION.enabled:
+            body['project'] = FourgetHijackerClient._projection(engine_id, category)
+
+        params.setdefault('headers', {}).update(request_headers(allow_binary=not _STREAM.enabled, allow_zstd=not _STREAM.enabled))
+        FourgetHijackerClient._route(engine_id, params, FourgetHijackerClient.HARNESS_PATH)
         params.update({
-            'url': 'http://4get-hijacked:80/harness.php',
             'method': 'POST',
-            'json': {
-                'engine': engine_id,
-                'category': category,
-                'params': fourget_params
-            }
+            'json': body
         })
         return params
 
+    @staticmethod
+    def _coalesce(cache_key: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """COALESCE: Share one sidecar call among identical requests in flight.
+
+        Returns None when this request should go to the sidecar itself.
+        """
+        flight, leader = _FLIGHTS.join(cache_key)
+        if not leader:
+            results = _FLIGHTS.await_results(flight)
+            if results is None:
+                # HAZARD: Leader failed or timed out; don't leave this search empty-handed.
+                return None
+            return FourgetHijackerClient._answer_with_results(params, results)
+
+        params['fourget_flight'] = flight
+        if _FLIGHTS.claim(cache_key):
+            params['fourget_flight_lock'] = cache_key
+            return None
+
+        payload = _FLIGHTS.await_payload(cache_key)
+        if payload is None:
+            return None
+        return FourgetHijackerClient._answer_locally(params, payload)
+
+    @staticmethod
+    def flight_stats() -> Dict[str, Any]:
+        return _FLIGHTS.stats()
+
+    @staticmethod
+    def _projection(engine_id: str, category: str) -> Dict[str, Any]:
+        """PROJECT: The result types and fields this engine's normalizer plan reads, for the sidecar to keep."""
+        projection = FourgetHijackerClient._PROJECTIONS.get((engine_id, category))
+        if projection is None:
+            types = FourgetHijackerClient._get_normalizers(engine_id, category)
+            if _SIDE.enabled and category == 'web':
+                # HAZARD: Projected away, there would be nothing left to stash for the other tabs.
+                types = set(types) | _SIDE.stashed_types()
+            # INVARIANT: _truncate_content looks at no more than this; the sidecar may cut the rest.
+            projection = _PROJECTION.build(types, FourgetHijackerClient.MAX_CONTENT_LENGTH * 2)
+            FourgetHijackerClient._PROJECTIONS[(engine_id, category)] = projection
+        return projection
+
+    @staticmethod
+    def _record_projection(engine_id: str, saved: Any) -> None:
+        saved = _PROJECTED.record(engine_id, saved)
+        if saved:
+            _METRICS.inc('fourget_projected_bytes_total', engine_id, value=saved)
+
+    @staticmethod
+    def projection_stats() -> Dict[str, Any]:
+        """Bytes the sidecar left out of its responses per engine (FOURGET_PROJECTION=1)."""
+        return dict(_PROJECTED.as_dict(), enabled=_PROJECTION.enabled, caps=_PROJECTION.caps)
+
+    @staticmethod
+    def _route(engine_id: str, params: Dict[str, Any], path: str) -> None:
+        """Point the request at a sidecar picked by the endpoint pool."""
+        ticket = _POOL.acquire(engine_id)
+        params['url'] = ticket.endpoint.url(path)
+        params['fourget_ticket'] = ticket
+        # INVARIANT: 5xx must reach response() so the pool sees the failure; we re-raise there.
+        params['raise_for_httperror'] = False
+        params['fourget_sent'] = _METRICS.clock()
+        params['fourget_latency'] = _TIMEOUTS.start(engine_id)
+
+    @staticmethod
+    def pool_stats() -> Dict[str, Any]:
+        return _POOL.stats()
+
+    @staticmethod
+    def metrics() -> Dict[str, Any]:
+        """Per-engine counters/histograms and cost per kept result (FOURGET_METRICS=1)."""
+        return _METRICS.snapshot()
+
+    @staticmethod
+    def metrics_text() -> str:
+        """Same, in Prometheus text exposition format."""
+        return _METRICS.prometheus()
+
+    @staticmethod
+    def breaker_stats() -> Dict[str, Any]:
+        """Shared breaker state per engine (closed/open/half-open, reason, counters)."""
+        return _BREAKER.stats()
+
+    @staticmethod
+    def timeout_stats() -> Dict[str, Any]:
+        """Configured vs adaptive timeout per engine, with the latency percentiles behind it."""
+        return _TIMEOUTS.stats()
+
+    @staticmethod
+    def sidecar_timing_stats() -> Dict[str, Any]:
+        """Per-engine harness.php phase breakdown (Server-Timing) and peak memory."""
+        return _PHASES.as_dict()
+
+    @staticmethod
+    def _attach_page_token(engine_id: str, category: str, fourget_params: Dict[str, Any],
+                           params: Dict[str, Any]) -> None:
+        """Send the npt stored for this page, and say where this response's npt goes."""
+        offset = fourget_params.get('offset', 0)
+        if 'npt' not in fourget_params and offset:
+            token = _PAGE_TOKENS.get(request_key(engine_id, category, fourget_params))
+            if token:
+                fourget_params['npt'] = token
+
+        next_page = dict(fourget_params, offset=offset + FourgetHijackerClient.DEFAULT_PAGE_SIZE)
+        next_page.pop('npt', None)
+        params['fourget_token_key'] = request_key(engine_id, category, next_page)
+
+    @staticmethod
+    def token_stats() -> Dict[str, Any]:
+        return _PAGE_TOKENS.stats()
+
+    @staticmethod
+    def _from_side_arrays(engine_id: str, category: str, fourget_params: Dict[str, Any],
+                          params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """SHORT-CIRCUIT: First image/video/news page from the arrays the same search's web scrape returned."""
+        payload = _SIDE.get(SideArrays.key(engine_id, fourget_params), category)
+        if payload is None:
+            return None
+        _AVOIDED_CALLS[(engine_id, 'side_arrays')] += 1
+        next_page = dict(fourget_params, offset=FourgetHijackerClient.DEFAULT_PAGE_SIZE)
+        _SIDE.mark_served(request_key(engine_id, category, next_page))
+        return FourgetHijackerClient._answer_locally(params, payload)
+
+    @staticmethod
+    def _after_side_page(engine_id: str, category: str, fourget_params: Dict[str, Any]) -> None:
+        """Page 2 after a side-array page 1 has no npt to continue from; scrape the tab's real first page."""
+        if fourget_params.get('offset') != FourgetHijackerClient.DEFAULT_PAGE_SIZE or 'npt' in fourget_params:
+            return
+        if _SIDE.was_served(request_key(engine_id, category, fourget_params)):
+            # HAZARD: Without this the sidecar falls back to the web scrape's npt for offset 10.
+            del fourget_params['offset']
+
+    @staticmethod
+    def _stash_side(search_params: Dict[str, Any], payload: Any) -> None:
+        key = search_params.get('fourget_side_key')
+        if key:
+            _SIDE.put(key, payload)
+
+    @staticmethod
+    def side_stats() -> Dict[str, Any]:
+        """Image/video/news first pages answered from a web scrape's side arrays (FOURGET_SIDE_ARRAYS=1)."""
+        return _SIDE.stats()
+
+    @staticmethod
+    def _unsupported_request(engine_id: str, params: Dict[str, Any]) -> Optional[str]:
+        """Name of a capability this request needs and the engine's spec says it lacks."""
+        spec = engine_spec(engine_id)
+        caps = spec.get('capabilities') if spec else None
+        if not isinstance(caps, dict):
+            return None
+
+        pageno = params.get('pageno', 1)
+        if pageno and pageno > 1 and caps.get('paging') is False:
+            return 'paging'
+        return None
+
+    @staticmethod
+    def capability_stats() -> Dict[str, Any]:
+        by_engine = {}
+        for (engine_id, reason), count in list(_AVOIDED_CALLS.items()):
+            by_engine.setdefault(engine_id, {})[reason] = count
+        return {'avoided_calls': sum(_AVOIDED_CALLS.values()), 'by_engine': by_engine}
+
+    @staticmethod
+    def _join_batch(engine_id: str, query: str, category: str, fourget_params: Dict[str, Any],
+                    params: Dict[str, Any], limit: int = 0) -> Optional[Dict[str, Any]]:
+        """COALESCE: Ride one batch.php round trip with the other 4get engines of this search.
+
+        Returns None when the request should go to harness.php on its own.
+        """
+        group = (
+            normalize_query(query),
+            params.get('searxng_locale'),
+            params.get('pageno'),
+            params.get('time_range'),
+            params.get('safesearch'),
+        )
+        project = FourgetHijackerClient._projection(engine_id, category) if _PROJECTION.enabled else None
+        batch, job_id, leader = _BATCHER.join(
+            group, engine_id, category, fourget_params, cache_key=params.get('fourget_cache_key'), limit=limit,
+            project=project
+        )
+
+        if leader:
+            jobs = _BATCHER.collect(batch)
+            if len(jobs) == 1:
+                return None
+            params.setdefault('headers', {}).update(request_headers())
+            FourgetHijackerClient._route(engine_id, params, FourgetHijackerClient.BATCH_PATH)
+            body = {'jobs': jobs, 'timeout': _BATCHER.wait}
+            if _DEADLINE:
+                # INVARIANT: Every job's answer rides back on the leader's request, which SearXNG drops
+                # at the leader's timeout; scraping past that feeds nobody.
+                body['deadline'] = round(time.time() + engine_timeout(engine_id), 3)
+            params.update({
+                'method': 'POST',
+                'json': body,
+                'fourget_batch': batch,
+                'fourget_job': job_id,
+            })
+            # HAZARD: Past the leader's own timeout response() never runs; followers must not wait on it.
+            _BATCHER.watch(batch, engine_timeout(engine_id))
+            return params
+
+        # INVARIANT: Half this engine's timeout stays for the fallback request.
+        payload = _BATCHER.await_result(batch, job_id, budget=engine_timeout(engine_id) / 2)
+        if payload is None:
+            # HAZARD: Leader timed out or its request failed; don't leave this engine empty-handed.
+            return None
+        return FourgetHijackerClient._answer_locally(params, payload)
+
+    @staticmethod
+    def _split_batch(resp: Any, search_params: Dict[str, Any]) -> Any:
+        """Hand every follower its slice of a batch.php response; return the leader's own."""
+        batch = search_params['fourget_batch']
+        results = {}
+        try:
+            body = decode_body(resp)
+            results = body.get('results') if isinstance(body, dict) else None
+            if not isinstance(results, dict):
+                results = {}
+            for job_id, payload in results.items():
+                cache_key = batch.cache_keys.get(job_id)
+                if cache_key:
+                    _RESULT_CACHE.put(cache_key, batch.categories.get(job_id), payload)
+        finally:
+            # INVARIANT: Always release followers, even on a broken body, so they can fall back.
+            batch.resolve(results)
+
+        for job_id, payload in results.items():
+            job = batch.jobs.get(job_id)
+            if job:
+                suspend = payload.get('suspend', 0) if isinstance(payload, dict) else 0
+                _BREAKER.record(job['engine'], classify_outcome(payload, not job['params'].get('offset')),
+                                suspend if isinstance(suspend, (int, float)) else 0)
+                if (_SIDE.enabled and batch.categories.get(job_id) == 'web'
+                        and not job['params'].get('offset') and not job['params'].get('npt')):
+                    _SIDE.put(SideArrays.key(job['engine'], job['params']), payload)
+        # each job's harness Server-Timing, relayed in the body (empty PHP arrays arrive as lists)
+        timings = body.get('timings') if isinstance(body, dict) else None
+        if isinstance(timings, dict):
+            for job_id, header in timings.items():
+                job = batch.jobs.get(job_id)
+                if job:
+                    _PHASES.record(job['engine'], header)
+        projected = body.get('projected') if isinstance(body, dict) else None
+        if isinstance(projected, dict):
+            for job_id, saved in projected.items():
+                job = batch.jobs.get(job_id)
+                if job:
+                    FourgetHijackerClient._record_projection(job['engine'], saved)
+        return results.get(search_params.get('fourget_job'), [])
+
+    @staticmethod
+    def batch_stats() -> Dict[str, Any]:
+        return _BATCHER.stats()
+
+    @staticmethod
+    def _answer_locally(params: Dict[str, Any], payload: Any) -> Dict[str, Any]:
+        """SHORT-CIRCUIT: Serve a known harness payload without running a scraper."""
+        is_error = isinstance(payload, dict) and payload.get('status') == 'error'
+        if not is_error and not has_results(payload):
+            # INVARIANT: SearXNG skips the HTTP round trip entirely for an empty url.
+            params['url'] = None
+            if 'fourget_flight' in params:
+                # response() won't run for this one; release the followers here
+                _FLIGHTS.finish(params['fourget_flight'], [])
+            return params
+
+        # HAZARD: Online engines only reach response() through an HTTP request. Make the cheapest
+        # one we can and hand the payload over on resp.search_params.
+        FourgetHijackerClient._route_local(params)
+        params['fourget_payload'] = payload
+        return params
+
+    @staticmethod
+    def _route_local(params: Dict[str, Any]) -> None:
+        if FourgetHijackerClient.LOCAL_ANSWER_URL:
+            params['url'] = FourgetHijackerClient.LOCAL_ANSWER_URL
+            params['raise_for_httperror'] = False
+        else:
+            FourgetHijackerClient._route('', params, FourgetHijackerClient.LOCAL_ANSWER_PATH)
+        params['method'] = 'GET'
+
+    @staticmethod
+    def _answer_with_results(params: Dict[str, Any], results: list) -> Dict[str, Any]:
+        """SHORT-CIRCUIT: Hand over results another request already normalized."""
+        if not results:
+            params['url'] = None
+            return params
+        FourgetHijackerClient._route_local(params)
+        params['fourget_results'] = results
+        return params
+
+    @staticmethod
+    def cache_stats() -> Dict[str, Any]:
+        return _RESULT_CACHE.stats()
+
     @staticmethod
     def dispatch_response(resp: Any, engine_id: str, logger: Any) -> list:
         """NORMALIZE: Centralized response handler with error hoisting."""
+        search_params = getattr(resp, 'search_params', None) or {}
+        # INVARIANT: Only a harness call made for this engine says anything about its health;
+        # local answers are old news and batch jobs are judged in _split_batch.
+        live = not any(k in search_params for k in ('fourget_payload', 'fourget_results', 'fourget_batch'))
         try:
-            return FourgetHijackerClient.normalize_results(resp.json())
+            # the stub a local answer fetched says nothing; what it carries is already in search_params
+            local = 'fourget_payload' in search_params or 'fourget_results' in search_params
+            status = 200 if local else getattr(resp, 'status_code', 200)
+            _POOL.release(search_params.get('fourget_ticket'), ok=status < 500)
+            if status < 500:
+                # errors come back fast and would teach the engine a timeout it can't meet
+                _TIMEOUTS.finish(engine_id, search_params.get('fourget_latency', 0))
+            if status >= 400:
+                if 'fourget_batch' in search_params:
+                    # followers fall back to their own requests right away
+                    search_params['fourget_batch'].resolve({})
+                raise_for_httperror(resp)
+
+            if 'fourget_results' in search_params:
+                return search_params['fourget_results']
+
+            payload = search_params.get('fourget_payload')
+            if payload is not None:
+                source = 'local'
+            else:
+                _METRICS.observe_since('fourget_roundtrip_seconds', search_params.get('fourget_sent'), engine_id)
+                source = 'batch' if 'fourget_batch' in search_params else 'stream' if _STREAM.enabled else 'sidecar'
+            _METRICS.inc('fourget_requests_total', engine_id, source)
+            if source in ('sidecar', 'stream'):
+                headers = getattr(resp, 'headers', None)
+                if headers is not None:
+                    _PHASES.record(engine_id, headers.get('server-timing'))
+                    if _PROJECTION.enabled:
+                        FourgetHijackerClient._record_projection(engine_id, headers.get('x-fourget-projected'))
+
+            if source == 'batch':
+                started = _METRICS.clock()
+                payload = FourgetHijackerClient._split_batch(resp, search_params)
+                FourgetHijackerClient._record_body(resp, engine_id, started)
+            elif source == 'stream':
+                stats = ResponseStats()
+                started = _METRICS.clock()
+                # parsing and normalizing interleave here; both land in normalize time
+                results, payload = FourgetHijackerClient.normalize_stream(
+                    iter_body_chunks(resp), search_params.get('fourget_category', 'web'), stats=stats,
+                    engine_id=engine_id
+                )
+                _METRICS.observe_since('fourget_normalize_seconds', started, engine_id)
+                _METRICS.observe('fourget_payload_bytes', stats.bytes_read, engine_id)
+                # HAZARD: A payload cut by the byte budget or a short body lacks arrays and `npt`;
+                # serve it, but don't cache, stash, keep its token or count it as a healthy answer.
+                if stats.stop_reason in ('eof', 'cap'):
+                    FourgetHijackerClient._record_health(engine_id, search_params, payload)
+                    cache_key = search_params.get('fourget_cache_key')
+                    if cache_key:
+                        _RESULT_CACHE.put(cache_key, search_params.get('fourget_category'), payload)
+                    FourgetHijackerClient._stash_side(search_params, payload)
+                    FourgetHijackerClient._keep_page_token(search_params, payload)
+                return FourgetHijackerClient._counted(engine_id, results, search_params)
+            elif source == 'sidecar':
+                started = _METRICS.clock()
+                payload = decode_body(resp)
+                FourgetHijackerClient._record_body(resp, engine_id, started)
+                FourgetHijackerClient._record_health(engine_id, search_params, payload)
+                cache_key = search_params.get('fourget_cache_key')
+                if cache_key:
+                    _RESULT_CACHE.put(cache_key, search_params.get('fourget_category'), payload)
+                FourgetHijackerClient._stash_side(search_params, payload)
+            FourgetHijackerClient._keep_page_token(search_params, payload)
+
+            started = _METRICS.clock()
+            results = FourgetHijackerClient.normalize_results(
+                payload, engine_id=engine_id, category=search_params.get('fourget_category')
+            )
+            _METRICS.observe_since('fourget_normalize_seconds', started, engine_id)
+            return FourgetHijackerClient._counted(engine_id, results, search_params)
         except (SearxEngineCaptchaException, 
                 SearxEngineTooManyRequestsException, 
-                SearxEngineResponseException):
+                SearxEngineResponseException) as e:
+            if live:
+                _BREAKER.record(engine_id, ERROR, getattr(e, 'suspended_time', 0) or 0)
             # INVARIANT: Escalate SearXNG-specific exceptions so engine supervisors accurately block/suspend engines.
             raise
         except Exception as e:
+            if live:
+                _BREAKER.record(engine_id, ERROR)
             logger.debug(f'4get {engine_id} response error: {e}')
             return []
+        finally:
+            FourgetHijackerClient._land_flight(search_params)
+
+    @staticmethod
+    def _record_health(engine_id: str, search_params: Dict[str, Any], payload: Any) -> None:
+        outcome = classify_outcome(payload, first_page=(search_params.get('pageno') or 1) == 1)
+        # error payloads raise in normalization and are recorded there, with their suspend time
+        if outcome != ERROR:
+            _BREAKER.record(engine_id, outcome)
+
+    @staticmethod
+    def _record_body(resp: Any, engine_id: str, started: float) -> None:
+        if not _METRICS.enabled:
+            return
+        _METRICS.observe_since('fourget_decode_seconds', started, engine_id)
+        content = getattr(resp, 'content', None)
+        if isinstance(content, (bytes, str)):
+            # a batch body is attributed to the engine that led the batch
+            _METRICS.observe('fourget_payload_bytes', len(content), engine_id)
+
+    @staticmethod
+    def _counted(engine_id: str, results: list, search_params: Dict[str, Any]) -> list:
+        _METRICS.count_results(engine_id, results)
+        _METRICS.maybe_dump()
+        flight = search_params.get('fourget_flight')
+        if flight is not None:
+            _FLIGHTS.finish(flight, results)
+        return results
+
+    @staticmethod
+    def _land_flight(search_params: Dict[str, Any]) -> None:
+        # no-op after _counted; on errors the followers go send their own requests
+        flight = search_params.get('fourget_flight')
+        if flight is not None:
+            _FLIGHTS.finish(flight, None)
+        lock = search_params.get('fourget_flight_lock')
+        if lock:
+            _FLIGHTS.release(lock)
+
+    @staticmethod
+    def _keep_page_token(search_params: Dict[str, Any], payload: Any) -> None:
+        # INVARIANT: Only live responses set fourget_token_key; cache hits would hand back expired tokens.
+        token_key = search_params.get('fourget_token_key')
+        if token_key:
+            _PAGE_TOKENS.put(token_key, payload)
 
     @staticmethod
     def get_4get_params(query: str, params: Dict[str, Any], engine_name: str = None) -> Dict[str, Any]:
@@ -143,62 +684,45 @@ class FourgetHijackerClient:
         if pageno and pageno > 1:
             fourget_params["offset"] = (pageno - 1) * FourgetHijackerClient.DEFAULT_PAGE_SIZE
 
+        FourgetHijackerClient._drop_unsupported_params(fourget_params, engine_name)
+
+        # INVARIANT: Explicit per-engine fg_ params are user intent; never filtered by the spec.
         prefix = "fg_"
         for k, v in params.items():
             if k.startswith(prefix):
                 raw_key = k[len(prefix):]
                 fourget_params[raw_key] = v
 
-
-
         return fourget_params
 
+    @staticmethod
+    def _drop_unsupported_params(fourget_params: Dict[str, Any], engine_name: str) -> None:
+        """Strip params the target scraper never reads, per its spec `inputs`."""
+        spec = engine_spec(engine_name) if engine_name else None
+        inputs = spec.get("inputs") if spec else None
+        if not inputs:
+            return
+
+        for key in FourgetHijackerClient.FILTERABLE_PARAMS:
+            if key in fourget_params and key not in inputs:
+                del fourget_params[key]
+
+        # HAZARD: harness.php derives the npt lookup from offset even for npt-only scrapers; only drop it
+        # when the engine can't page at all.
+        caps = spec.get("capabilities") or {}
+        if "offset" in fourget_params and caps.get("paging") is False:
+            del fourget_params["offset"]
+
     # --- Validation Helpers ---
 
     @staticmethod
     def _sanitize_url(url: Any) -> Optional[str]:
         """Sanitize and heal URL: type check, strip, and fix double-encoding."""
-        if not isinstance(url, str):
-            return None
-        
-        s_url = url.strip()
-        if not s_url:
-            return None
-
-        if '&' in s_url:
-             s_url = unescape(s_url)
-
-        return s_url
+        return sanitize_url(url)
 
     @staticmethod
     def _is_valid_url(url: Any) -> bool:
-        if not url or not isinstance(url, str):
-            return False
-        if len(url) >= 5 and url.startswith(("http://", "https://", "magnet:", "ftp://", "ipfs://", "ipns://", "git://")):
-             return True
-        return False
-
-    @staticmethod
-    def _is_root_path_url(url: str) -> bool:
-        """Check if URL is just a domain root with no meaningful path or query (e.g., 'https://example.com/')."""
-        if not url:
-            return True
-        try:
-            parsed = urlparse(url)
-            path = parsed.path.rstrip('/')
-            has_path = path and path != ''
-            has_query = bool(parsed.query)
-            return not has_path and not has_query
-        except Exception:
-            logger.debug(f'_is_root_path_url failed for: {url[:100] if url else "None"}')
-            return True
-
-    @staticmethod
-    def _is_broken_image_url(url: str) -> bool:
-        """Check if URL is a broken image placeholder using pre-compiled regex."""
-        if not url or not isinstance(url, str):
-            return True
-        return bool(_BROKEN_IMAGE_RE.search(url))
+        return is_valid_url(url)
 
     @staticmethod
     def _parse_date(date_val: Any) -> Optional[datetime]:
@@ -229,36 +753,127 @@ class FourgetHijackerClient:
 
     @staticmethod
     def _normalize_thumbnail_url(url: Any, context: str = "thumbnail") -> Optional[str]:
-        """Normalize, unwrap, and validate thumbnail URL."""
-        url = FourgetHijackerClient._sanitize_url(url)
-        if not url:
-            return None
+        """Normalize, unwrap, and validate thumbnail URL (memoized, see fourget_urls)."""
+        thumb = classify_thumbnail(url, context)
+        if thumb is None and _METRICS.enabled:
+            reason = rejection_reason(url)
+            if reason:
+                _METRICS.reject_thumbnail(_URL_DROP_REASONS[reason])
+        return thumb
 
-        # INVARIANT: Extract proxy wrappers aggressively so we don't serve dead proxy endpoints.
-        url = FourgetHijackerClient._extract_proxied_url(url)
+    @staticmethod
+    def url_stats() -> Dict[str, Any]:
+        return memo_stats()
 
-        if not FourgetHijackerClient._is_valid_url(url):
-            logger.debug(f"Rejected {context} URL (invalid format): {url[:100]}")
-            return None
+    # --- Normalization Logic ---
 
-        if FourgetHijackerClient._is_broken_image_url(url):
-            logger.debug(f"Rejected {context} URL (broken image pattern): {url[:100]}")
-            return None
+    @staticmethod
+    def normalize_results(response_data: Any, engine_id: str = None, category: str = None):
+        results = []
+        if not isinstance(response_data, dict):
+            return results
 
-        if FourgetHijackerClient._is_root_path_url(url):
-            logger.debug(f"Rejected {context} URL (root path only): {url[:100]}")
-            return None
+        FourgetHijackerClient._raise_for_error(response_data)
+        FourgetHijackerClient._normalize_extras(response_data, results)
 
-        return url
+        # 4. Standard Results
+        current_ts = time.time()
+        _METRICS.bind(engine_id)
+        # INVARIANT: One entry per canonical URL; web/news/video arrays of one response overlap.
+        index = ResultIndex(results, enabled=_DEDUP)
 
-    # --- Normalization Logic ---
+        for result_type, normalizer in FourgetHijackerClient._get_normalizers(engine_id, category).items():
+            items = response_data.get(result_type)
+            if not items:
+                continue
+            for item in items:
+                result = FourgetHijackerClient._normalize_item(result_type, normalizer, item, current_ts)
+                if result:
+                    index.add(result)
+
+        if _DEDUP:
+            _DEDUP_REPORT.record(engine_id, index)
+            if index.duplicates:
+                _METRICS.inc('fourget_dropped_total', engine_id or 'unknown', 'duplicate', value=index.duplicates)
+        return results
 
     @staticmethod
-    def normalize_results(response_data: Any):
+    def normalize_stream(chunks: Any, category: str = 'web', stats: ResponseStats = None, engine_id: str = None):
+        """STREAM: Normalize array elements as they finish parsing; stop at the category cap.
+
+        Returns (results, payload) where payload holds only what was read, for caching.
+        """
+        stats = stats or ResponseStats()
+        parser = HarnessStreamParser(chunks, byte_budget=_STREAM.byte_budget, stats=stats)
+        cap = _STREAM.caps.get(category, 0)
+        main_types = CATEGORY_MAIN_TYPES.get(category, (category,))
+        normalizers = FourgetHijackerClient._get_normalizers(engine_id, category)
+
         results = []
-        if not isinstance(response_data, dict):
-            return results
+        index = ResultIndex(results, enabled=_DEDUP)
+        payload = {}
+        header_done = False
+        kept = 0
+        current_ts = time.time()
+        _METRICS.bind(engine_id)
+
+        with traced_peak(stats, _STREAM.trace_memory):
+            try:
+                for kind, key, value in parser.events():
+                    if kind == 'meta':
+                        payload[key] = value
+                        # INVARIANT: `related` trails the result arrays; emit it as it arrives.
+                        if header_done and key == 'related':
+                            FourgetHijackerClient._normalize_extras({'related': value}, results)
+                        continue
+
+                    if not header_done:
+                        # status/spelling/answer precede the arrays in 4get output
+                        FourgetHijackerClient._raise_for_error(payload)
+                        FourgetHijackerClient._normalize_extras(payload, results)
+                        header_done = True
+
+                    payload.setdefault(key, []).append(value)
+                    normalizer = normalizers.get(key)
+                    result = FourgetHijackerClient._normalize_item(key, normalizer, value, current_ts) if normalizer else None
+                    if not result:
+                        continue
+                    stats.mark_result()
+                    # merged duplicates don't count toward the cap
+                    if not index.add(result):
+                        continue
+
+                    if key in main_types:
+                        kept += 1
+                        if cap and kept >= cap:
+                            stats.stop_reason = 'cap'
+                            break
+            except StreamTruncated as e:
+                if stats.stop_reason != 'bytes':
+                    logger.debug(f'4get stream truncated after {stats.bytes_read} bytes: {e}')
+                    stats.stop_reason = 'truncated'
+
+        if not header_done:
+            FourgetHijackerClient._raise_for_error(payload)
+            FourgetHijackerClient._normalize_extras(payload, results)
+
+        _STREAM_REPORT.record(stats)
+        if _DEDUP:
+            _DEDUP_REPORT.record(engine_id, index)
+            if index.duplicates:
+                _METRICS.inc('fourget_dropped_total', engine_id or 'unknown', 'duplicate', value=index.duplicates)
+        return results, payload
+
+    @staticmethod
+    def dedup_stats() -> Dict[str, Any]:
+        return _DEDUP_REPORT.as_dict()
+
+    @staticmethod
+    def stream_stats() -> Dict[str, Any]:
+        return _STREAM_REPORT.as_dict()
 
+    @staticmethod
+    def _raise_for_error(response_data: Dict[str, Any]) -> None:
         # INVARIANT: Hoist 4get internal errors upstream as proper Searx exceptions to trigger global retries/cooldowns.
         if response_data.get("status") == "error":
             msg = response_data.get('message', 'Unknown error')
@@ -277,6 +892,9 @@ class FourgetHijackerClient:
 
             raise SearxEngineResponseException(f"4get upstream error: {msg}")
 
+    @staticmethod
+    def _normalize_extras(response_data: Dict[str, Any], results: list) -> None:
+        """Spelling, related searches and answer boxes."""
         spelling = response_data.get("spelling")
         if isinstance(spelling, dict) and spelling.get("type") != "no_correction":
             correction = spelling.get("correction")
@@ -297,7 +915,15 @@ class FourgetHijackerClient:
                 if normalized_answer:
                     results.append(normalized_answer)
 
-        # 4. Standard Results
+    @staticmethod
+    def _get_normalizers(engine_id: str = None, category: str = None) -> Dict[str, Any]:
+        if engine_id and category:
+            plan = FourgetHijackerClient._PLANS.get((engine_id, category))
+            if plan is None:
+                plan = FourgetHijackerClient._compile_plan(engine_id, category)
+                FourgetHijackerClient._PLANS[(engine_id, category)] = plan
+            return plan
+
         if not FourgetHijackerClient._NORMALIZERS:
             FourgetHijackerClient._NORMALIZERS = {
                 "web": FourgetHijackerClient._normalize_web_result,
@@ -313,27 +939,41 @@ class FourgetHijackerClient:
                 "author": FourgetHijackerClient._normalize_web_result,
                 "user": FourgetHijackerClient._normalize_web_result,
             }
+        return FourgetHijackerClient._NORMALIZERS
 
-        current_ts = time.time()
-
-        for result_type, normalizer in FourgetHijackerClient._NORMALIZERS.items():
-            items = response_data.get(result_type)
-            if not items:
-                continue
-            for item in items:
-                try:
-                    if not isinstance(item, dict) or FourgetHijackerClient._has_invalid_date(item, current_ts):
-                        continue
-                    result = normalizer(item)
-                    if result:
-                        if result_type in FourgetHijackerClient._TEMPLATES:
-                            result["template"] = FourgetHijackerClient._TEMPLATES[result_type]
-                        results.append(result)
-                except Exception as e:
-                    logger.debug(f'Failed to normalize {result_type} result: {e}')
-                    continue
+    @staticmethod
+    def _compile_plan(engine_id: str, category: str) -> Dict[str, Any]:
+        """PLAN: Only the result types this engine's scraper produces."""
+        generic = FourgetHijackerClient._get_normalizers()
+        spec = engine_spec(engine_id)
+        outputs = spec.get("outputs") if spec else None
+        if not outputs or not isinstance(outputs, dict):
+            # HAZARD: No spec (or the extractor found nothing) means unknown, not empty. Stay generic.
+            return generic
+
+        # HAZARD: The extractor misses some methods' own type (ddg/facebook have no `web` in the spec).
+        # The requested category's main types are always kept.
+        keep = FourgetHijackerClient.UNSPECCED_TYPES.union(outputs, CATEGORY_MAIN_TYPES.get(category, (category,)))
+        # INVARIANT: Types only, never fields. A spec `false` has meant "null somewhere" (google video
+        # views), and a field the scraper never sets costs no more than a dict lookup anyway.
+        return {result_type: normalizer for result_type, normalizer in generic.items() if result_type in keep}
 
-        return results
+    @staticmethod
+    def _normalize_item(result_type: str, normalizer: Any, item: Any, current_ts: float) -> Optional[Dict[str, Any]]:
+        try:
+            if not isinstance(item, dict):
+                _METRICS.drop('not_object')
+                return None
+            if FourgetHijackerClient._has_invalid_date(item, current_ts):
+                return None
+            result = normalizer(item)
+            if result and result_type in FourgetHijackerClient._TEMPLATES:
+                result["template"] = FourgetHijackerClient._TEMPLATES[result_type]
+            return result
+        except Exception as e:
+            logger.debug(f'Failed to normalize {result_type} result: {e}')
+            _METRICS.drop('normalizer_error')
+            return None
 
     @staticmethod
     def _has_invalid_date(item: Dict[str, Any], current_ts: float) -> bool:
@@ -345,9 +985,11 @@ class FourgetHijackerClient:
             return False
         try:
             if int(date_val) > current_ts + FourgetHijackerClient.FUTURE_DATE_LEEWAY:
+                _METRICS.drop('future_date')
                 return True
                 
         except (ValueError, TypeError, OverflowError):
+            _METRICS.drop('bad_date')
             return True
         return False
 
@@ -430,9 +1072,13 @@ class FourgetHijackerClient:
         url = FourgetHijackerClient._sanitize_url(item.get("url"))
         title = item.get("title")
 
-        if not FourgetHijackerClient._is_valid_url(url) or not title: return None
+        if not FourgetHijackerClient._is_valid_url(url) or not title:
+            _METRICS.drop('invalid_url' if title else 'missing_title')
+            return None
 
-        if '\x00' in url or '\x00' in title: return None
+        if '\x00' in url or '\x00' in title:
+            _METRICS.drop('nul_bytes')
+            return None
 
         content = FourgetHijackerClient._truncate_content(item.get("description"))
 
@@ -536,48 +1182,6 @@ class FourgetHijackerClient:
         if date_obj: result["publishedDate"] = date_obj
         return result
 
-    @staticmethod
-    def _extract_proxied_url(url: str) -> str:
-        """Extract original URL from 4get proxy wrapper if present."""
-        if not url or "url=" not in url:
-            return url
-        # INVARIANT: Only extract proxy formats if the link is relative or specifically tied to 4get.
-        if not (url.startswith("/") or "4get" in url.lower()):
-            return url
-
-        try:
-            # HAZARD: Isoline parsing of URL fragments must occur before query search, or fragment '#' injection causes parse-breakage on decode.
-            work_url = url.split('#', 1)[0]
-
-            start_idx = work_url.find('?url=')
-            if start_idx == -1:
-                start_idx = work_url.find('&url=')
-
-            if start_idx != -1:
-                val_start = start_idx + 5
-                val_end = work_url.find('&', val_start)
-
-                if val_end == -1:
-                    raw_val = work_url[val_start:]
-                else:
-                    raw_val = work_url[val_start:val_end]
-
-                # INVARIANT: `unquote_plus` ensures '+' encodes back to spacing as expected by parse_qs mechanics.
-                candidate = unquote_plus(raw_val)
-                # INVARIANT: Double-encoded `&amp;` is extremely common in raw 4get reddit/img endpoints.
-                if '&amp;' in candidate:
-                    candidate = unescape(candidate)
-
-                if FourgetHijackerClient._is_valid_url(candidate):
-                    return candidate
-
-        except Exception as e:
-            logger.debug(f'_extract_proxied_url failed for: {url[:100] if url else "None"}: {e}')
-            pass
-
-        # Fallback: strict safety return original if extraction failed
-        return url
-
     @staticmethod
     def _normalize_image_result(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         source = item.get("source")
@@ -590,27 +1194,21 @@ class FourgetHijackerClient:
         if not isinstance(img_data, dict) or not isinstance(thumb_data, dict):
             return None
 
-        img_url = FourgetHijackerClient._sanitize_url(img_data.get("url"))
-        thumb_url = FourgetHijackerClient._sanitize_url(thumb_data.get("url"))
-
-        if not FourgetHijackerClient._is_valid_url(img_url):
+        # INVARIANT: Validity, NUL, proxy unwrap, broken and root-path checks in one memoized verdict.
+        raw_img = FourgetHijackerClient._sanitize_url(img_data.get("url"))
+        img_url = classify_image_source(raw_img)
+        if not img_url:
+            if _METRICS.enabled:
+                _METRICS.drop(_URL_DROP_REASONS.get(rejection_reason(raw_img, image_source=True), 'invalid_url'))
             return None
 
-        if '\x00' in img_url: return None
-
-        if not img_url: return None
-
-        img_url = FourgetHijackerClient._extract_proxied_url(img_url)
-        thumb_url = FourgetHijackerClient._extract_proxied_url(thumb_url) if thumb_url else None
-
-        if FourgetHijackerClient._is_broken_image_url(img_url):
-            return None
-
-        if FourgetHijackerClient._is_root_path_url(img_url):
-            return None
+        # unwrapped again inside the thumbnail verdict
+        thumb_url = thumb_data.get("url")
 
         title = item.get("title") or "Image"
-        if '\x00' in title: return None
+        if '\x00' in title:
+            _METRICS.drop('nul_bytes')
+            return None
 
         result = {
             "title": FourgetHijackerClient._truncate_content(title),
@@ -629,9 +1227,12 @@ class FourgetHijackerClient:
         url = FourgetHijackerClient._sanitize_url(item.get("url"))
         title = item.get("title")
         if not FourgetHijackerClient._is_valid_url(url) or not title:
+            _METRICS.drop('invalid_url' if title else 'missing_title')
             return None
 
-        if '\x00' in url or '\x00' in title: return None
+        if '\x00' in url or '\x00' in title:
+            _METRICS.drop('nul_bytes')
+            return None
 
         result = {
             "title": FourgetHijackerClient._truncate_content(title),
@@ -698,9 +1299,12 @@ class FourgetHijackerClient:
         url = FourgetHijackerClient._sanitize_url(item.get("url"))
         title = item.get("title")
         if not FourgetHijackerClient._is_valid_url(url) or not title:
+            _METRICS.drop('invalid_url' if title else 'missing_title')
             return None
 
-        if '\x00' in url or '\x00' in title: return None
+        if '\x00' in url or '\x00' in title:
+            _METRICS.drop('nul_bytes')
+            return None
 
         result = {
             "title": FourgetHijackerClient._truncate_content(title),
@@ -0,0 +1,326 @@
+"""
+Per-engine counters and histograms for the 4get client.
+
+SearXNG's own stats only see one opaque engine call. `Metrics` splits it into
+sidecar round trip, body decode, normalization, payload size, results kept per
+type and results/thumbnails dropped per reason, labelled by engine, so the
+engines that burn the most CPU per useful result stand out.
+
+Off unless FOURGET_METRICS=1; every entry point returns immediately when
+disabled. Read it with `snapshot()` or `prometheus()` (text exposition), or
+set FOURGET_METRICS_FILE to have each worker write a node_exporter textfile.
+
+`PhaseReport` is always on: it aggregates the Server-Timing breakdown that
+harness.php sends with every response (manifest, include, upstream, parse,
+encode, peak memory), so a slow engine can be pinned on the upstream site,
+on fuckhtml parsing or on our own stack.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+# name -> (type, help, label names, buckets)
+FAMILIES = {
+    "fourget_requests_total": ("counter", "Responses handled, by how they were answered", ("engine", "source"), None),
+    "fourget_roundtrip_seconds": ("histogram", "Request sent to response received", ("engine",), SECONDS_BUCKETS),
+    "fourget_decode_seconds": ("histogram", "Body decode (JSON/msgpack, decompression)", ("engine",), SECONDS_BUCKETS),
+    "fourget_normalize_seconds": ("histogram", "Payload to SearXNG results", ("engine",), SECONDS_BUCKETS),
+    "fourget_payload_bytes": ("histogram", "Response body size on the wire", ("engine",), BYTES_BUCKETS),
+    "fourget_results_total": ("counter", "Results handed to SearXNG", ("engine", "type"), None),
+    "fourget_dropped_total": ("counter", "Scraper results discarded", ("engine", "reason"), None),
+    "fourget_thumbnails_rejected_total": ("counter", "Thumbnails removed from kept results", ("engine", "reason"), None),
+    "fourget_sidecar_phase_seconds": ("histogram", "harness.php time per phase (Server-Timing)", ("engine", "phase"), SECONDS_BUCKETS),
+    "fourget_sidecar_peak_memory_bytes": ("histogram", "harness.php memory_get_peak_usage()", ("engine",), BYTES_BUCKETS),
+    "fourget_projected_bytes_total": ("counter", "Response bytes the sidecar's field projection left out", ("engine",), None),
+}
+
+# Server-Timing phases harness.php reports, in pipeline order (see sidecar/src/timing.php)
+SIDECAR_PHASES = ("manifest", "include", "upstream", "parse", "project", "encode", "total")
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[int]:
+        total, out = 0, []
+        for c in self.counts:
+            total += c
+            out.append(total)
+        return out
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else repr(float(bound))
+
+
+class Metrics:
+    def __init__(self, enabled: bool = False, textfile: Optional[str] = None, interval: float = 15.0):
+        self.enabled = enabled
+        self.textfile = textfile
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple[str, ...]], float] = defaultdict(float)
+        self._histograms: Dict[Tuple[str, Tuple[str, ...]], Histogram] = {}
+        # HAZARD: SearXNG calls each engine's response() on its own thread; the
+        # normalizers don't know their engine, so it rides on a thread-local.
+        self._local = threading.local()
+        self._next_dump = 0.0
+
+    @classmethod
+    def from_env(cls) -> "Metrics":
+        return cls(
+            enabled=os.environ.get("FOURGET_METRICS", "0") == "1",
+            textfile=os.environ.get("FOURGET_METRICS_FILE") or None,
+            interval=float(os.environ.get("FOURGET_METRICS_INTERVAL", 15.0)),
+        )
+
+    # --- recording ---
+
+    def clock(self) -> float:
+        """Start time for observe_since(); 0.0 when disabled so the hot path skips the syscall."""
+        return time.perf_counter() if self.enabled else 0.0
+
+    def inc(self, name: str, *labels: str, value: float = 1) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[(name, labels)] += value
+
+    def observe(self, name: str, value: float, *labels: str) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            hist = self._histograms.get((name, labels))
+            if hist is None:
+                hist = self._histograms[(name, labels)] = Histogram(FAMILIES[name][3])
+            hist.observe(value)
+
+    def observe_since(self, name: str, started: float, *labels: str) -> None:
+        if self.enabled and started:
+            self.observe(name, time.perf_counter() - started, *labels)
+
+    def bind(self, engine_id: Optional[str]) -> None:
+        """Attribute the drops recorded on this thread to ENGINE_ID."""
+        if self.enabled:
+            self._local.engine = engine_id or "unknown"
+
+    def drop(self, reason: str) -> None:
+        if self.enabled:
+            self.inc("fourget_dropped_total", getattr(self._local, "engine", "unknown"), reason)
+
+    def reject_thumbnail(self, reason: str) -> None:
+        if self.enabled:
+            self.inc("fourget_thumbnails_rejected_total", getattr(self._local, "engine", "unknown"), reason)
+
+    def count_results(self, engine_id: str, results: list) -> None:
+        if not self.enabled:
+            return
+        by_type = defaultdict(int)
+        for result in results:
+            by_type[result_type(result)] += 1
+        engine = engine_id or "unknown"
+        with self._lock:
+            for kind, n in by_type.items():
+                self._counters[("fourget_results_total", (engine, kind))] += n
+
+    # --- reading ---
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Raw series plus a per-engine cost summary (normalize CPU and bytes per kept result)."""
+        with self._lock:
+            counters = dict(self._counters)
+            hists = {key: (h.sum, h.count) for key, h in self._histograms.items()}
+
+        series = defaultdict(dict)
+        for (name, labels), value in counters.items():
+            series[name]["|".join(labels)] = value
+        for (name, labels), (total, count) in hists.items():
+            series[name]["|".join(labels)] = {"sum": total, "count": count}
+
+        engines = defaultdict(lambda: defaultdict(float))
+        for (name, labels), value in counters.items():
+            if name == "fourget_results_total":
+                engines[labels[0]]["results"] += value
+            elif name == "fourget_dropped_total":
+                engines[labels[0]]["dropped"] += value
+            elif name == "fourget_requests_total":
+                engines[labels[0]]["responses"] += value
+        for (name, labels), (total, count) in hists.items():
+            if name == "fourget_normalize_seconds":
+                engines[labels[0]]["normalize_seconds"] += total
+            elif name == "fourget_decode_seconds":
+                engines[labels[0]]["decode_seconds"] += total
+            elif name == "fourget_payload_bytes":
+                engines[labels[0]]["payload_bytes"] += total
+
+        cost = {}
+        for engine, totals in engines.items():
+            kept = totals.get("results", 0)
+            cpu = totals.get("normalize_seconds", 0) + totals.get("decode_seconds", 0)
+            cost[engine] = dict(totals)
+            cost[engine]["cpu_ms_per_result"] = round(cpu * 1000 / kept, 4) if kept else None
+            cost[engine]["bytes_per_result"] = round(totals.get("payload_bytes", 0) / kept, 1) if kept else None
+        return {"enabled": self.enabled, "series": dict(series), "cost": cost}
+
+    def prometheus(self, extra_labels: str = "") -> str:
+        with self._lock:
+            counters = sorted(self._counters.items())
+            hists = sorted((key, (h.buckets, h.cumulative(), h.sum, h.count)) for key, h in self._histograms.items())
+
+        by_family = defaultdict(list)
+        for (name, labels), value in counters:
+            by_family[name].append(("", labels, value, None))
+        for (name, labels), data in hists:
+            by_family[name].append(("h", labels, None, data))
+
+        lines = []
+        for name, (kind, help_text, label_names, _) in FAMILIES.items():
+            rows = by_family.get(name)
+            if not rows:
+                continue
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for _, labels, value, data in rows:
+                pairs = [f'{k}="{_escape(v)}"' for k, v in zip(label_names, labels)]
+                if extra_labels:
+                    pairs.append(extra_labels)
+                if data is None:
+                    lines.append(f"{name}{{{','.join(pairs)}}} {value:g}")
+                    continue
+                buckets, cumulative, total, count = data
+                for bound, n in zip(buckets + (float("inf"),), cumulative):
+                    le = ",".join(pairs + [f'le="{_format_bound(bound)}"'])
+                    lines.append(f"{name}_bucket{{{le}}} {n}")
+                lines.append(f"{name}_sum{{{','.join(pairs)}}} {total:g}")
+                lines.append(f"{name}_count{{{','.join(pairs)}}} {count}")
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def maybe_dump(self) -> None:
+        """Write this worker's textfile at most every `interval` seconds (FOURGET_METRICS_FILE)."""
+        if not self.enabled or not self.textfile:
+            return
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next_dump:
+                return
+            self._next_dump = now + self.interval
+
+        pid = os.getpid()
+        # INVARIANT: One file per worker, labelled, so node_exporter never sees the same series twice.
+        path = self.textfile.replace("{pid}", str(pid)) if "{pid}" in self.textfile else f"{self.textfile}.{pid}.prom"
+        tmp = f"{path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(self.prometheus(extra_labels=f'worker="{pid}"'))
+            os.replace(tmp, path)
+        except OSError:
+            pass
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+def parse_server_timing(header: Any) -> Dict[str, float]:
+    """`upstream;dur=412.5, mem;desc="1234"` -> {"upstream": 412.5, "mem": 1234.0}. Unknown shapes are skipped."""
+    phases = {}
+    if not header or not isinstance(header, str):
+        return phases
+    for entry in header.split(","):
+        name, _, rest = entry.strip().partition(";")
+        if not name:
+            continue
+        for param in rest.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key in ("dur", "desc"):
+                try:
+                    phases[name] = float(value.strip('"'))
+                except ValueError:
+                    continue
+                break
+    return phases
+
+
+class PhaseReport:
+    """Per-engine sums of the sidecar's Server-Timing phases."""
+
+    def __init__(self, metrics: Optional[Metrics] = None):
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._engines = defaultdict(lambda: {"responses": 0, "ms": defaultdict(float), "mem_sum": 0.0, "mem_max": 0.0})
+
+    def record(self, engine_id: str, header: Any) -> None:
+        phases = parse_server_timing(header)
+        if not phases:
+            return
+        engine = engine_id or "unknown"
+        mem = phases.pop("mem", None)
+        with self._lock:
+            stats = self._engines[engine]
+            stats["responses"] += 1
+            for phase, ms in phases.items():
+                stats["ms"][phase] += ms
+            if mem is not None:
+                stats["mem_sum"] += mem
+                stats["mem_max"] = max(stats["mem_max"], mem)
+
+        if self.metrics is not None and self.metrics.enabled:
+            for phase, ms in phases.items():
+                self.metrics.observe("fourget_sidecar_phase_seconds", ms / 1000, engine, phase)
+            if mem is not None:
+                self.metrics.observe("fourget_sidecar_peak_memory_bytes", mem, engine)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """Mean ms per phase, each phase's share of the sidecar total, and where the time goes."""
+        with self._lock:
+            engines = {name: (s["responses"], dict(s["ms"]), s["mem_sum"], s["mem_max"])
+                       for name, s in self._engines.items()}
+        out = {}
+        for name, (responses, ms, mem_sum, mem_max) in engines.items():
+            order = sorted(ms, key=lambda p: SIDECAR_PHASES.index(p) if p in SIDECAR_PHASES else len(SIDECAR_PHASES))
+            mean = {phase: round(ms[phase] / responses, 2) for phase in order}
+            total = ms.get("total") or sum(v for k, v in ms.items() if k != "total")
+            share = {phase: round(v / total, 3) for phase, v in ms.items() if phase != "total"} if total else {}
+            out[name] = {
+                "responses": responses,
+                "mean_ms": mean,
+                "share": share,
+                "slowest_phase": max(share, key=share.get) if share else None,
+                "peak_memory_mean": int(mem_sum / responses) if responses else 0,
+                "peak_memory_max": int(mem_max),
+            }
+        return out
+
+
+def result_type(result: Any) -> str:
+    """Label for a normalized result: suggestion, answer, infobox, or its template's type."""
+    if not isinstance(result, dict):
+        return "answer"
+    if "suggestion" in result:
+        return "suggestion"
+    if "infobox" in result:
+        return "infobox"
+    template = result.get("template")
+    return template.split(".", 1)[0] if template else "web"
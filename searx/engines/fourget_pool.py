@@ -0,0 +1,203 @@
+"""
+Client-side load balancing across sidecar replicas.
+
+`EndpointPool` picks a sidecar per request (least outstanding requests, or
+peak-EWMA latency), ejects endpoints that keep failing or timing out, and
+only readmits them once `health.php` answers 200 again. With affinity on,
+each engine sticks to one replica (rendezvous hashing) so that replica's
+opcache, APCu page tokens and prefetched pages stay warm for it; a busy
+replica spills over to the normal choice.
+
+SearXNG never calls response() for requests that time out, so outstanding
+requests carry a start time and are written off as failures once stale.
+"""
+import hashlib
+import itertools
+import logging
+import os
+import threading
+import time
+import urllib.request
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIDECAR = "http://4get-hijacked:80"
+
+
+class Endpoint:
+    __slots__ = ("base", "outstanding", "ewma_ms", "failures", "ejected_until", "probing",
+                 "requests", "errors", "ejections")
+
+    def __init__(self, base: str):
+        self.base = base.rstrip("/")
+        self.outstanding: Dict[int, float] = {}  # ticket -> monotonic start
+        self.ewma_ms: Optional[float] = None
+        self.failures = 0                        # consecutive
+        self.ejected_until = 0.0
+        self.probing = False
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+
+    def url(self, path: str) -> str:
+        return self.base + path
+
+    def as_dict(self, now: float) -> Dict[str, Any]:
+        return {
+            "outstanding": len(self.outstanding),
+            "ewma_ms": round(self.ewma_ms, 1) if self.ewma_ms is not None else None,
+            "requests": self.requests,
+            "errors": self.errors,
+            "ejections": self.ejections,
+            "ejected": self.ejected_until > now,
+        }
+
+
+class Ticket:
+    """One routed request; handed back to release()."""
+
+    __slots__ = ("endpoint", "id", "started")
+
+    def __init__(self, endpoint: Endpoint, ticket_id: int, started: float):
+        self.endpoint = endpoint
+        self.id = ticket_id
+        self.started = started
+
+
+class EndpointPool:
+    def __init__(self, bases: List[str], strategy: str = "least", affinity: bool = False,
+                 eject_after: int = 3, eject_for: float = 30.0, stale_after: float = 30.0,
+                 spill: int = 4, alpha: float = 0.3, probe_timeout: float = 2.0):
+        self.endpoints = [Endpoint(b) for b in bases] or [Endpoint(DEFAULT_SIDECAR)]
+        self.strategy = strategy
+        self.affinity = affinity
+        self.eject_after = eject_after
+        self.eject_for = eject_for
+        self.stale_after = stale_after
+        self.spill = spill
+        self.alpha = alpha
+        self.probe_timeout = probe_timeout
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+
+    @classmethod
+    def from_env(cls) -> "EndpointPool":
+        # FOURGET_SIDECARS=http://4get-1:80,http://4get-2:80
+        bases = [b.strip() for b in os.environ.get("FOURGET_SIDECARS", "").split(",") if b.strip()]
+        return cls(
+            bases or [DEFAULT_SIDECAR],
+            strategy=os.environ.get("FOURGET_POOL_STRATEGY", "least"),
+            affinity=os.environ.get("FOURGET_POOL_AFFINITY", "0") == "1",
+            eject_after=int(os.environ.get("FOURGET_POOL_EJECT_AFTER", 3)),
+            eject_for=float(os.environ.get("FOURGET_POOL_EJECT_FOR", 30.0)),
+        )
+
+    @property
+    def single(self) -> bool:
+        return len(self.endpoints) == 1
+
+    # --- selection ---
+
+    def _score(self, ep: Endpoint) -> float:
+        load = len(ep.outstanding)
+        if self.strategy == "ewma":
+            # peak-EWMA: expected wait if we queue behind what's already in flight
+            return (ep.ewma_ms if ep.ewma_ms is not None else 0.0) * (load + 1) + load
+        return load + (ep.ewma_ms or 0.0) / 1e6  # latency only breaks ties
+
+    @staticmethod
+    def _rendezvous(key: str, endpoints: List[Endpoint]) -> Endpoint:
+        return max(endpoints, key=lambda ep: hashlib.md5(f"{key}|{ep.base}".encode()).digest())
+
+    def _expire(self, now: float) -> None:
+        # INVARIANT: Caller holds the lock. Timed-out requests never reach release().
+        for ep in self.endpoints:
+            stale = [t for t, started in ep.outstanding.items() if now - started > self.stale_after]
+            for ticket_id in stale:
+                del ep.outstanding[ticket_id]
+                self._record_failure(ep, now)
+
+    def acquire(self, engine_id: str = "") -> Ticket:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            # ejected endpoints stay out until a health.php probe resets their failures
+            healthy = [ep for ep in self.endpoints if ep.ejected_until <= now and ep.failures < self.eject_after]
+            # HAZARD: Never fail closed; with everything ejected, use the least-bad endpoint.
+            candidates = healthy or self.endpoints
+
+            best = min(candidates, key=self._score)
+            if self.affinity and engine_id and len(candidates) > 1:
+                home = self._rendezvous(engine_id, candidates)
+                if len(home.outstanding) <= len(best.outstanding) + self.spill:
+                    best = home
+
+            ticket = Ticket(best, next(self._ids), now)
+            best.outstanding[ticket.id] = now
+            best.requests += 1
+
+        self._maybe_probe(now)
+        return ticket
+
+    # --- feedback ---
+
+    def release(self, ticket: Optional[Ticket], ok: bool = True) -> None:
+        if ticket is None:
+            return
+        now = time.monotonic()
+        ep = ticket.endpoint
+        with self._lock:
+            if ep.outstanding.pop(ticket.id, None) is None:
+                return  # already written off as stale
+            if ok:
+                elapsed_ms = (now - ticket.started) * 1000
+                ep.ewma_ms = elapsed_ms if ep.ewma_ms is None else ep.ewma_ms + self.alpha * (elapsed_ms - ep.ewma_ms)
+                ep.failures = 0
+            else:
+                self._record_failure(ep, now)
+
+    def _record_failure(self, ep: Endpoint, now: float) -> None:
+        ep.errors += 1
+        ep.failures += 1
+        if ep.failures >= self.eject_after and ep.ejected_until <= now and not self.single:
+            ep.ejected_until = now + self.eject_for
+            ep.ejections += 1
+            logger.warning(f'4get sidecar {ep.base} ejected after {ep.failures} failures')
+
+    # --- readmission ---
+
+    def _maybe_probe(self, now: float) -> None:
+        if self.single:
+            return
+        with self._lock:
+            due = [ep for ep in self.endpoints
+                   if ep.failures >= self.eject_after and ep.ejected_until <= now and not ep.probing]
+            for ep in due:
+                ep.probing = True
+        for ep in due:
+            threading.Thread(target=self._probe, args=(ep,), name="fourget-pool-probe", daemon=True).start()
+
+    def _probe(self, ep: Endpoint) -> None:
+        healthy = False
+        try:
+            with urllib.request.urlopen(ep.url("/health.php"), timeout=self.probe_timeout) as resp:
+                healthy = resp.status == 200
+        except Exception as e:
+            logger.debug(f'4get sidecar probe {ep.base} failed: {e}')
+        with self._lock:
+            ep.probing = False
+            if healthy:
+                ep.failures = 0
+                logger.info(f'4get sidecar {ep.base} readmitted')
+            else:
+                ep.ejected_until = time.monotonic() + self.eject_for
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "strategy": self.strategy,
+                "affinity": self.affinity,
+                "endpoints": {ep.base: ep.as_dict(now) for ep in self.endpoints},
+            }
@@ -0,0 +1,113 @@
+"""
+Field projection for harness requests.
+
+A scraper's result carries everything 4get's own frontend can show: arrays
+the requested category never uses, fields no normalizer reads and
+descriptions of any length, which the client then cuts at
+MAX_CONTENT_LENGTH * 2 before looking at them. With FOURGET_PROJECTION=1
+each request tells the sidecar what it will actually read:
+
+    {"types": {"web": ["url", "title", ...], "answer": [...]},
+     "cap": {"image": 100}, "max_len": 10000, "trim": ["title", "description"]}
+
+`types` are the engine's normalizer plan plus answers, with the fields the
+matching normalizer reads (a type missing from FIELDS is sent as true and kept
+whole). `cap` comes from FOURGET_PROJECTION_CAPS. The sidecar
+(sidecar/src/project.php) prunes before encoding and reports the JSON bytes
+that saved in an X-Fourget-Projected header; `ProjectionReport` sums them per
+engine.
+"""
+import os
+import threading
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Optional
+
+# INVARIANT: Every key a normalizer in fourget_hijacker_client reads; a field missing here is never sent.
+_WEB = ("url", "title", "description", "table", "author", "followers", "sublink", "thumb", "thumbnail",
+        "date", "publishedDate")
+_VIDEO = ("url", "title", "description", "author", "thumb", "thumbnail", "date", "publishedDate",
+          "duration", "views")
+FIELDS = {
+    "web": _WEB,
+    "playlist": _WEB,
+    "album": _WEB,
+    "author": _WEB,
+    "user": _WEB,
+    "image": ("url", "title", "source"),
+    "video": _VIDEO,
+    "livestream": _VIDEO,
+    "reel": _VIDEO,
+    "song": _VIDEO + ("stream",),
+    "podcast": _VIDEO + ("stream",),
+    "news": ("url", "title", "description", "thumb", "date", "author", "source"),
+    "answer": ("url", "title", "description", "table", "sublink", "thumb"),
+}
+# string fields the client truncates anyway; URLs are never cut
+TRIMMED = ("title", "description")
+
+
+def _caps_from_env() -> Dict[str, int]:
+    # FOURGET_PROJECTION_CAPS=image:100,video:50 -> items kept per result type
+    caps = {}
+    for part in os.environ.get("FOURGET_PROJECTION_CAPS", "").split(","):
+        name, _, value = part.strip().partition(":")
+        if name and value.isdigit() and int(value) > 0:
+            caps[name] = int(value)
+    return caps
+
+
+class Projection:
+    def __init__(self, enabled: bool = False, caps: Optional[Dict[str, int]] = None):
+        self.enabled = enabled
+        self.caps = caps or {}
+
+    @classmethod
+    def from_env(cls) -> "Projection":
+        return cls(
+            enabled=os.environ.get("FOURGET_PROJECTION", "0") == "1",
+            caps=_caps_from_env(),
+        )
+
+    def build(self, types: Iterable[str], max_len: int) -> Dict[str, Any]:
+        """Projection for a request whose response is normalized with the result TYPES."""
+        wanted = set(types) | {"answer"}
+        projection = {
+            "types": {name: list(FIELDS[name]) if name in FIELDS else True for name in sorted(wanted)},
+            "max_len": max_len,
+            "trim": list(TRIMMED),
+        }
+        caps = {name: cap for name, cap in self.caps.items() if name in wanted}
+        if caps:
+            projection["cap"] = caps
+        return projection
+
+
+class ProjectionReport:
+    """Per-engine bytes the sidecar left out of its responses."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._engines = defaultdict(lambda: {"responses": 0, "bytes_saved": 0})
+
+    def record(self, engine_id: str, saved: Any) -> int:
+        """Count one projected response; SAVED is the X-Fourget-Projected value. Returns the bytes."""
+        try:
+            saved = max(0, int(saved or 0))
+        except (TypeError, ValueError):
+            saved = 0
+        with self._lock:
+            stats = self._engines[engine_id or "unknown"]
+            stats["responses"] += 1
+            stats["bytes_saved"] += saved
+        return saved
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            engines = {name: dict(s) for name, s in self._engines.items()}
+        for stats in engines.values():
+            stats["bytes_saved_mean"] = stats["bytes_saved"] // stats["responses"] if stats["responses"] else 0
+        return {
+            "responses": sum(s["responses"] for s in engines.values()),
+            "bytes_saved": sum(s["bytes_saved"] for s in engines.values()),
+            "engines": engines,
+        }
@@ -0,0 +1,55 @@
+"""
+Access to 4get_engine_specs.json (written by 4get_capabilities_extractor.py).
+
+Loaded lazily, once per process, so importing an engine module stays as cheap
+as before. Every consumer must treat a missing spec as "unknown, assume
+anything" rather than "supports nothing".
+"""
+import json
+import logging
+import os
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+SPECS_FILENAME = "4get_engine_specs.json"
+
+# SearXNG engine id -> scraper file name where they differ (see generate_manifest.php)
+_SPEC_ALIASES = {"duckduckgo": "ddg"}
+
+
+def _candidate_paths():
+    env_path = os.environ.get("FOURGET_ENGINE_SPECS")
+    if env_path:
+        yield env_path
+    here = os.path.dirname(os.path.abspath(__file__))
+    yield os.path.join(here, SPECS_FILENAME)
+    # repo checkout: searx/engines -> repo root
+    yield os.path.join(here, os.pardir, os.pardir, SPECS_FILENAME)
+
+
+@lru_cache(maxsize=1)
+def load_specs() -> Dict[str, Any]:
+    for path in _candidate_paths():
+        if not os.path.isfile(path):
+            continue
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                specs = json.load(f)
+            if isinstance(specs, dict):
+                return specs
+        except (OSError, ValueError) as e:
+            logger.warning(f'4get engine specs unreadable at {path}: {e}')
+    logger.debug('4get engine specs not found; engines run without capability data')
+    return {}
+
+
+def spec_name(engine_id: str) -> str:
+    name = (engine_id or "").replace("-", "_")
+    return _SPEC_ALIASES.get(name, name)
+
+
+def engine_spec(engine_id: str) -> Optional[Dict[str, Any]]:
+    spec = load_specs().get(spec_name(engine_id))
+    return spec if isinstance(spec, dict) else None
@@ -0,0 +1,293 @@
+"""
+Incremental parsing of harness.php JSON bodies.
+
+`HarnessStreamParser` walks the top-level object of a 4get response and yields
+each element of the result arrays as soon as it is complete, so the client can
+normalize while parsing and stop once it has enough, instead of decoding the
+whole 2-5 MB image payload into a dict tree first.
+
+SearXNG's httpx network layer reads the full body before `response()` runs, so
+this saves parse time and the dict tree, not transfer time or the body bytes;
+time-to-first-result is measured from the start of parsing.
+"""
+import codecs
+import json
+import logging
+import os
+import re
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WS_RE = re.compile(r'[ \t\n\r]*')
+_DECODER = json.JSONDecoder()
+
+RESULT_TYPES = frozenset(
+    ("web", "image", "video", "news", "livestream", "reel", "song", "podcast", "playlist", "album", "author", "user")
+)
+
+# Result types that count toward a category's cap; side arrays (e.g. image inside web) don't
+CATEGORY_MAIN_TYPES = {
+    "web": ("web",),
+    "image": ("image",),
+    "video": ("video", "livestream", "reel"),
+    "news": ("news",),
+    "music": ("song", "album", "playlist", "podcast"),
+}
+DEFAULT_CAPS = {"web": 50, "image": 100, "video": 50, "news": 50, "music": 50}
+DEFAULT_BYTE_BUDGET = 4 * 1024 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+class StreamTruncated(ValueError):
+    """Body ended (or hit the byte budget) in the middle of a value."""
+
+
+class ResponseStats:
+    """What one streamed parse cost."""
+
+    __slots__ = ("started", "first_result", "bytes_read", "peak_buffer", "peak_traced", "items", "stop_reason")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_result: Optional[float] = None
+        self.bytes_read = 0
+        self.peak_buffer = 0
+        self.peak_traced: Optional[int] = None
+        self.items = 0
+        self.stop_reason = "eof"
+
+    def mark_result(self) -> None:
+        if self.first_result is None:
+            self.first_result = time.perf_counter() - self.started
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "parse_to_first_result_ms": self.first_result * 1000 if self.first_result is not None else None,
+            "total_ms": (time.perf_counter() - self.started) * 1000,
+            "bytes_read": self.bytes_read,
+            "peak_buffer_bytes": self.peak_buffer,
+            "peak_traced_bytes": self.peak_traced,
+            "items": self.items,
+            "stop_reason": self.stop_reason,
+        }
+
+
+class HarnessStreamParser:
+    """Yield ('meta', key, value) and ('item', result_type, item) events from a chunked body."""
+
+    def __init__(self, chunks: Iterable[Any], byte_budget: int = DEFAULT_BYTE_BUDGET,
+                 stats: Optional[ResponseStats] = None):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self.byte_budget = byte_budget
+        self.stats = stats or ResponseStats()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        if self.stats.bytes_read >= self.byte_budget:
+            self.stats.stop_reason = "bytes"
+            self.eof = True
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.buf += self._utf8.decode(b"", final=True)
+            self.eof = True
+            return False
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        self.stats.bytes_read += len(chunk)
+
+        # INVARIANT: Drop the consumed prefix so the buffer holds one element, not the whole body.
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += self._utf8.decode(chunk)
+        if len(self.buf) > self.stats.peak_buffer:
+            self.stats.peak_buffer = len(self.buf)
+        return True
+
+    def _skip_ws(self) -> Optional[str]:
+        """Advance past whitespace; return the next character or None at end of body."""
+        while True:
+            self.pos = _WS_RE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return None
+
+    def _expect(self, char: str) -> None:
+        if self._skip_ws() != char:
+            raise StreamTruncated(f"expected {char!r} at offset {self.stats.bytes_read}")
+        self.pos += 1
+
+    def _decode(self) -> Any:
+        self._skip_ws()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise StreamTruncated("body ended inside a value")
+            # HAZARD: A number flush against the buffer end may be cut mid-digits ("30" of "300").
+            if end >= len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    def events(self) -> Iterator[Tuple[str, str, Any]]:
+        first = self._skip_ws()
+        if first != "{":
+            # harness answers `[]` when there is no stored page token
+            return
+        self.pos += 1
+
+        while True:
+            char = self._skip_ws()
+            if char is None:
+                raise StreamTruncated("body ended inside the top-level object")
+            if char == "}":
+                return
+            if char == ",":
+                self.pos += 1
+                self._skip_ws()
+
+            key = self._decode()
+            self._expect(":")
+
+            if key in RESULT_TYPES and self._skip_ws() == "[":
+                self.pos += 1
+                while True:
+                    char = self._skip_ws()
+                    if char == "]":
+                        self.pos += 1
+                        break
+                    if char == ",":
+                        self.pos += 1
+                        self._skip_ws()
+                    elif char is None:
+                        raise StreamTruncated(f"body ended inside {key}")
+                    self.stats.items += 1
+                    yield "item", key, self._decode()
+            else:
+                yield "meta", key, self._decode()
+
+
+def iter_body_chunks(resp: Any, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """Chunks of a response body; SearXNG has already buffered it, so this slices `content`."""
+    iter_bytes = getattr(resp, "iter_bytes", None)
+    if callable(iter_bytes):
+        sent = False
+        try:
+            for chunk in iter_bytes(chunk_size):
+                sent = True
+                yield chunk
+            return
+        except Exception as e:
+            # HAZARD: Falling back after a partial read would replay the body from the start.
+            if sent:
+                raise
+            logger.debug(f'iter_bytes unavailable, slicing content: {e}')
+    content = resp.content
+    for start in range(0, len(content), chunk_size):
+        yield content[start:start + chunk_size]
+
+
+class StreamReport:
+    """Aggregate ResponseStats across responses, for sizing caps and budgets."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.responses = 0
+        self.early_stops = 0
+        self.byte_stops = 0
+        self.items = 0
+        self.bytes_read = 0
+        self.ttfr_total = 0.0
+        self.ttfr_count = 0
+        self.peak_buffer_max = 0
+        self.peak_traced_max = 0
+
+    def record(self, stats: ResponseStats) -> None:
+        with self._lock:
+            self.responses += 1
+            self.items += stats.items
+            self.bytes_read += stats.bytes_read
+            if stats.stop_reason == "cap":
+                self.early_stops += 1
+            elif stats.stop_reason == "bytes":
+                self.byte_stops += 1
+            if stats.first_result is not None:
+                self.ttfr_total += stats.first_result
+                self.ttfr_count += 1
+            self.peak_buffer_max = max(self.peak_buffer_max, stats.peak_buffer)
+            if stats.peak_traced:
+                self.peak_traced_max = max(self.peak_traced_max, stats.peak_traced)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "responses": self.responses,
+            "early_stops": self.early_stops,
+            "byte_budget_stops": self.byte_stops,
+            "items_parsed": self.items,
+            "bytes_read": self.bytes_read,
+            "avg_parse_to_first_result_ms": self.ttfr_total * 1000 / self.ttfr_count if self.ttfr_count else None,
+            "peak_buffer_bytes": self.peak_buffer_max,
+            "peak_traced_bytes": self.peak_traced_max or None,
+        }
+
+
+class StreamConfig:
+    def __init__(self, enabled: bool = False, caps: Optional[Dict[str, int]] = None,
+                 byte_budget: int = DEFAULT_BYTE_BUDGET, trace_memory: bool = False):
+        self.enabled = enabled
+        self.caps = dict(DEFAULT_CAPS, **(caps or {}))
+        self.byte_budget = byte_budget
+        self.trace_memory = trace_memory
+
+    @classmethod
+    def from_env(cls) -> "StreamConfig":
+        caps = {}
+        # FOURGET_STREAM_CAPS=image:60,web:30
+        for part in os.environ.get("FOURGET_STREAM_CAPS", "").split(","):
+            name, _, value = part.partition(":")
+            if name.strip() and value.strip().isdigit():
+                caps[name.strip()] = int(value)
+        return cls(
+            enabled=os.environ.get("FOURGET_STREAM", "0") == "1",
+            caps=caps,
+            byte_budget=int(os.environ.get("FOURGET_STREAM_BYTES", DEFAULT_BYTE_BUDGET)),
+            trace_memory=os.environ.get("FOURGET_STREAM_TRACEMALLOC", "0") == "1",
+        )
+
+
+class traced_peak:
+    """Record tracemalloc's peak into STATS for the duration of a parse (debug only, global)."""
+
+    def __init__(self, stats: ResponseStats, enabled: bool):
+        self.stats = stats
+        self.enabled = enabled
+        self._started = False
+
+    def __enter__(self):
+        if self.enabled:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started = True
+            tracemalloc.reset_peak()
+        return self
+
+    def __exit__(self, *exc):
+        if self.enabled:
+            self.stats.peak_traced = tracemalloc.get_traced_memory()[1]
+            if self._started:
+                tracemalloc.stop()
+        return False
@@ -0,0 +1,220 @@
+"""
+Per-engine timeouts from observed latency.
+
+`AdaptiveTimeouts` keeps the last N sidecar round trips per 4get engine and
+sets the engine's SearXNG `timeout` to a target percentile of them (times a
+little headroom), clamped to configured bounds. SearXNG reads `engine.timeout`
+when it plans a search and waits for the slowest engine's timeout, so an
+engine configured at 5s that answers in 1.2s stops holding up every page,
+and one that keeps timing out gets more room.
+
+Timed-out requests never reach response(). Requests still outstanding past
+the current timeout are counted as censored samples at that timeout; when
+the target percentile lands on one, the timeout grows instead of settling on
+a value that only fast answers ever taught it.
+"""
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BOUNDS = (1.0, 8.0)
+
+
+def _bounds_from_env() -> Dict[str, Tuple[float, float]]:
+    # FOURGET_TIMEOUT_BOUNDS=*:1:6,google:2:8,mojeek:0.8:3
+    bounds = {}
+    for part in os.environ.get("FOURGET_TIMEOUT_BOUNDS", "").split(","):
+        fields = part.strip().split(":")
+        if len(fields) != 3 or not fields[0]:
+            continue
+        try:
+            low, high = float(fields[1]), float(fields[2])
+        except ValueError:
+            continue
+        if 0 < low <= high:
+            bounds[fields[0]] = (low, high)
+    return bounds
+
+
+class EngineLatency:
+    __slots__ = ("samples", "outstanding", "configured", "current", "pending", "timeouts", "changes", "censored")
+
+    def __init__(self, window: int):
+        self.samples = deque(maxlen=window)     # seconds; censored timeouts included
+        self.censored = deque(maxlen=window)    # parallel flags
+        self.outstanding: Dict[int, float] = {}
+        self.configured: Optional[float] = None  # settings.yml value, before we touched it
+        self.current: Optional[float] = None
+        self.pending = 0                         # samples since the last recompute
+        self.timeouts = 0
+        self.changes = 0
+
+
+class AdaptiveTimeouts:
+    def __init__(self, enabled: bool = False, percentile: float = 95.0, headroom: float = 1.2,
+                 bounds: Optional[Dict[str, Tuple[float, float]]] = None, window: int = 200,
+                 min_samples: int = 20, recompute_every: int = 10, grow: float = 1.5):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.headroom = headroom
+        self.bounds = bounds or {}
+        self.window = window
+        self.min_samples = min_samples
+        self.recompute_every = recompute_every
+        self.grow = grow
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._engines: Dict[str, EngineLatency] = {}
+
+    @classmethod
+    def from_env(cls) -> "AdaptiveTimeouts":
+        return cls(
+            enabled=os.environ.get("FOURGET_ADAPTIVE_TIMEOUT", "0") == "1",
+            percentile=float(os.environ.get("FOURGET_TIMEOUT_PERCENTILE", 95.0)),
+            headroom=float(os.environ.get("FOURGET_TIMEOUT_HEADROOM", 1.2)),
+            bounds=_bounds_from_env(),
+            window=int(os.environ.get("FOURGET_TIMEOUT_WINDOW", 200)),
+        )
+
+    def _bounds(self, engine_id: str) -> Tuple[float, float]:
+        return self.bounds.get(engine_id) or self.bounds.get("*") or DEFAULT_BOUNDS
+
+    def _engine(self, engine_id: str) -> EngineLatency:
+        state = self._engines.get(engine_id)
+        if state is None:
+            state = self._engines[engine_id] = EngineLatency(self.window)
+            modules = engine_modules(engine_id)
+            if modules:
+                state.configured = getattr(modules[0], "timeout", None)
+        return state
+
+    # --- samples ---
+
+    def start(self, engine_id: str) -> int:
+        """Mark a request to ENGINE_ID as sent; returns a token for finish()."""
+        if not self.enabled or not engine_id:
+            return 0
+        now = time.monotonic()
+        token = next(self._ids)
+        with self._lock:
+            state = self._engine(engine_id)
+            self._sweep(engine_id, state, now)
+            state.outstanding[token] = now
+        return token
+
+    def finish(self, engine_id: str, token: int) -> None:
+        if not token:
+            return
+        now = time.monotonic()
+        with self._lock:
+            state = self._engines.get(engine_id)
+            started = state.outstanding.pop(token, None) if state else None
+            if started is None:
+                return  # already written off as timed out
+            self._add(engine_id, state, now - started, censored=False)
+
+    def _sweep(self, engine_id: str, state: EngineLatency, now: float) -> None:
+        # INVARIANT: Caller holds the lock. SearXNG abandoned anything older than the timeout it planned with.
+        limit = state.current or state.configured or self._bounds(engine_id)[1]
+        expired = [t for t, started in state.outstanding.items() if now - started > limit]
+        for token in expired:
+            del state.outstanding[token]
+            state.timeouts += 1
+            self._add(engine_id, state, limit, censored=True)
+
+    def _add(self, engine_id: str, state: EngineLatency, seconds: float, censored: bool) -> None:
+        state.samples.append(seconds)
+        state.censored.append(censored)
+        state.pending += 1
+        if len(state.samples) >= self.min_samples and state.pending >= self.recompute_every:
+            state.pending = 0
+            self._recompute(engine_id, state)
+
+    # --- timeouts ---
+
+    @staticmethod
+    def _rank(samples: List[Tuple[float, bool]], percentile: float) -> Tuple[float, bool]:
+        # nearest-rank percentile over (seconds, censored), sorted by seconds
+        index = min(len(samples) - 1, max(0, int(round(percentile / 100 * len(samples))) - 1))
+        return samples[index]
+
+    def _recompute(self, engine_id: str, state: EngineLatency) -> None:
+        low, high = self._bounds(engine_id)
+        ordered = sorted(zip(state.samples, state.censored))
+        value, censored = self._rank(ordered, self.percentile)
+        if censored:
+            # the target percentile is a request we gave up on; its real latency is unknown
+            target = value * self.grow
+        else:
+            target = value * self.headroom
+        target = round(min(high, max(low, target)), 2)
+
+        if target != state.current:
+            previous = state.current or state.configured
+            state.current = target
+            state.changes += 1
+            self._apply(engine_id, target)
+            logger.debug(f'4get {engine_id} timeout {previous} -> {target}s (p{self.percentile:g}={value:.2f}s)')
+
+    @staticmethod
+    def _apply(engine_id: str, seconds: float) -> None:
+        for module in engine_modules(engine_id):
+            module.timeout = seconds
+
+    def current(self, engine_id: str) -> Optional[float]:
+        state = self._engines.get(engine_id)
+        return state.current if state else None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = {
+                name: (sorted(zip(s.samples, s.censored)), s.configured, s.current, s.timeouts, s.changes,
+                       len(s.outstanding))
+                for name, s in self._engines.items()
+            }
+        engines = {}
+        for name, (ordered, configured, current, timeouts, changes, outstanding) in snapshot.items():
+            engines[name] = {
+                "configured": configured,
+                "current": current,
+                "bounds": self._bounds(name),
+                "samples": len(ordered),
+                "p50": round(self._rank(ordered, 50)[0], 3) if ordered else None,
+                "p95": round(self._rank(ordered, 95)[0], 3) if ordered else None,
+                "timeouts": timeouts,
+                "changes": changes,
+                "outstanding": outstanding,
+            }
+        return {"enabled": self.enabled, "percentile": self.percentile, "headroom": self.headroom, "engines": engines}
+
+
+_MODULES: Dict[str, List[Any]] = {}
+
+
+def engine_modules(engine_id: str) -> List[Any]:
+    """SearXNG engine modules running ENGINE_ID (one per settings.yml entry using that stub)."""
+    modules = _MODULES.get(engine_id)
+    if modules:
+        return modules
+    try:
+        from searx.engines import engines  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return []
+    # the stubs set EID from their file name, e.g. google-4get.py -> google
+    modules = [m for m in list(engines.values()) if getattr(m, "EID", None) == engine_id]
+    if modules:
+        _MODULES[engine_id] = modules
+    return modules
+
+
+def engine_timeout(engine_id: str, default: float = 3.0) -> float:
+    """Seconds SearXNG currently waits for ENGINE_ID (the adaptive value once it has been applied)."""
+    modules = engine_modules(engine_id)
+    timeout = getattr(modules[0], "timeout", None) if modules else None
+    return float(timeout) if isinstance(timeout, (int, float)) and timeout > 0 else default
@@ -0,0 +1,246 @@
+"""
+URL classification and canonical forms for 4get results.
+
+The same thumbnail, CDN and proxy-wrapped URLs repeat across pages, engines
+and categories, so the verdicts (unwrap, validate, broken/placeholder, root
+path) are memoized in a bounded LRU per process. Every function here is pure
+in its input string, which is what makes the memo safe.
+"""
+import logging
+import os
+import re
+from functools import lru_cache
+from html import unescape
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import unquote_plus, urlparse, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+# PRE-COMPILED REGEX
+BROKEN_IMAGE_RE = re.compile(
+    r'''(?x)
+    # Data URI for 1x1 transparent GIF (exact prefix)
+    ^data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP
+    |
+    # Pixel trackers - specific filenames only (consistent extensions)
+    /(?:1x1|spacer|blank|tracking)\.(gif|png|jpg|jpeg|webp)(?:\?|$)
+    |
+    # Placeholder patterns - exact filenames (consistent extensions)
+    /(?:placeholder|no[-_]?image|image[-_]?not[-_]?found|default[-_]?(?:image|thumb)|broken[-_]?image)\.(gif|png|jpg|jpeg|svg|webp)(?:\?|$)
+    ''',
+    re.IGNORECASE
+)
+
+VALID_SCHEMES = ("http://", "https://", "magnet:", "ftp://", "ipfs://", "ipns://", "git://")
+DEFAULT_PORTS = {"http": 80, "https": 443, "ftp": 21}
+
+MEMO_SIZE = int(os.environ.get("FOURGET_URL_MEMO", 8192))
+
+# Verdict reasons, for debug logging of rejected thumbnails
+INVALID = "invalid format"
+BROKEN = "broken image pattern"
+ROOT = "root path only"
+NUL = "nul bytes"
+
+
+# --- Primitives ---
+
+def sanitize_url(url: Any) -> Optional[str]:
+    """Sanitize and heal URL: type check, strip, and fix double-encoding."""
+    if not isinstance(url, str):
+        return None
+
+    s_url = url.strip()
+    if not s_url:
+        return None
+
+    if '&' in s_url:
+        s_url = unescape(s_url)
+
+    return s_url
+
+
+def is_valid_url(url: Any) -> bool:
+    if not url or not isinstance(url, str):
+        return False
+    return len(url) >= 5 and url.startswith(VALID_SCHEMES)
+
+
+def is_root_path_url(url: str) -> bool:
+    """Check if URL is just a domain root with no meaningful path or query (e.g., 'https://example.com/')."""
+    if not url:
+        return True
+    try:
+        parsed = urlparse(url)
+        return not parsed.path.rstrip('/') and not parsed.query
+    except Exception:
+        logger.debug(f'is_root_path_url failed for: {url[:100]}')
+        return True
+
+
+def is_broken_image_url(url: str) -> bool:
+    """Check if URL is a broken image placeholder using pre-compiled regex."""
+    if not url or not isinstance(url, str):
+        return True
+    return bool(BROKEN_IMAGE_RE.search(url))
+
+
+def extract_proxied_url(url: str) -> str:
+    """Extract original URL from 4get proxy wrapper if present."""
+    if not url or "url=" not in url:
+        return url
+    # INVARIANT: Only extract proxy formats if the link is relative or specifically tied to 4get.
+    if not (url.startswith("/") or "4get" in url.lower()):
+        return url
+
+    try:
+        # HAZARD: Isoline parsing of URL fragments must occur before query search, or fragment '#' injection causes parse-breakage on decode.
+        work_url = url.split('#', 1)[0]
+
+        start_idx = work_url.find('?url=')
+        if start_idx == -1:
+            start_idx = work_url.find('&url=')
+
+        if start_idx != -1:
+            val_start = start_idx + 5
+            val_end = work_url.find('&', val_start)
+
+            if val_end == -1:
+                raw_val = work_url[val_start:]
+            else:
+                raw_val = work_url[val_start:val_end]
+
+            # INVARIANT: `unquote_plus` ensures '+' encodes back to spacing as expected by parse_qs mechanics.
+            candidate = unquote_plus(raw_val)
+            # INVARIANT: Double-encoded `&amp;` is extremely common in raw 4get reddit/img endpoints.
+            if '&amp;' in candidate:
+                candidate = unescape(candidate)
+
+            if is_valid_url(candidate):
+                return candidate
+
+    except Exception as e:
+        logger.debug(f'extract_proxied_url failed for: {url[:100]}: {e}')
+
+    # Fallback: strict safety return original if extraction failed
+    return url
+
+
+# --- Memoized verdicts ---
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _thumbnail_verdict(raw: str) -> Tuple[Optional[str], Optional[str]]:
+    url = sanitize_url(raw)
+    if not url:
+        return None, None
+
+    # INVARIANT: Extract proxy wrappers aggressively so we don't serve dead proxy endpoints.
+    url = extract_proxied_url(url)
+
+    if not is_valid_url(url):
+        return None, INVALID
+    if is_broken_image_url(url):
+        return None, BROKEN
+    if is_root_path_url(url):
+        return None, ROOT
+    return url, None
+
+
+def classify_thumbnail(url: Any, context: str = "thumbnail") -> Optional[str]:
+    """Unwrapped thumbnail URL, or None when it can't be shown."""
+    if not isinstance(url, str):
+        return None
+    result, reason = _thumbnail_verdict(url)
+    if reason is not None and logger.isEnabledFor(logging.DEBUG):
+        logger.debug(f"Rejected {context} URL ({reason}): {url[:100]}")
+    return result
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _image_source_verdict(url: str) -> Tuple[Optional[str], Optional[str]]:
+    # HAZARD: Validity is checked before unwrapping here, unlike thumbnails; relative proxy paths are rejected.
+    if not is_valid_url(url):
+        return None, INVALID
+    if '\x00' in url:
+        return None, NUL
+    url = extract_proxied_url(url)
+    if is_broken_image_url(url):
+        return None, BROKEN
+    if is_root_path_url(url):
+        return None, ROOT
+    return url, None
+
+
+def classify_image_source(url: Optional[str]) -> Optional[str]:
+    """Full-size image URL (already sanitized), unwrapped, or None when unusable."""
+    if not url:
+        return None
+    return _image_source_verdict(url)[0]
+
+
+def rejection_reason(url: Any, image_source: bool = False) -> Optional[str]:
+    """Why the classifier turned URL down (None if it didn't). A memo hit right after the rejection."""
+    if not isinstance(url, str) or not url:
+        return None
+    return (_image_source_verdict(url) if image_source else _thumbnail_verdict(url))[1]
+
+
+@lru_cache(maxsize=MEMO_SIZE)
+def _canonical(url: str) -> str:
+    url = extract_proxied_url(url)
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return url
+    if not parts.netloc:
+        return url
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    if ":" in host:
+        host = f"[{host}]"
+    try:
+        port = parts.port
+    except ValueError:
+        port = None
+    if port is not None and port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{port}"
+    if parts.username:
+        # keep credentials verbatim, they are part of the identity
+        userinfo = parts.username + (f":{parts.password}" if parts.password else "")
+        host = f"{userinfo}@{host}"
+
+    path = parts.path.rstrip("/")
+    # fragments never reach the server, so they don't distinguish resources
+    return urlunsplit((scheme, host, path, parts.query, ""))
+
+
+def canonical_url(url: Any) -> Optional[str]:
+    """Comparison key for a result URL: proxy unwrapped, scheme/host lowercased,
+    default port, trailing slash and fragment dropped. Never shown to users."""
+    url = sanitize_url(url)
+    if not url:
+        return None
+    return _canonical(url)
+
+
+def memo_stats() -> Dict[str, Dict[str, Any]]:
+    stats = {}
+    for name, func in (("thumbnail", _thumbnail_verdict), ("image_source", _image_source_verdict),
+                       ("canonical", _canonical)):
+        info = func.cache_info()
+        lookups = info.hits + info.misses
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "maxsize": info.maxsize,
+            "hit_rate": info.hits / lookups if lookups else None,
+        }
+    return stats
+
+
+def clear_memo() -> None:
+    _thumbnail_verdict.cache_clear()
+    _image_source_verdict.cache_clear()
+    _canonical.cache_clear()
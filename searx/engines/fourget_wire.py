@@ -0,0 +1,67 @@
+"""
+Content negotiation between the client and harness.php.
+
+The client advertises the body encodings and compressions it can decode, the
+sidecar picks the best one it has an extension for, and decode_body() undoes
+whatever came back. Plain JSON stays the fallback on both sides.
+"""
+import json
+import logging
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MSGPACK_TYPE = "application/x-msgpack"
+JSON_TYPE = "application/json"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+def request_headers(allow_binary: bool = True, allow_zstd: bool = True) -> Dict[str, str]:
+    """Accept/Accept-Encoding for a harness request, limited to what this process can decode."""
+    accept = f"{MSGPACK_TYPE}, {JSON_TYPE};q=0.5" if allow_binary and msgpack is not None else JSON_TYPE
+    # gzip is always decoded by the HTTP client; zstd only when we can undo it ourselves, which
+    # only decode_body does (the stream parser reads whatever the HTTP client hands it)
+    encodings = "zstd, gzip" if allow_zstd and zstandard is not None else "gzip"
+    return {"Accept": accept, "Accept-Encoding": encodings}
+
+
+def _content(resp: Any) -> bytes:
+    content = resp.content
+    encoding = resp.headers.get("content-encoding", "")
+    # HAZARD: Older httpx passes unknown content-encodings through untouched.
+    if "zstd" in encoding and content[:4] == _ZSTD_MAGIC and zstandard is not None:
+        content = zstandard.ZstdDecompressor().decompressobj().decompress(content)
+    return content
+
+
+def decode_body(resp: Any) -> Any:
+    """Decode a harness response with the fastest decoder for its content type."""
+    content_type = resp.headers.get("content-type", "")
+    if "msgpack" in content_type:
+        if msgpack is None:
+            raise ValueError("sidecar sent msgpack but msgpack is not installed")
+        # HAZARD: Scrapers can emit invalid UTF-8 that json_encode would have refused; msgpack passes it through.
+        return msgpack.unpackb(_content(resp), raw=False, strict_map_key=False, unicode_errors="replace")
+    content = _content(resp)
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def available() -> Dict[str, bool]:
+    return {"msgpack": msgpack is not None, "orjson": orjson is not None, "zstd": zstandard is not None}
@@ -1,37 +1,56 @@
 #!/bin/bash
 set -e
 
-REPO_DIR="/var/www/html/4get-repo"
-CONFIG_FILE="$REPO_DIR/data/config.php"
+APP_DIR="/var/www/html"
+REPO_DIR="$APP_DIR/4get-repo"
 
+CLONED=0
 if [ ! -d "$REPO_DIR" ]; then
     echo "📥 4get-repo not found, cloning..."
     git clone --depth 1 https://git.lolcat.ca/lolcat/4get.git "$REPO_DIR"
+    CLONED=1
 fi
 
-FIREFOX_UA="Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:117.0) Gecko/20100101 Firefox/117.0"
-echo "⚙️  Configuring 4get..."
-
-if [ -f "$CONFIG_FILE" ]; then
-    sed -i -E "s|const\s+USER_AGENT\s*=\s*\".*\";|const USER_AGENT = \"$FIREFOX_UA\";|g" "$CONFIG_FILE"
-    echo "✅ User-Agent set to Firefox 117."
+# The image patches 4get and bakes manifest.json at build (prepare.sh); redo it only when that can't hold
+if [ ! -f "$APP_DIR/.baked" ] || [ "$CLONED" = "1" ] || [ "${FOURGET_WARMUP:-1}" = "0" ]; then
+    prepare.sh
 else
-    echo "⚠️  Config not found. Skipping UA patch."
+    echo "📦 Using manifest baked at build."
 fi
 
-DDG_SCRAPER="$REPO_DIR/scraper/ddg.php"
-if [ -f "$DDG_SCRAPER" ]; then
-    sed -i -E 's/return\s+\$this->web_full\(\$get\)\s*;/return $this->web_html($get);/' "$DDG_SCRAPER"
-    echo "✅ DDG patched to HTML endpoint."
+# Warm start: opcache.preload compiles every scraper when Apache starts (see src/preload.php)
+PRELOAD_INI="/usr/local/etc/php/conf.d/zz-fourget-preload.ini"
+if [ "${FOURGET_WARMUP:-1}" != "0" ]; then
+    printf 'opcache.preload=%s/preload.php\nopcache.preload_user=www-data\n' "$APP_DIR" > "$PRELOAD_INI"
+else
+    rm -f "$PRELOAD_INI"
 fi
 
-echo "📦 Generating manifest..."
-php /var/www/html/generate_manifest.php
-
 if ! grep -q "HostnameLookups Off" /etc/apache2/apache2.conf; then
     echo "HostnameLookups Off" >> /etc/apache2/apache2.conf
     echo "ServerName localhost" >> /etc/apache2/apache2.conf
     echo "✅ Apache DNS lookups disabled and ServerName set."
 fi
 
+# FOURGET_SIDECAR_MODE=worker: pre-forked PHP CLI workers (src/worker.php) instead of Apache
+if [ "${FOURGET_SIDECAR_MODE:-apache}" = "worker" ] && [ "$1" = "apache2-foreground" ]; then
+    echo "🔁 Worker mode: ${FOURGET_WORKERS:-16} pre-forked PHP workers."
+    set -- php /var/www/html/worker.php
+fi
+
+# Apache: primes APCu and marks the sidecar ready; health.php answers 503 until then.
+# Worker mode warms up in worker.php's master before it forks.
+if [ "${FOURGET_WARMUP:-1}" != "0" ] && [ "$1" = "apache2-foreground" ]; then
+    (
+        for _ in $(seq 1 120); do
+            if curl -fsS -o /dev/null http://127.0.0.1/warmup.php; then
+                echo "🔥 Warm-up done."
+                exit 0
+            fi
+            sleep 0.5
+        done
+        echo "⚠️  Warm-up never answered; health.php stays 503."
+    ) &
+fi
+
 exec "$@"
\ No newline at end of file
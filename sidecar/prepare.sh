@@ -0,0 +1,28 @@
+#!/bin/bash
+# Patches the 4get checkout for the sidecar and writes manifest.json.
+# Runs at image build (warm start) and again from entrypoint.sh when the image wasn't baked,
+# the repo had to be cloned at start, or FOURGET_WARMUP=0.
+set -e
+
+APP_DIR="${APP_DIR:-/var/www/html}"
+REPO_DIR="$APP_DIR/4get-repo"
+CONFIG_FILE="$REPO_DIR/data/config.php"
+
+FIREFOX_UA="Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:117.0) Gecko/20100101 Firefox/117.0"
+echo "⚙️  Configuring 4get..."
+
+if [ -f "$CONFIG_FILE" ]; then
+    sed -i -E "s|const\s+USER_AGENT\s*=\s*\".*\";|const USER_AGENT = \"$FIREFOX_UA\";|g" "$CONFIG_FILE"
+    echo "✅ User-Agent set to Firefox 117."
+else
+    echo "⚠️  Config not found. Skipping UA patch."
+fi
+
+DDG_SCRAPER="$REPO_DIR/scraper/ddg.php"
+if [ -f "$DDG_SCRAPER" ]; then
+    sed -i -E 's/return\s+\$this->web_full\(\$get\)\s*;/return $this->web_html($get);/' "$DDG_SCRAPER"
+    echo "✅ DDG patched to HTML endpoint."
+fi
+
+echo "📦 Generating manifest..."
+php "$APP_DIR/generate_manifest.php"
@@ -0,0 +1,16 @@
+<?php
+// Runs several harness jobs for one search in a single round trip (see batch_handle in core.php).
+ob_start();
+
+ini_set('display_errors', 0);
+ini_set('log_errors', 1);
+
+require_once 'core.php';
+
+$raw_input = file_get_contents('php://input');
+$input = json_decode($raw_input, true);
+
+$response = batch_handle($input);
+
+harness_drain(0);
+wire_emit($response, '{"results":{}}');
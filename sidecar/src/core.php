@@ -0,0 +1,739 @@
+<?php
+// Request handling shared by the Apache entry points (harness.php, batch.php,
+// health.php) and worker.php. Handlers take the decoded input and return the
+// data to send; the caller owns headers, output and the connection.
+
+require_once __DIR__ . '/wire.php';
+require_once __DIR__ . '/timing.php';
+require_once __DIR__ . '/guard.php';
+require_once __DIR__ . '/project.php';
+
+const HARNESS_DEFAULTS = [
+    's' => '',
+    'country' => 'us',
+    'nsfw' => 'yes',
+    'lang' => 'en',
+    'npt' => null,
+    'older' => false,
+    'newer' => false,
+    'spellcheck' => 'yes',
+    'focus' => 'any',
+    'region' => 'any',
+    'domain' => '1',
+    'date' => 'any',
+    'extendedsearch' => 'no',
+    'intitle' => 'no',
+    'format' => 'any',
+    'file' => 'any',
+    'javascript' => 'any',
+    'trackers' => 'any',
+    'cookies' => 'any',
+    'affiliate' => 'any',
+    'adtech' => 'yes',
+    'recent' => 'no'
+];
+
+const BATCH_MAX_JOBS = 32;
+const BATCH_DEFAULT_TIMEOUT = 10;
+// MaxRequestWorkers of php:apache's mpm_prefork.conf
+const BATCH_APACHE_WORKERS = 150;
+
+// mock.php pulls in the 4get repo; health.php has to answer without it
+function harness_boot() {
+    require_once __DIR__ . '/mock.php';
+    require_once __DIR__ . '/paging.php';
+    require_once __DIR__ . '/flight.php';
+    static $booted = false;
+    if (!$booted) {
+        set_include_path(__DIR__ . '/dummy_lib' . PATH_SEPARATOR . __DIR__ . '/4get-repo' . PATH_SEPARATOR . get_include_path());
+        $booted = true;
+    }
+}
+
+function harness_manifest() {
+    static $manifest = null;
+    if ($manifest === null) {
+        $manifest = apcu_fetch('hijacker_manifest');
+        if ($manifest === false) {
+            $manifest = json_decode(file_get_contents(__DIR__ . '/manifest.json'), true);
+            apcu_store('hijacker_manifest', $manifest, 0);
+        }
+    }
+    return $manifest;
+}
+
+// worker.php: one constructor call per scraper class and process; every request works on a
+// deep copy, so whatever a scraper keeps on $this or its fuckhtml/backend objects (npt, cookies,
+// parsed DOM, counters) can't reach the next search. Apache runs one request per script, so a
+// fresh instance is both cheaper and as clean there.
+function harness_instance($class_name) {
+    static $prototypes = [];
+    if (!function_exists('worker_batch_jobs')) {
+        return new $class_name();
+    }
+    if (!isset($prototypes[$class_name])) {
+        $prototypes[$class_name] = new $class_name();
+    }
+    return harness_deep_clone($prototypes[$class_name]);
+}
+
+// `clone` is shallow; copy every object reachable through properties and arrays too.
+// Objects PHP can't clone (curl handles and the like) stay shared, as do readonly properties.
+function harness_deep_clone($value, array &$copies = []) {
+    if (is_array($value)) {
+        foreach ($value as $key => $item) {
+            $value[$key] = harness_deep_clone($item, $copies);
+        }
+        return $value;
+    }
+    if (!is_object($value)) {
+        return $value;
+    }
+    $id = spl_object_id($value);
+    if (isset($copies[$id])) {
+        return $copies[$id];  // shared or cyclic references stay shared within the copy
+    }
+    $class = new ReflectionObject($value);
+    if (!$class->isCloneable() || $value instanceof Closure) {
+        return $copies[$id] = $value;
+    }
+    $copy = clone $value;
+    $copies[$id] = $copy;
+    foreach ($class->getProperties() as $property) {
+        if ($property->isStatic() || $property->isReadOnly() || !$property->isInitialized($copy)) {
+            continue;
+        }
+        $item = $property->getValue($copy);
+        if (is_object($item) || is_array($item)) {
+            $property->setValue($copy, harness_deep_clone($item, $copies));
+        }
+    }
+    return $copy;
+}
+
+// One scraper call: timed, and each proxy's outcome fed back to the pool
+function harness_scrape($instance, $method, $params) {
+    try {
+        $result = timing_scrape(function () use ($instance, $method, $params) {
+            return $instance->$method($params);
+        });
+    } catch (Throwable $e) {
+        proxy_pool_settle($e->getMessage());
+        throw $e;
+    }
+    proxy_pool_settle();
+    return $result;
+}
+
+// drain down to $level — scrapers sometimes call ob_start() themselves
+function harness_drain($level) {
+    while (ob_get_level() > $level) {
+        ob_end_clean();
+    }
+}
+
+function harness_error($msg) {
+    $response = ['status' => 'error', 'message' => $msg];
+    $msg_l = strtolower($msg);
+
+    if (str_contains($msg_l, 'captcha') || str_contains($msg_l, 'pow')) {
+        $response['suspend'] = 300;
+    } elseif (str_contains($msg_l, 'too many request') || str_contains($msg_l, '429')) {
+        $response['suspend'] = 60;
+    } elseif (str_contains($msg_l, 'blocked') || str_contains($msg_l, 'forbidden') || str_contains($msg_l, '403')) {
+        $response['suspend'] = 300;
+    } elseif (str_contains($msg_l, 'not found') || str_contains($msg_l, 'not supported') || str_contains($msg_l, 'class ')) {
+        $response['suspend'] = 300;
+    } else {
+        $response['suspend'] = 30;
+    }
+    return $response;
+}
+
+// Run one harness request. Returns the data to send; $after is set to the prefetch to run
+// once the response is out (the user never waits on it), or stays null.
+function harness_handle($input, &$after) {
+    $after = null;
+    project_reset();
+    harness_boot();
+
+    if (!is_array($input) || !$input) {
+        return ['status' => 'error', 'message' => 'Invalid JSON payload received by sidecar'];
+    }
+
+    $engine_input = str_replace('-', '_', $input['engine'] ?? '');
+    $engine = preg_replace('/[^a-z0-9_]/', '', $engine_input);
+
+    guard_begin($engine, $input['deadline'] ?? null);
+    try {
+        if (guard_expired()) {
+            // queued behind busy workers until the client gave up; nobody would read the answer
+            guard_count($engine, 'expired', 0);
+            return ['status' => 'error', 'message' => 'deadline passed before the scraper started', 'suspend' => 0];
+        }
+        $result = harness_run($input, $engine, $after);
+        // INVARIANT: After harness_run; prefetch, window and singleflight caches keep whole results.
+        timing_start('project');
+        $result = project_apply($result, $input['project'] ?? null, $engine);
+        timing_stop('project');
+        return $result;
+    } finally {
+        guard_end();
+    }
+}
+
+function harness_run($input, $engine, &$after) {
+    $level = ob_get_level();
+
+    timing_start('manifest');
+    $manifest = harness_manifest();
+    timing_stop('manifest');
+
+    if (!isset($manifest[$engine])) {
+        return ['status' => 'error', 'message' => "Engine $engine not found in manifest"];
+    }
+
+    $engine_config = $manifest[$engine];
+
+    chdir(__DIR__ . '/4get-repo');
+
+    if (!file_exists($engine_config['file'])) {
+        return ['status' => 'error', 'message' => "File not found: " . $engine_config['file']];
+    }
+
+    timing_start('include');
+    require_once $engine_config['file'];
+
+    $className = $engine_config['class'];
+    if (!class_exists($className)) {
+        return ['status' => 'error', 'message' => "Class $className not found"];
+    }
+
+    $instance = harness_instance($className);
+    timing_stop('include');
+
+    $params = ($input['params'] ?? []) + HARNESS_DEFAULTS;
+
+    $method = $input['category'] ?? 'web';
+    $offset = (int)($params['offset'] ?? 0);
+    // limit > 0: the client wants fixed-size pages cut from a window buffer (see paging.php)
+    $limit = max(0, (int)($input['limit'] ?? 0));
+    // the client's offset counts SearXNG pages in steps of 10; a window starts at page * limit
+    $window_start = intdiv($offset, PAGING_CLIENT_STEP) * $limit;
+
+    backend::$context = [
+        'engine' => $engine,
+        's' => $params['s'] ?? '',
+        'offset' => $offset
+    ];
+
+    // One scraper page. $page_offset keys the deterministic npt that backend::store writes;
+    // null (window mode) writes none, the buffer carries the npt instead.
+    $scrape = function ($npt, $page_offset) use ($instance, $method, $params, $engine) {
+        $page_params = $params;
+        $page_params['npt'] = $npt;
+        backend::$context = ($page_offset === null) ? [] : [
+            'engine' => $engine,
+            's' => $params['s'] ?? '',
+            'offset' => $page_offset
+        ];
+        $result = harness_scrape($instance, $method, $page_params);
+        if (is_array($result) && !isset($result['npt']) && isset($instance->npt)) {
+            $result['npt'] = $instance->npt;
+        }
+        return $result;
+    };
+
+    // The client carries the npt it got for this page. Anything we can't resolve (expired, sealed by a
+    // replica with another secret, APCu of another replica) is treated as absent rather than fed to the scraper.
+    if (!empty($params['npt']) && !backend::token_valid($params['npt'])) {
+        $params['npt'] = null;
+    }
+
+    $prefetched = null;
+    if ($limit === 0 && $offset > 0) {
+        $prefetched = paging_take_page(paging_page_key($engine, $method, $params, $offset));
+
+        if ($prefetched === null && empty($params['npt'])) {
+            $det_key = md5($engine . ($params['s'] ?? '') . $params['offset']);
+            $stored_token = apcu_fetch("4get_det_$det_key");
+
+            if (!$stored_token) {
+                return [];
+            }
+            $params['npt'] = $stored_token;
+        }
+    }
+
+    // don't let 4get scraper warnings leak into the json response — kills all 4get engines if they do
+    $scraper_warnings = [];
+    set_error_handler(function ($severity, $msg, $file, $line) use (&$scraper_warnings) {
+        $scraper_warnings[] = ['severity' => $severity, 'msg' => $msg, 'file' => basename($file), 'line' => $line];
+        return true;
+    });
+
+    try {
+        if (!method_exists($instance, $method)) {
+            throw new Exception("Method '$method' not supported by engine '$engine'");
+        }
+
+        if ($prefetched !== null) {
+            $result = $prefetched;
+        } elseif ($limit > 0) {
+            $result = paging_window($engine, $method, $params, $window_start, $limit, function ($npt) use ($scrape) {
+                return $scrape($npt, null);
+            });
+            if ($result === null) {
+                // window buffer expired: same answer as a missing npt
+                return [];
+            }
+        } else {
+            // identical calls in flight on other workers wait for this one (see flight.php)
+            $result = flight_run(flight_key($engine, $method, $params), function () use ($instance, $method, $params) {
+                $result = harness_scrape($instance, $method, $params);
+                // INVARIANT: Followers never touch $instance; the npt has to travel inside the shared result.
+                if (is_array($result) && !isset($result['npt']) && isset($instance->npt)) {
+                    $result['npt'] = $instance->npt;
+                }
+                return $result;
+            });
+        }
+
+        harness_drain($level);
+
+        $resultCount = 0;
+        if (isset($result[$method]) && is_array($result[$method])) {
+            $resultCount = count($result[$method]);
+        } elseif (isset($result['web']) && $method === 'web') {
+            $resultCount = count($result['web']);
+        }
+
+        if ($resultCount === 0) {
+            $warn_summary = !empty($scraper_warnings)
+                ? ' (suppressed warnings: ' . $scraper_warnings[0]['file'] . ':' . $scraper_warnings[0]['line'] . ')'
+                : '';
+            error_log("Hijacker: Scraper '{$engine}' method '{$method}' returned 0 results{$warn_summary}");
+        }
+
+        if (!isset($result['npt']) && isset($instance->npt)) {
+            $result['npt'] = $instance->npt;
+        }
+
+        if ($prefetched === null && $limit === 0) {
+            paging_record_size($engine, $method, $resultCount);
+        }
+
+        if (paging_prefetch_enabled($engine) && ($limit > 0 || !empty($result['npt'])) && paging_acquire_prefetch_slot()) {
+            $after = function () use ($engine, $method, $params, $offset, $limit, $window_start, $result, $scrape, $level) {
+                set_error_handler(function () {
+                    return true;
+                });
+                // no deadline, nobody waits for this; the byte and memory caps still hold
+                guard_begin($engine, null);
+                try {
+                    if ($limit > 0) {
+                        paging_window_prefetch($engine, $method, $params, $window_start, $limit, function ($npt) use ($scrape) {
+                            return $scrape($npt, null);
+                        });
+                    } else {
+                        $next_offset = $offset + PAGING_CLIENT_STEP;
+                        $next = $scrape($result['npt'], $next_offset);
+                        if (paging_main_count($next, $method) > 0) {
+                            paging_record_size($engine, $method, paging_main_count($next, $method));
+                            paging_store_page(paging_page_key($engine, $method, $params, $next_offset), $next);
+                        }
+                    }
+                } catch (Throwable $e) {
+                    error_log("Hijacker Prefetch [{$engine}]: " . $e->getMessage());
+                } finally {
+                    guard_end();
+                    paging_release_prefetch_slot();
+                    restore_error_handler();
+                    backend::$context = [];
+                    harness_drain($level);
+                }
+            };
+        }
+
+        return $result;
+    } catch (Throwable $e) {
+        harness_drain($level);
+        $msg = $e->getMessage();
+        $aborted = guard_aborted();
+        if ($aborted !== null) {
+            // our abort surfaced as a scraper error; not the engine's fault, don't get it suspended
+            error_log("Hijacker Abort [{$engine}]: {$aborted} ({$msg})");
+            return ['status' => 'error', 'message' => "aborted: $aborted", 'suspend' => 0];
+        }
+        error_log("Hijacker Error [{$engine}]: {$msg}");
+        return harness_error($msg);
+    } finally {
+        restore_error_handler();
+    }
+}
+
+// Run several harness jobs for one search in a single round trip.
+// Under Apache the first job (the client lists the leader's first) runs in this worker and
+// the rest go to harness.php over loopback with curl_multi, so the scrapers still run
+// concurrently in separate workers, as many as batch_acquire_loopback allows.
+// worker.php forks one process per job instead (worker_batch_jobs): a loopback request
+// would need a free child of the same pool, and a batch already holds one.
+function batch_handle($input) {
+    project_reset();
+    if (!is_array($input) || !isset($input['jobs']) || !is_array($input['jobs'])) {
+        return ['status' => 'error', 'message' => 'Invalid batch payload received by sidecar'];
+    }
+
+    $jobs = array_slice($input['jobs'], 0, BATCH_MAX_JOBS);
+    $timeout = (float)($input['timeout'] ?? BATCH_DEFAULT_TIMEOUT);
+    $deadline = is_numeric($input['deadline'] ?? null) ? (float)$input['deadline'] : null;
+    if ($deadline !== null && $deadline - microtime(true) < GUARD_MAX_DEADLINE_S) {
+        $timeout = min($timeout, max(0.001, $deadline - microtime(true)));
+    }
+    $results = [];
+    // job id -> the job's Server-Timing and X-Fourget-Projected; the batch response has no per-job headers
+    $timings = [];
+    $projected = [];
+    $inputs = [];
+
+    foreach ($jobs as $i => $job) {
+        // non-numeric ids keep `results` a map in every encoding
+        $id = isset($job['id']) ? (string)$job['id'] : "job$i";
+
+        if (!is_array($job) || empty($job['engine'])) {
+            $results[$id] = ['status' => 'error', 'message' => 'Batch job missing engine', 'suspend' => 0];
+            continue;
+        }
+
+        $inputs[$id] = [
+            'engine' => $job['engine'],
+            'category' => $job['category'] ?? 'web',
+            'params' => $job['params'] ?? [],
+            'limit' => (int)($job['limit'] ?? 0),
+            'deadline' => $deadline,
+            'project' => $job['project'] ?? null
+        ];
+    }
+
+    if (function_exists('worker_batch_jobs')) {
+        foreach (worker_batch_jobs($inputs, $timeout) as $id => [$result, $timing, $saved]) {
+            $results[$id] = $result;
+            if ($timing !== null) {
+                $timings[$id] = $timing;
+            }
+            if ($saved > 0) {
+                $projected[$id] = $saved;
+            }
+        }
+        return ['results' => $results, 'timings' => $timings, 'projected' => $projected];
+    }
+
+    // Apache: the leader's job runs here, the others in loopback requests while slots last
+    $leader = array_key_first($inputs);
+    if ($leader === null) {
+        return ['results' => $results, 'timings' => $timings, 'projected' => $projected];
+    }
+    $others = array_slice($inputs, 1, null, true);
+    $held = batch_acquire_loopback(count($others));
+    // HAZARD: A fatal in the in-process job skips finally; the slots must still come back.
+    register_shutdown_function(function () use (&$held) {
+        batch_release_loopback($held);
+        $held = 0;
+    });
+    try {
+        // jobs past the granted slots get no result; their followers fall back to their own request
+        $loopback = batch_loopback_start(array_slice($others, 0, $held, true), $timeout, $timings, $projected);
+
+        timing_reset();
+        $after = null;
+        $level = ob_get_level();
+        ob_start();
+        try {
+            // no prefetch: the batch's answer goes out after every job, and nobody waits on one here
+            $results[$leader] = harness_handle($inputs[$leader], $after);
+        } catch (Throwable $e) {
+            $results[$leader] = harness_error($e->getMessage());
+        } finally {
+            harness_drain($level);
+        }
+        $timings[$leader] = timing_header();
+        if (project_saved() > 0) {
+            $projected[$leader] = project_saved();
+        }
+
+        $results += batch_loopback_finish($loopback);
+    } finally {
+        batch_release_loopback($held);
+        $held = 0;
+    }
+
+    return ['results' => $results, 'timings' => $timings, 'projected' => $projected];
+}
+
+// Every batch holds its own prefork worker plus one per loopback job it waits on. Keeping all of
+// those under half of MaxRequestWorkers (FOURGET_APACHE_WORKERS) leaves workers for the loopback
+// requests themselves, so batches can't fill the pool and wait on each other. Returns how many
+// loopback jobs this batch may send; 0 means it runs only its leader's job.
+function batch_acquire_loopback($wanted) {
+    if ($wanted < 1 || !function_exists('apcu_inc')) {
+        return 0;
+    }
+    $workers = (int)(getenv('FOURGET_APACHE_WORKERS') ?: BATCH_APACHE_WORKERS);
+    $max = (int)(getenv('FOURGET_BATCH_LOOPBACK_MAX') ?: intdiv($workers, 2));
+    apcu_add('hijacker_batch_inflight', 0, 0);
+    // the batch's own worker counts once it waits on anything
+    $inflight = apcu_inc('hijacker_batch_inflight', $wanted + 1);
+    if ($inflight === false) {
+        return 0;
+    }
+    $over = min($wanted + 1, max(0, $inflight - $max));
+    $granted = $wanted - $over;
+    if ($granted < 1) {
+        // not even one loopback job; give the batch's own slot back as well
+        $over = $wanted + 1;
+        $granted = 0;
+    }
+    if ($over > 0) {
+        apcu_dec('hijacker_batch_inflight', $over);
+        apcu_inc('hijacker_batch_overflow', $wanted - $granted);
+    }
+    return $granted;
+}
+
+function batch_release_loopback($held) {
+    if ($held > 0) {
+        apcu_dec('hijacker_batch_inflight', $held + 1);
+    }
+}
+
+// Send JOBS to harness.php and return the multi handle; transfers progress while the caller works
+function batch_loopback_start($jobs, $timeout, &$timings, &$projected) {
+    $loopback = getenv('FOURGET_BATCH_LOOPBACK') ?: 'http://127.0.0.1/harness.php';
+    $multi = curl_multi_init();
+    $handles = [];
+
+    foreach ($jobs as $id => $job_input) {
+        $body = json_encode($job_input);
+
+        // plain libcurl for loopback, no proxy and no impersonation needed
+        $ch = curl_init($loopback);
+        curl_setopt_array($ch, [
+            CURLOPT_POST => true,
+            CURLOPT_POSTFIELDS => $body,
+            CURLOPT_HTTPHEADER => ['Content-Type: application/json'],
+            CURLOPT_RETURNTRANSFER => true,
+            CURLOPT_TIMEOUT_MS => (int)($timeout * 1000),
+            CURLOPT_CONNECTTIMEOUT_MS => 1000,
+            CURLOPT_PROXY => '',
+            CURLOPT_HEADERFUNCTION => function ($ch, $line) use (&$timings, &$projected, $id) {
+                if (stripos($line, 'server-timing:') === 0) {
+                    $timings[$id] = trim(substr($line, strlen('server-timing:')));
+                } elseif (stripos($line, 'x-fourget-projected:') === 0) {
+                    $projected[$id] = (int)trim(substr($line, strlen('x-fourget-projected:')));
+                }
+                return strlen($line);
+            }
+        ]);
+        curl_multi_add_handle($multi, $ch);
+        $handles[$id] = $ch;
+    }
+    // get the requests out before the caller blocks on its own job
+    curl_multi_exec($multi, $running);
+
+    return [$multi, $handles];
+}
+
+function batch_loopback_finish($loopback) {
+    [$multi, $handles] = $loopback;
+    $results = [];
+
+    do {
+        $status = curl_multi_exec($multi, $running);
+        if ($running) {
+            curl_multi_select($multi, 0.05);
+        }
+    } while ($running && $status === CURLM_OK);
+
+    foreach ($handles as $id => $ch) {
+        $body = curl_multi_getcontent($ch);
+        $code = curl_getinfo($ch, CURLINFO_RESPONSE_CODE);
+        $error = curl_error($ch);
+
+        $decoded = ($body !== null && $body !== '') ? json_decode($body, true) : null;
+
+        if ($decoded === null) {
+            // transport failures are ours, not the engine's — don't ask the client to suspend it
+            $msg = $error ?: "harness returned HTTP $code";
+            error_log("Hijacker Batch: job '$id' failed: $msg");
+            $results[$id] = ['status' => 'error', 'message' => "batch job failed: $msg", 'suspend' => 0];
+        } else {
+            $results[$id] = $decoded;
+        }
+
+        curl_multi_remove_handle($multi, $ch);
+        curl_close($ch);
+    }
+    curl_multi_close($multi);
+
+    return $results;
+}
+
+// FOURGET_WARMUP=0 turns off preloading and lets health.php answer before warm-up
+function warmup_enabled() {
+    return getenv('FOURGET_WARMUP') !== '0';
+}
+
+// Compile every scraper, prime APCu with the manifest and mark the sidecar ready.
+// Apache: entrypoint.sh requests warmup.php once after start. Worker mode: the master
+// runs it before forking, so every child inherits the loaded classes.
+function warmup_run() {
+    $started = hrtime(true);
+    harness_boot();
+    $cwd = getcwd();
+    $manifest = json_decode((string)@file_get_contents(__DIR__ . '/manifest.json'), true);
+    if (!is_array($manifest)) {
+        return ['status' => 'error', 'message' => 'manifest.json missing or invalid'];
+    }
+    // INVARIANT: Overwrite, don't add; a container restart can keep APCu from the previous manifest.
+    apcu_store('hijacker_manifest', $manifest, 0);
+
+    chdir(__DIR__ . '/4get-repo');
+    $failed = [];
+    foreach ($manifest as $engine => $config) {
+        try {
+            if (file_exists($config['file'])) {
+                require_once $config['file'];
+            } else {
+                $failed[$engine] = 'file not found';
+            }
+        } catch (Throwable $e) {
+            $failed[$engine] = $e->getMessage();
+            error_log("Hijacker Warmup: loading '$engine' failed: " . $e->getMessage());
+        }
+    }
+    chdir($cwd);
+
+    $preload = function_exists('opcache_get_status') ? (opcache_get_status(false)['preload_statistics'] ?? null) : null;
+    $ready = [
+        'at' => time(),
+        'ms' => round((hrtime(true) - $started) / 1e6, 1),
+        'engines' => count($manifest) - count($failed),
+        'failed' => $failed,
+        'preloaded_scripts' => $preload ? count($preload['scripts'] ?? []) : 0,
+        'baked' => file_exists(__DIR__ . '/.baked')
+    ];
+    apcu_store('hijacker_ready', $ready, 0);
+    return $ready;
+}
+
+// Summed VmRSS of the apache2/php processes, from /proc; null where there is none
+function health_memory() {
+    $statuses = glob('/proc/[0-9]*/status');
+    if (!$statuses) {
+        return null;
+    }
+    $kb = 0;
+    $processes = 0;
+    foreach ($statuses as $file) {
+        $status = @file_get_contents($file);
+        if ($status === false || !preg_match('/^Name:\s+(apache2|php)/m', $status)) {
+            continue;
+        }
+        if (preg_match('/^VmRSS:\s+(\d+)\s+kB/m', $status, $m)) {
+            $kb += (int)$m[1];
+            $processes++;
+        }
+    }
+    // HAZARD: Forked children share their copy-on-write pages; summed RSS overstates the real total.
+    return ['rss_mb' => round($kb / 1024, 1), 'processes' => $processes];
+}
+
+// [HTTP status, report]
+function health_report() {
+    $health = [
+        'status' => 'ok',
+        'timestamp' => time(),
+        'mode' => PHP_SAPI === 'cli' ? 'worker' : 'apache',
+        'checks' => []
+    ];
+
+    // 1. Check APCu
+    if (function_exists('apcu_enabled') && apcu_enabled()) {
+        $health['checks']['apcu'] = 'ok';
+    } else {
+        $health['status'] = 'degraded';
+        $health['checks']['apcu'] = 'disabled';
+    }
+
+    // 1b. Warm-up done (see warmup_run); until then the pool and compose keep traffic away
+    if (warmup_enabled() && function_exists('apcu_enabled') && apcu_enabled()) {
+        $ready = apcu_fetch('hijacker_ready');
+        if ($ready === false) {
+            $health['status'] = 'warming';
+            $health['checks']['warmup'] = 'pending';
+        } else {
+            $health['checks']['warmup'] = 'ok';
+            $health['warmup'] = $ready;
+        }
+    }
+
+    // 2. Check 4get repo
+    if (is_dir(__DIR__ . '/4get-repo/scraper')) {
+        $health['checks']['4get_repo'] = 'ok';
+    } else {
+        $health['status'] = 'error';
+        $health['checks']['4get_repo'] = 'missing';
+    }
+
+    // 3. Check manifest
+    if (file_exists(__DIR__ . '/manifest.json')) {
+        $manifest = json_decode(file_get_contents(__DIR__ . '/manifest.json'), true);
+        $health['checks']['manifest'] = 'ok';
+        $health['engine_count'] = count($manifest);
+    } else {
+        $health['status'] = 'error';
+        $health['checks']['manifest'] = 'missing';
+    }
+
+    // 4. APCu memory stats (if available)
+    if (function_exists('apcu_sma_info')) {
+        $sma = apcu_sma_info();
+        $health['apcu_memory'] = [
+            'used_mb' => round($sma['seg_size'] - $sma['avail_mem'], 2) / 1024 / 1024,
+            'total_mb' => round($sma['seg_size'] / 1024 / 1024, 2)
+        ];
+    }
+
+    // 5. Learned page sizes, prefetch, singleflight, batch fan-out, abort, projection and proxy pool counters
+    if (function_exists('apcu_enabled') && apcu_enabled()) {
+        require_once __DIR__ . '/paging.php';
+        $health['paging'] = paging_stats();
+        require_once __DIR__ . '/flight.php';
+        $health['singleflight'] = flight_stats();
+        if (PHP_SAPI !== 'cli') {
+            $health['batch'] = [
+                'loopback_inflight' => (int)apcu_fetch('hijacker_batch_inflight'),
+                'loopback_overflow' => (int)apcu_fetch('hijacker_batch_overflow')
+            ];
+        }
+        $health['guard'] = guard_stats();
+        $health['projection'] = project_stats();
+        require_once __DIR__ . '/proxy_pool.php';
+        if (proxy_pool_list()) {
+            $health['proxy_pool'] = proxy_pool_stats();
+        }
+    }
+
+    // 6. Resident memory of every sidecar process (Apache children or workers)
+    $memory = health_memory();
+    if ($memory !== null) {
+        $health['memory'] = $memory;
+    }
+
+    // 7. Worker pool (worker.php only)
+    if (function_exists('worker_stats')) {
+        $health['worker'] = worker_stats();
+    }
+
+    return [$health['status'] === 'ok' ? 200 : 503, $health];
+}
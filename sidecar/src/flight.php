@@ -0,0 +1,90 @@
+<?php
+// Singleflight for identical scraper calls on this sidecar.
+// The first worker to ask for an {engine, method, params} runs the scraper; workers
+// asking for the same thing meanwhile wait for its result in APCu instead of
+// scraping upstream again. Complements the client's valkey lock, which covers
+// SearXNG workers spread over several sidecar replicas.
+
+require_once __DIR__ . '/paging.php';
+
+const FLIGHT_LOCK_TTL = 30;       // a crashed leader can't hold followers longer than this
+const FLIGHT_RESULT_TTL = 5;      // followers arriving just after the leader still share
+const FLIGHT_WAIT_MS = 8000;
+const FLIGHT_POLL_US = 20000;
+
+function flight_key($engine, $method, $params) {
+    $params = paging_time_bucket($params);
+    ksort($params);
+    return md5($engine . '|' . $method . '|' . json_encode($params));
+}
+
+// Same opt-in as the client (FOURGET_SINGLEFLIGHT=1); docker-compose passes it to both
+function flight_enabled() {
+    return function_exists('apcu_add') && getenv('FOURGET_SINGLEFLIGHT') === '1';
+}
+
+function flight_count($name) {
+    apcu_add("hijacker_flight_$name", 0, 0);
+    apcu_inc("hijacker_flight_$name");
+}
+
+// Run $fn once per key across concurrent workers; everyone gets the leader's result
+function flight_run($key, callable $fn) {
+    if (!flight_enabled()) {
+        return $fn();
+    }
+
+    $slot = "hijacker_flight_result_$key";
+    $lock = "hijacker_flight_lock_$key";
+
+    $result = apcu_fetch($slot, $hit);
+    if ($hit) {
+        flight_count('followers');
+        return $result;
+    }
+
+    if (apcu_add($lock, getmypid(), FLIGHT_LOCK_TTL)) {
+        flight_count('leaders');
+        try {
+            $result = $fn();
+            // INVARIANT: Only share successes; an error must be seen (and suspended on) by a live call.
+            if (is_array($result) && ($result['status'] ?? 'ok') !== 'error') {
+                apcu_store($slot, $result, FLIGHT_RESULT_TTL);
+            }
+            return $result;
+        } finally {
+            apcu_delete($lock);
+        }
+    }
+
+    $deadline = hrtime(true) + FLIGHT_WAIT_MS * 1000000;
+    while (hrtime(true) < $deadline) {
+        usleep(FLIGHT_POLL_US);
+        $result = apcu_fetch($slot, $hit);
+        if ($hit) {
+            flight_count('followers');
+            return $result;
+        }
+        if (!apcu_exists($lock)) {
+            break; // leader threw or got nothing worth sharing
+        }
+        if (function_exists('guard_expired') && guard_expired()) {
+            break; // our client is gone; the fallback below aborts at once and gets counted
+        }
+    }
+
+    flight_count('fallbacks');
+    return $fn();
+}
+
+function flight_stats() {
+    $leaders = (int)apcu_fetch('hijacker_flight_leaders');
+    $followers = (int)apcu_fetch('hijacker_flight_followers');
+    $total = $leaders + $followers;
+    return [
+        'leaders' => $leaders,
+        'followers' => $followers,
+        'fallbacks' => (int)apcu_fetch('hijacker_flight_fallbacks'),
+        'coalescing_ratio' => $total ? round($followers / $total, 3) : 0.0
+    ];
+}
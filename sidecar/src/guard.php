@@ -0,0 +1,221 @@
+<?php
+// Resource guards for one scraper run.
+// The client sends an absolute deadline (epoch seconds) with each job. backend::assign_proxy
+// hands every curl handle to guard_curl(), which caps the handle's timeout at the deadline
+// and installs a progress callback. Without a deadline, FOURGET_MAX_BYTES or
+// FOURGET_MEMORY_LIMIT nothing is installed and transfers run as the scraper set them up.
+// The callback aborts the transfer when:
+//   deadline    the client has given up on this engine
+//   disconnect  the client hung up (worker mode; Apache only notices on write)
+//   bytes       the scraper downloaded more than FOURGET_MAX_BYTES for this request
+//   memory      usage is closing in on the engine's FOURGET_MEMORY_LIMIT
+// (disconnect rides on the same callback, so it needs one of the three as well.)
+// A request whose deadline passed while it queued for a worker is refused before the
+// scraper is even loaded. Aborts, late answers and the worker time they cost are counted
+// per engine and reason in APCu.
+//
+//   FOURGET_MAX_BYTES=*:16M,pinterest:32M     all handles of one request together
+//   FOURGET_MEMORY_LIMIT=*:256M,google:96M    memory_limit while the engine's scraper runs
+
+const GUARD_MEMORY_HEADROOM = 0.9;     // abort transfers past 90% of the limit, before the fatal
+const GUARD_MAX_DEADLINE_S = 300;      // further out than this is clock skew, not a deadline
+const GUARD_PROBE_INTERVAL_NS = 100000000;
+
+function &guard_state() {
+    static $state = null;
+    if ($state === null) {
+        $state = ['engine' => null, 'deadline' => null, 'started' => 0, 'bytes' => [], 'timed' => [],
+                  'max_bytes' => 0, 'memory' => 0, 'restore' => null, 'aborted' => null, 'probe' => null,
+                  'last_probe' => 0, 'respond' => null];
+    }
+    return $state;
+}
+
+function guard_size($size) {
+    $size = trim((string)$size);
+    $units = ['K' => 1024, 'M' => 1048576, 'G' => 1073741824];
+    $unit = strtoupper(substr($size, -1));
+    return isset($units[$unit]) ? (int)((float)substr($size, 0, -1) * $units[$unit]) : (int)$size;
+}
+
+// FOURGET_MAX_BYTES=*:16M,pinterest:32M -> bytes for $engine, 0 when unset
+function guard_cap($env, $engine, $default = 0) {
+    static $caps = [];
+    if (!isset($caps[$env])) {
+        $caps[$env] = [];
+        foreach (explode(',', (string)getenv($env)) as $part) {
+            $fields = explode(':', trim($part));
+            if (count($fields) === 2 && $fields[0] !== '' && guard_size($fields[1]) > 0) {
+                $caps[$env][$fields[0]] = guard_size($fields[1]);
+            }
+        }
+    }
+    return $caps[$env][$engine] ?? $caps[$env]['*'] ?? guard_size($default);
+}
+
+function guard_begin($engine, $deadline) {
+    $state = &guard_state();
+    $deadline = is_numeric($deadline) ? (float)$deadline : null;
+    if ($deadline !== null && $deadline - microtime(true) > GUARD_MAX_DEADLINE_S) {
+        $deadline = null;
+    }
+    $state['engine'] = $engine;
+    $state['deadline'] = $deadline;
+    $state['started'] = hrtime(true);
+    $state['bytes'] = [];
+    $state['timed'] = [];
+    $state['aborted'] = null;
+    $state['max_bytes'] = guard_cap('FOURGET_MAX_BYTES', $engine);
+    $state['memory'] = guard_cap('FOURGET_MEMORY_LIMIT', $engine);
+    $state['restore'] = null;
+    if ($state['memory'] > 0) {
+        $state['restore'] = ini_get('memory_limit');
+        ini_set('memory_limit', (string)$state['memory']);
+    }
+
+    static $registered = false;
+    if (!$registered) {
+        register_shutdown_function('guard_shutdown');
+        $registered = true;
+    }
+}
+
+function guard_expired() {
+    $state = &guard_state();
+    return $state['deadline'] !== null && microtime(true) >= $state['deadline'];
+}
+
+function guard_aborted() {
+    $state = &guard_state();
+    return $state['aborted'];
+}
+
+// worker.php: returns true once the client has hung up
+function guard_set_probe($probe) {
+    $state = &guard_state();
+    $state['probe'] = $probe;
+}
+
+// Called with an error payload when the engine's scraper dies on its memory limit
+function guard_on_fatal($respond) {
+    $state = &guard_state();
+    $state['respond'] = $respond;
+}
+
+function guard_curl($curl) {
+    $state = &guard_state();
+    if ($state['engine'] === null) {
+        return;
+    }
+    if ($state['deadline'] === null && $state['max_bytes'] <= 0 && $state['memory'] <= 0) {
+        return;
+    }
+    guard_timeout($curl);
+    curl_setopt($curl, CURLOPT_NOPROGRESS, false);
+    curl_setopt($curl, CURLOPT_XFERINFOFUNCTION, 'guard_progress');
+}
+
+// Cap the handle's timeout at the deadline. CURLOPT_TIMEOUT and CURLOPT_TIMEOUT_MS share one
+// setting, so a scraper setting its own after assign_proxy undoes this; guard_progress applies
+// it again on the handle's first callback, before the transfer got anywhere.
+function guard_timeout($curl) {
+    $state = &guard_state();
+    if ($state['deadline'] !== null) {
+        curl_setopt($curl, CURLOPT_TIMEOUT_MS, max(1, (int)(($state['deadline'] - microtime(true)) * 1000)));
+    }
+}
+
+// Non-zero aborts the transfer; the scraper sees a curl error
+function guard_progress($curl, $dltotal, $dlnow, $ultotal, $ulnow) {
+    $state = &guard_state();
+    if ($state['aborted'] !== null) {
+        return 1;
+    }
+
+    $id = spl_object_id($curl);
+    if (!isset($state['timed'][$id])) {
+        $state['timed'][$id] = true;
+        guard_timeout($curl);
+    }
+    $state['bytes'][$id] = $dlnow;
+    if ($state['max_bytes'] > 0 && array_sum($state['bytes']) > $state['max_bytes']) {
+        $state['aborted'] = 'bytes';
+    } elseif ($state['memory'] > 0 && memory_get_usage() > $state['memory'] * GUARD_MEMORY_HEADROOM) {
+        $state['aborted'] = 'memory';
+    } elseif (guard_expired()) {
+        $state['aborted'] = 'deadline';
+    } elseif ($state['probe'] !== null) {
+        $now = hrtime(true);
+        if ($now - $state['last_probe'] > GUARD_PROBE_INTERVAL_NS) {
+            $state['last_probe'] = $now;
+            if (($state['probe'])()) {
+                $state['aborted'] = 'disconnect';
+            }
+        }
+    }
+    return $state['aborted'] === null ? 0 : 1;
+}
+
+// End of the guarded part: count an abort, or an answer nobody is waiting for anymore
+function guard_end() {
+    $state = &guard_state();
+    if ($state['engine'] === null) {
+        return null;
+    }
+    $reason = $state['aborted'] ?? (guard_expired() ? 'late' : null);
+    if ($reason !== null) {
+        guard_count($state['engine'], $reason, (hrtime(true) - $state['started']) / 1e6);
+    }
+    if ($state['restore'] !== null && $state['restore'] !== false) {
+        @ini_set('memory_limit', $state['restore']);
+    }
+    $state['engine'] = null;
+    $state['deadline'] = null;
+    $state['respond'] = null;
+    return $reason;
+}
+
+function guard_count($engine, $reason, $ms) {
+    if (!function_exists('apcu_inc')) {
+        return;
+    }
+    apcu_add("hijacker_guard|$engine|$reason", 0, 0);
+    apcu_inc("hijacker_guard|$engine|$reason");
+    apcu_add("hijacker_guardms|$engine|$reason", 0, 0);
+    apcu_inc("hijacker_guardms|$engine|$reason", (int)$ms);
+}
+
+// A scraper past memory_limit is a fatal error: count it and still answer with an error payload
+function guard_shutdown() {
+    $state = &guard_state();
+    $error = error_get_last();
+    if ($state['engine'] === null || !$error || $error['type'] !== E_ERROR
+        || !str_contains($error['message'], 'Allowed memory size')) {
+        return;
+    }
+    ini_set('memory_limit', '-1');
+    $respond = $state['respond'];
+    $state['aborted'] = 'memory';
+    guard_end();
+    if ($respond !== null) {
+        $respond(['status' => 'error', 'message' => 'aborted: memory limit', 'suspend' => 0]);
+    }
+}
+
+function guard_stats() {
+    $stats = ['aborts' => [], 'wasted_ms' => 0, 'engines' => []];
+    if (!class_exists('APCUIterator')) {
+        return $stats;
+    }
+    foreach (new APCUIterator('/^hijacker_guard(ms)?\|/') as $entry) {
+        [$kind, $engine, $reason] = explode('|', $entry['key']);
+        if ($kind === 'hijacker_guardms') {
+            $stats['wasted_ms'] += $entry['value'];
+            $stats['engines'][$engine]['wasted_ms'] = ($stats['engines'][$engine]['wasted_ms'] ?? 0) + $entry['value'];
+            continue;
+        }
+        $stats['aborts'][$reason] = ($stats['aborts'][$reason] ?? 0) + $entry['value'];
+        $stats['engines'][$engine][$reason] = $entry['value'];
+    }
+    return $stats;
+}
@@ -1,35 +1,48 @@
 <?php
 require_once __DIR__ . '/4get-repo/lib/fuckhtml.php';
 require_once __DIR__ . '/4get-repo/data/config.php';
+require_once __DIR__ . '/timing.php';
+require_once __DIR__ . '/proxy_pool.php';
+require_once __DIR__ . '/guard.php';
 
 class backend {
     public static $context = [];
 
+    private $service;
+
+    // Sealed npt tokens: the page state travels with the token instead of living in APCu,
+    // so any sidecar replica sharing FOURGET_TOKEN_SECRET can continue a search.
+    const TOKEN_PREFIX = 'fg1.';
+    const TOKEN_TTL = 3600;
+
     public function __construct($service) {
+        $this->service = $service;
         if (!function_exists('apcu_store')) {
             error_log("CRITICAL: APCu is not enabled. State storage will fail.");
         }
     }
 
+    // Healthy, fast proxies first, paced per engine (see proxy_pool.php)
     public function get_ip() {
-        $env_proxies = getenv('FOURGET_PROXIES');
-        if ($env_proxies) {
-            $proxies = explode(',', $env_proxies);
-            return trim($proxies[array_rand($proxies)]);
-        }
-
-        if (defined('config::PROXY_LIST') && !empty(config::PROXY_LIST)) {
-            $proxies = config::PROXY_LIST;
-            return $proxies[array_rand($proxies)];
-        }
-
-        return '127.0.0.1';
+        return proxy_pool_pick($this->service);
     }
 
     public function assign_proxy($curl, $proxy) {
+        timing_watch_curl($curl);
+        guard_curl($curl);
+
+        // Load tests: bench/replay_server.py answers for every upstream. Never set in production.
+        $replay = getenv('FOURGET_REPLAY');
+        if ($replay) {
+            $url = curl_getinfo($curl, CURLINFO_EFFECTIVE_URL);
+            curl_setopt($curl, CURLOPT_URL, rtrim($replay, '/') . '/replay?url=' . rawurlencode($url));
+            return;
+        }
+
         if ($proxy === '127.0.0.1' || empty($proxy)) {
             return;
         }
+        proxy_pool_watch($curl, $proxy);
 
         $parts = explode(':', $proxy);
         $url = $parts[0] . ':' . $parts[1];
@@ -43,13 +56,78 @@ class backend {
         curl_setopt($curl, CURLOPT_PROXYTYPE, CURLPROXY_HTTP);
     }
 
+    private static function token_key() {
+        static $key = false;
+        if ($key === false) {
+            $secret = getenv('FOURGET_TOKEN_SECRET');
+            $key = ($secret && function_exists('sodium_crypto_secretbox'))
+                ? sodium_crypto_generichash($secret, '', SODIUM_CRYPTO_SECRETBOX_KEYBYTES)
+                : null;
+        }
+        return $key;
+    }
+
+    // Encrypted + authenticated (the proxy may carry credentials). null when sealing is off.
+    public static function seal_token($data) {
+        $key = self::token_key();
+        if ($key === null) {
+            return null;
+        }
+        $data['exp'] = time() + self::TOKEN_TTL;
+        $json = json_encode($data);
+        if ($json === false) {
+            return null;
+        }
+        $nonce = random_bytes(SODIUM_CRYPTO_SECRETBOX_NONCEBYTES);
+        $box = sodium_crypto_secretbox(gzdeflate($json, 6), $nonce, $key);
+        return self::TOKEN_PREFIX . rtrim(strtr(base64_encode($nonce . $box), '+/', '-_'), '=');
+    }
+
+    public static function open_token($token) {
+        $key = self::token_key();
+        if ($key === null || !is_string($token) || strpos($token, self::TOKEN_PREFIX) !== 0) {
+            return null;
+        }
+        $raw = base64_decode(strtr(substr($token, strlen(self::TOKEN_PREFIX)), '-_', '+/'), true);
+        if ($raw === false || strlen($raw) <= SODIUM_CRYPTO_SECRETBOX_NONCEBYTES) {
+            return null;
+        }
+        $plain = sodium_crypto_secretbox_open(
+            substr($raw, SODIUM_CRYPTO_SECRETBOX_NONCEBYTES),
+            substr($raw, 0, SODIUM_CRYPTO_SECRETBOX_NONCEBYTES),
+            $key
+        );
+        if ($plain === false) {
+            return null;
+        }
+        $data = json_decode(gzinflate($plain), true);
+        if (!is_array($data) || ($data['exp'] ?? 0) < time()) {
+            return null;
+        }
+        return $data;
+    }
+
+    // A client-supplied npt we can still resolve: sealed and unexpired, or live in this APCu
+    public static function token_valid($token) {
+        if (!is_string($token) || $token === '') {
+            return false;
+        }
+        if (strpos($token, self::TOKEN_PREFIX) === 0) {
+            return self::open_token($token) !== null;
+        }
+        return apcu_exists("4get_$token");
+    }
+
     public function store($url, $type, $proxy) {
-        $token = bin2hex(random_bytes(16));
         $data = [
             'url' => $url,
             'proxy' => $proxy
         ];
-        apcu_store("4get_$token", $data, 3600);
+        $token = self::seal_token($data);
+        if ($token === null) {
+            $token = bin2hex(random_bytes(16));
+            apcu_store("4get_$token", $data, self::TOKEN_TTL);
+        }
 
         if (!empty(self::$context)) {
             $ctx = self::$context;
@@ -57,14 +135,14 @@ class backend {
             $next_offset = $current_offset + 10; 
             
             $key = md5(($ctx['engine'] ?? '') . ($ctx['s'] ?? '') . $next_offset);
-            apcu_store("4get_det_$key", $token, 3600);
+            apcu_store("4get_det_$key", $token, self::TOKEN_TTL);
         }
 
         return $token;
     }
 
     public function get($token, $type) {
-        $data = apcu_fetch("4get_$token");
+        $data = self::open_token($token) ?? apcu_fetch("4get_$token");
         if ($data === false) {
             return [null, '127.0.0.1'];
         }
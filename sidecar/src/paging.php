@@ -0,0 +1,224 @@
+<?php
+// Page handling on top of the 4get scrapers: learned page sizes, a page cache
+// for prefetched next pages, and an optional window buffer that serves fixed
+// size SearXNG pages out of whatever a scraper page returned.
+//
+// Everything lives in APCu, keyed per engine/method/query/filters, so any
+// Apache worker can answer the follow-up request.
+
+const PAGING_SIZE_ALPHA = 0.2;        // EWMA weight of the newest page
+const PAGING_PAGE_TTL = 300;          // prefetched page lifetime
+const PAGING_BUFFER_TTL = 600;        // window buffer lifetime
+const PAGING_LOCK_TTL = 30;
+const PAGING_DEFAULT_PREFETCH_MAX = 4;
+// offset step between SearXNG pages (client DEFAULT_PAGE_SIZE, backend::store's det key)
+const PAGING_CLIENT_STEP = 10;
+
+// The client stamps newer/older with the current time on every request; key on the span and
+// a bucket of its end instead, the way fourget_cache.request_key does, or no time-ranged
+// search would ever share a prefetched page, window or flight
+function paging_time_bucket($params) {
+    $newer = $params['newer'] ?? null;
+    $older = $params['older'] ?? null;
+    unset($params['newer'], $params['older']);
+    if (is_numeric($newer) && is_numeric($older) && (int)$older > (int)$newer) {
+        $span = (int)$older - (int)$newer;
+        $bucket = max(600, intdiv($span, 144));
+        $params['time'] = $span . '@' . intdiv((int)$older, $bucket);
+    }
+    return $params;
+}
+
+// Every param except the page cursor, so page N and N+1 of one search share a key
+function paging_query_key($engine, $method, $params) {
+    $filters = paging_time_bucket($params);
+    unset($filters['npt'], $filters['offset']);
+    ksort($filters);
+    return md5($engine . '|' . $method . '|' . json_encode($filters));
+}
+
+function paging_page_key($engine, $method, $params, $offset) {
+    return 'hijacker_page_' . paging_query_key($engine, $method, $params) . '_' . (int)$offset;
+}
+
+function paging_main_count($result, $method) {
+    return (isset($result[$method]) && is_array($result[$method])) ? count($result[$method]) : 0;
+}
+
+// --- learned page sizes ---
+
+function paging_record_size($engine, $method, $count) {
+    if ($count <= 0) {
+        return;
+    }
+    $key = "hijacker_pagesize_{$engine}_{$method}";
+    $current = apcu_fetch($key);
+    $size = ($current === false) ? $count : $current + PAGING_SIZE_ALPHA * ($count - $current);
+    apcu_store($key, $size, 0);
+}
+
+function paging_page_size($engine, $method) {
+    $size = apcu_fetch("hijacker_pagesize_{$engine}_{$method}");
+    return $size === false ? null : $size;
+}
+
+function paging_page_sizes() {
+    $sizes = [];
+    if (!class_exists('APCUIterator')) {
+        return $sizes;
+    }
+    foreach (new APCUIterator('/^hijacker_pagesize_/') as $entry) {
+        $sizes[substr($entry['key'], strlen('hijacker_pagesize_'))] = round($entry['value'], 1);
+    }
+    ksort($sizes);
+    return $sizes;
+}
+
+// --- prefetch ---
+
+function paging_prefetch_enabled($engine) {
+    $list = getenv('FOURGET_PREFETCH');
+    if (!$list) {
+        return false;
+    }
+    if (trim($list) === '*') {
+        return true;
+    }
+    return in_array($engine, array_map('trim', explode(',', $list)), true);
+}
+
+// Global in-flight cap across workers; prefetch must never queue behind itself
+function paging_acquire_prefetch_slot() {
+    $max = (int)(getenv('FOURGET_PREFETCH_MAX') ?: PAGING_DEFAULT_PREFETCH_MAX);
+    apcu_add('hijacker_prefetch_inflight', 0, 0);
+    $inflight = apcu_inc('hijacker_prefetch_inflight');
+    if ($inflight === false || $inflight > $max) {
+        apcu_dec('hijacker_prefetch_inflight');
+        apcu_inc('hijacker_prefetch_skipped');
+        return false;
+    }
+    return true;
+}
+
+function paging_release_prefetch_slot() {
+    apcu_dec('hijacker_prefetch_inflight');
+}
+
+function paging_lock($key) {
+    return apcu_add("hijacker_lock_$key", 1, PAGING_LOCK_TTL);
+}
+
+function paging_unlock($key) {
+    apcu_delete("hijacker_lock_$key");
+}
+
+// Send the response now and keep the worker for background work
+function paging_detach_client() {
+    ignore_user_abort(true);
+    if (function_exists('fastcgi_finish_request')) {
+        fastcgi_finish_request();
+        return;
+    }
+    // mod_php: Content-Length is already set by wire_emit, so the client stops reading here
+    flush();
+}
+
+function paging_store_page($key, $result) {
+    apcu_store($key, $result, PAGING_PAGE_TTL);
+    apcu_inc('hijacker_prefetch_stored');
+}
+
+// Page cache hit for the request, consumed on read
+function paging_take_page($key) {
+    $page = apcu_fetch($key);
+    if ($page === false) {
+        return null;
+    }
+    apcu_delete($key);
+    apcu_inc('hijacker_prefetch_hits');
+    return $page;
+}
+
+function paging_stats() {
+    return [
+        'prefetch_stored' => (int)apcu_fetch('hijacker_prefetch_stored'),
+        'prefetch_hits' => (int)apcu_fetch('hijacker_prefetch_hits'),
+        'prefetch_skipped' => (int)apcu_fetch('hijacker_prefetch_skipped'),
+        'prefetch_inflight' => (int)apcu_fetch('hijacker_prefetch_inflight'),
+        'window_hits' => (int)apcu_fetch('hijacker_window_hits'),
+        'page_sizes' => paging_page_sizes()
+    ];
+}
+
+// --- window buffer ---
+
+// Serve items [offset, offset + limit) of the scraper's result stream for one search.
+// $scrape(npt) runs the scraper for one page. Returns null when the buffer for a
+// page > 1 has expired, like a missing npt.
+function paging_window($engine, $method, $params, $offset, $limit, callable $scrape) {
+    $bkey = 'hijacker_buf_' . paging_query_key($engine, $method, $params);
+    $buf = ($offset > 0) ? apcu_fetch($bkey) : false;
+
+    if ($buf === false) {
+        if ($offset > 0) {
+            return null;
+        }
+        $buf = ['head' => null, 'items' => [], 'npt' => null, 'done' => false];
+    }
+
+    $want = $offset + $limit;
+    $have = count($buf['items']);
+
+    if ($have >= $want || $buf['done']) {
+        apcu_inc('hijacker_window_hits');
+    } else {
+        // INVARIANT: A deep jump (page 1 -> 10) may not turn into a scrape storm; bound it by the learned size.
+        $size = paging_page_size($engine, $method) ?: $limit;
+        $budget = (int)ceil($limit / max(1, $size)) + 1;
+
+        while (count($buf['items']) < $want && !$buf['done'] && $budget-- > 0) {
+            paging_extend($buf, $engine, $method, $scrape);
+        }
+        apcu_store($bkey, $buf, PAGING_BUFFER_TTL);
+    }
+
+    // side arrays, answers and spelling belong to the first window only
+    $out = ($offset === 0 && is_array($buf['head'])) ? $buf['head'] : ['status' => 'ok'];
+    $out[$method] = array_slice($buf['items'], $offset, $limit);
+    return $out;
+}
+
+function paging_extend(&$buf, $engine, $method, callable $scrape) {
+    $result = $scrape($buf['npt']);
+    $items = (isset($result[$method]) && is_array($result[$method])) ? $result[$method] : [];
+    paging_record_size($engine, $method, count($items));
+
+    if ($buf['head'] === null) {
+        $head = $result;
+        unset($head[$method], $head['npt']);
+        $buf['head'] = $head;
+    }
+
+    array_push($buf['items'], ...$items);
+    $buf['npt'] = $result['npt'] ?? null;
+    $buf['done'] = empty($items) || empty($buf['npt']);
+}
+
+// After a window is sent: scrape one page ahead if the next window isn't covered yet
+function paging_window_prefetch($engine, $method, $params, $offset, $limit, callable $scrape) {
+    $bkey = 'hijacker_buf_' . paging_query_key($engine, $method, $params);
+    $buf = apcu_fetch($bkey);
+    if ($buf === false || $buf['done'] || count($buf['items']) >= $offset + 2 * $limit) {
+        return;
+    }
+    if (!paging_lock($bkey)) {
+        return;
+    }
+    try {
+        paging_extend($buf, $engine, $method, $scrape);
+        apcu_store($bkey, $buf, PAGING_BUFFER_TTL);
+        apcu_inc('hijacker_prefetch_stored');
+    } finally {
+        paging_unlock($bkey);
+    }
+}
@@ -0,0 +1,29 @@
+<?php
+// opcache.preload script (written into PHP's config by entrypoint.sh unless FOURGET_WARMUP=0).
+// Compiles the sidecar, fuckhtml, 4get's config and every scraper in the manifest into shared
+// memory once, when Apache starts, so no child compiles them on a user's request. Compile only:
+// nothing here runs, and a file that fails to compile is skipped rather than keeping Apache down.
+
+$root = __DIR__;
+$files = glob("$root/*.php");
+// HAZARD: Not all of 4get-repo/lib; its backend.php declares the class mock.php replaces.
+$files[] = "$root/4get-repo/data/config.php";
+$files[] = "$root/4get-repo/lib/fuckhtml.php";
+
+$manifest = json_decode((string)@file_get_contents("$root/manifest.json"), true);
+foreach (is_array($manifest) ? $manifest : [] as $config) {
+    $files[] = "$root/4get-repo/" . $config['file'];
+}
+
+// worker.php is CLI only; its functions defined under Apache would make health.php report a worker pool
+$skip = [__FILE__, "$root/generate_manifest.php", "$root/worker.php"];
+foreach (array_unique($files) as $file) {
+    if (in_array($file, $skip, true) || !is_file($file)) {
+        continue;
+    }
+    try {
+        opcache_compile_file($file);
+    } catch (Throwable $e) {
+        error_log("Hijacker Preload: $file: " . $e->getMessage());
+    }
+}
@@ -0,0 +1,130 @@
+<?php
+// Field projection for harness responses (see searx/engines/fourget_projection.py).
+// The client sends the result types it normalizes with the fields it reads from each,
+// optional per-type item caps and a length to cut the long string fields at:
+//   {"types": {"web": ["url", "title", ...], "image": ["url", "title", "source"]},
+//    "cap": {"image": 100}, "max_len": 10000, "trim": ["title", "description"]}
+// Other result arrays, other fields and items past the cap are dropped before encoding
+// rather than encoded, sent, decoded and ignored. The JSON size of what was dropped goes
+// out as X-Fourget-Projected and is summed per engine in APCu.
+
+// top-level keys that carry no result items; kept whatever the projection says
+const PROJECT_META = ['status', 'message', 'suspend', 'npt', 'spelling', 'related'];
+const PROJECT_MAX_LEN = 65535;  // PCRE quantifier limit, far above anything the client cuts at
+
+function &project_state() {
+    static $saved = 0;
+    return $saved;
+}
+
+function project_reset() {
+    $saved = &project_state();
+    $saved = 0;
+}
+
+// Bytes the last projection saved this request; 0 without one
+function project_saved() {
+    return project_state();
+}
+
+function project_bytes($value) {
+    $json = json_encode($value);
+    return $json === false ? 0 : strlen($json);
+}
+
+// First $max characters of $s (not bytes; the client cuts characters too)
+function project_cut($s, $max) {
+    if (strlen($s) <= $max) {
+        return $s;
+    }
+    $max = min($max, PROJECT_MAX_LEN);
+    // invalid UTF-8 fails the match: leave it alone, json_encode decides what happens to it
+    return preg_match('/^.{0,' . $max . '}/su', $s, $m) ? $m[0] : $s;
+}
+
+function project_apply($result, $project, $engine) {
+    if (!is_array($result) || !is_array($project) || !is_array($project['types'] ?? null)
+        || ($result['status'] ?? null) === 'error') {
+        return $result;
+    }
+
+    $types = $project['types'];
+    $caps = is_array($project['cap'] ?? null) ? $project['cap'] : [];
+    $max_len = max(0, (int)($project['max_len'] ?? 0));
+    $trim = is_array($project['trim'] ?? null) ? array_flip($project['trim']) : [];
+    $saved = 0;
+
+    foreach ($result as $key => $items) {
+        if (in_array($key, PROJECT_META, true) || !is_array($items) || !array_is_list($items)) {
+            continue;
+        }
+        if (!array_key_exists($key, $types)) {
+            $saved += project_bytes($items);
+            unset($result[$key]);
+            continue;
+        }
+
+        $cap = (int)($caps[$key] ?? 0);
+        if ($cap > 0 && count($items) > $cap) {
+            $saved += project_bytes(array_slice($items, $cap));
+            $items = array_slice($items, 0, $cap);
+        }
+
+        // a type without a field list is kept whole (the client has no plan for it)
+        $fields = is_array($types[$key]) ? array_flip($types[$key]) : null;
+        foreach ($items as $i => $item) {
+            if (!is_array($item)) {
+                continue;
+            }
+            foreach ($item as $field => $value) {
+                if ($fields !== null && !isset($fields[$field])) {
+                    // "field":value,
+                    $saved += strlen((string)$field) + 4 + project_bytes($value);
+                    unset($item[$field]);
+                } elseif ($max_len && isset($trim[$field]) && is_string($value) && strlen($value) > $max_len) {
+                    $cut = project_cut($value, $max_len);
+                    $saved += strlen($value) - strlen($cut);
+                    $item[$field] = $cut;
+                }
+            }
+            $items[$i] = $item;
+        }
+        $result[$key] = $items;
+    }
+
+    $state = &project_state();
+    $state = $saved;
+    project_count($engine, $saved);
+    return $result;
+}
+
+function project_count($engine, $saved) {
+    if (!function_exists('apcu_inc')) {
+        return;
+    }
+    apcu_add("hijacker_project|$engine|responses", 0, 0);
+    apcu_inc("hijacker_project|$engine|responses");
+    if ($saved > 0) {
+        apcu_add("hijacker_project|$engine|bytes", 0, 0);
+        apcu_inc("hijacker_project|$engine|bytes", $saved);
+    }
+}
+
+function project_stats() {
+    $stats = ['responses' => 0, 'bytes_saved' => 0, 'engines' => []];
+    if (!class_exists('APCUIterator')) {
+        return $stats;
+    }
+    foreach (new APCUIterator('/^hijacker_project\|/') as $entry) {
+        [, $engine, $kind] = explode('|', $entry['key']);
+        $field = $kind === 'bytes' ? 'bytes_saved' : 'responses';
+        $stats[$field] += $entry['value'];
+        $stats['engines'][$engine][$field] = $entry['value'];
+    }
+    foreach ($stats['engines'] as $engine => $counts) {
+        $stats['engines'][$engine]['bytes_saved_mean'] = !empty($counts['responses'])
+            ? (int)(($counts['bytes_saved'] ?? 0) / $counts['responses'])
+            : 0;
+    }
+    return $stats;
+}
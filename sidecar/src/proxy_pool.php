@@ -0,0 +1,291 @@
+<?php
+// Proxy selection for backend::get_ip.
+// Each proxy in FOURGET_PROXIES / config::PROXY_LIST has APCu stats (EWMA latency and
+// error rate, consecutive failures) fed by the outcome of every curl handle the scrapers
+// send through it. Selection is weighted random over proxies that aren't ejected, with
+// weight = (1 - error rate)^2 / latency. A proxy failing FOURGET_PROXY_EJECT_AFTER times
+// in a row, or getting a captcha, sits out FOURGET_PROXY_EJECT_FOR seconds (doubling on
+// each repeat until a success, capped).
+//
+// FOURGET_PROXY_RATE=<requests/s> paces every (engine, proxy) pair with a GCRA bucket
+// (burst FOURGET_PROXY_BURST). When all buckets are empty the request waits for the first
+// token, at most FOURGET_PROXY_MAX_WAIT ms, then goes out anyway.
+
+const PROXY_EWMA_ALPHA = 0.2;
+const PROXY_DEFAULT_LATENCY_MS = 1000;  // untried proxies compete as if this slow, so they still get traffic
+const PROXY_MIN_LATENCY_MS = 50;
+const PROXY_DEFAULT_EJECT_AFTER = 3;
+const PROXY_DEFAULT_EJECT_FOR = 60;
+const PROXY_MAX_EJECT_FOR = 900;
+const PROXY_DEFAULT_MAX_WAIT_MS = 2000;
+const PROXY_STATS_TTL = 86400;
+
+function proxy_pool_list() {
+    static $list = null;
+    if ($list === null) {
+        $env = getenv('FOURGET_PROXIES');
+        if ($env) {
+            $list = array_values(array_filter(array_map('trim', explode(',', $env))));
+        } elseif (defined('config::PROXY_LIST') && !empty(config::PROXY_LIST)) {
+            $list = array_values(config::PROXY_LIST);
+        } else {
+            $list = [];
+        }
+    }
+    return $list;
+}
+
+// host:port for logs and health.php; credentials stay out
+function proxy_pool_label($proxy) {
+    $parts = explode(':', $proxy);
+    return $parts[0] . (isset($parts[1]) ? ':' . $parts[1] : '');
+}
+
+function proxy_pool_count($name) {
+    apcu_add("hijacker_proxy_$name", 0, 0);
+    apcu_inc("hijacker_proxy_$name");
+}
+
+function proxy_pool_state($proxy) {
+    $state = apcu_fetch('hijacker_proxy_' . md5($proxy));
+    return is_array($state) ? $state : [
+        'latency' => null,
+        'errors' => 0.0,
+        'requests' => 0,
+        'failures' => 0,
+        'streak' => 0,
+        'ejected_until' => 0,
+        'ejections' => 0,
+        'last_error' => null
+    ];
+}
+
+function proxy_pool_weight($state) {
+    $latency = max(PROXY_MIN_LATENCY_MS, $state['latency'] ?? PROXY_DEFAULT_LATENCY_MS);
+    $health = 1.0 - $state['errors'];
+    return max(0.0001, $health * $health) / $latency;
+}
+
+function proxy_pool_weighted(array $weights) {
+    $r = mt_rand() / mt_getrandmax() * array_sum($weights);
+    foreach ($weights as $proxy => $weight) {
+        $r -= $weight;
+        if ($r <= 0) {
+            return (string)$proxy;
+        }
+    }
+    return (string)array_key_last($weights);
+}
+
+function proxy_pool_pick($engine) {
+    $proxies = proxy_pool_list();
+    if (!$proxies) {
+        return '127.0.0.1';
+    }
+    if (!function_exists('apcu_fetch')) {
+        return $proxies[array_rand($proxies)];
+    }
+
+    $now = microtime(true);
+    $weights = [];
+    $returning = null;
+    $returning_at = INF;
+    foreach ($proxies as $proxy) {
+        $state = proxy_pool_state($proxy);
+        if ($state['ejected_until'] > $now) {
+            if ($state['ejected_until'] < $returning_at) {
+                [$returning, $returning_at] = [$proxy, $state['ejected_until']];
+            }
+            continue;
+        }
+        $weights[$proxy] = proxy_pool_weight($state);
+    }
+
+    if (!$weights) {
+        // all ejected: the one closest to coming back beats failing the search
+        proxy_pool_count('all_ejected');
+        return $returning;
+    }
+
+    $rate = (float)getenv('FOURGET_PROXY_RATE');
+    return $rate > 0 ? proxy_pool_paced($engine, $weights, $rate) : proxy_pool_weighted($weights);
+}
+
+// --- pacing ---
+
+// GCRA: one int per bucket (theoretical arrival time in µs), updated with apcu_cas so workers
+// never hand out the same token. Returns 0 when a token was taken, else µs until the next one.
+function proxy_pool_take($engine, $proxy, $rate, $burst) {
+    $key = 'hijacker_proxy_gcra_' . md5($engine . '|' . $proxy);
+    $interval = (int)(1e6 / $rate);
+    $tolerance = $interval * ($burst - 1);
+    apcu_add($key, 0, PROXY_STATS_TTL);
+    for ($attempt = 0; $attempt < 8; $attempt++) {
+        $now = (int)(microtime(true) * 1e6);
+        $stored = apcu_fetch($key);
+        if (!is_int($stored)) {
+            return 0;
+        }
+        $tat = max($stored, $now);
+        if ($tat - $tolerance > $now) {
+            return $tat - $tolerance - $now;
+        }
+        if (apcu_cas($key, $stored, $tat + $interval)) {
+            return 0;
+        }
+    }
+    return 0; // lost the race 8 times: let it through rather than spin
+}
+
+function proxy_pool_paced($engine, array $weights, $rate) {
+    $burst = max(1, (int)(getenv('FOURGET_PROXY_BURST') ?: 1));
+    $max_wait = (int)(getenv('FOURGET_PROXY_MAX_WAIT') ?: PROXY_DEFAULT_MAX_WAIT_MS) * 1000;
+    $started = hrtime(true);
+    $waited = 0;
+
+    while (true) {
+        // weighted order without replacement: healthy, fast proxies are asked first
+        $remaining = $weights;
+        $soonest = PHP_INT_MAX;
+        while ($remaining) {
+            $proxy = proxy_pool_weighted($remaining);
+            unset($remaining[$proxy]);
+            $wait = proxy_pool_take($engine, $proxy, $rate, $burst);
+            if ($wait === 0) {
+                if ($waited && function_exists('timing_add')) {
+                    timing_add('pacing', (hrtime(true) - $started) / 1e6);
+                }
+                return $proxy;
+            }
+            $soonest = min($soonest, $wait);
+        }
+
+        if ($waited + $soonest > $max_wait) {
+            proxy_pool_count('pacing_overflow');
+            return proxy_pool_weighted($weights);
+        }
+        if (!$waited) {
+            proxy_pool_count('paced');
+        }
+        usleep($soonest);
+        $waited += $soonest;
+    }
+}
+
+// --- outcomes ---
+
+function &proxy_pool_watched() {
+    static $watched = [];
+    return $watched;
+}
+
+// Called from backend::assign_proxy for every handle a scraper sends through a proxy
+function proxy_pool_watch($curl, $proxy) {
+    $watched = &proxy_pool_watched();
+    $watched[] = [$curl, $proxy];
+}
+
+// After a scraper call: feed each handle's outcome back. $error is the scraper's exception message.
+function proxy_pool_settle($error = null) {
+    $watched = &proxy_pool_watched();
+    $handles = $watched;
+    $watched = [];
+    if (!$handles || !function_exists('apcu_fetch')) {
+        return;
+    }
+
+    $used = [];
+    foreach ($handles as [$curl, $proxy]) {
+        // HAZARD: curl_close() is a no-op since PHP 8, so the handle still answers getinfo here.
+        $code = (int)@curl_getinfo($curl, CURLINFO_RESPONSE_CODE);
+        $us = (int)@curl_getinfo($curl, CURLINFO_TOTAL_TIME_T);
+        $errno = (int)@curl_errno($curl);
+        if (!$code && !$errno && !$us) {
+            continue; // built but never sent
+        }
+
+        $failure = null;
+        if ($errno) {
+            $failure = "curl error $errno";
+        } elseif (!$code) {
+            $failure = 'no response';
+        } elseif (in_array($code, [403, 407, 429], true) || $code >= 500) {
+            $failure = "HTTP $code";
+        }
+        proxy_pool_record($proxy, $us / 1000, $failure);
+        $used[$proxy] = true;
+    }
+
+    $error_l = strtolower((string)$error);
+    if (str_contains($error_l, 'captcha') || str_contains($error_l, 'pow')) {
+        foreach (array_keys($used) as $proxy) {
+            $state = proxy_pool_state($proxy);
+            proxy_pool_eject($proxy, $state, 'captcha');
+            apcu_store('hijacker_proxy_' . md5($proxy), $state, PROXY_STATS_TTL);
+        }
+    }
+}
+
+function proxy_pool_record($proxy, $ms, $failure) {
+    // HAZARD: read-modify-write without a lock; a concurrent update can be lost, which an EWMA shrugs off.
+    $state = proxy_pool_state($proxy);
+    $state['requests']++;
+    $state['errors'] = (1 - PROXY_EWMA_ALPHA) * $state['errors'] + ($failure === null ? 0 : PROXY_EWMA_ALPHA);
+
+    if ($failure === null) {
+        $state['latency'] = ($state['latency'] === null) ? $ms : (1 - PROXY_EWMA_ALPHA) * $state['latency'] + PROXY_EWMA_ALPHA * $ms;
+        $state['streak'] = 0;
+        $state['ejections'] = 0;
+    } else {
+        $state['failures']++;
+        $state['streak']++;
+        $state['last_error'] = $failure;
+        if ($state['streak'] >= (int)(getenv('FOURGET_PROXY_EJECT_AFTER') ?: PROXY_DEFAULT_EJECT_AFTER)) {
+            proxy_pool_eject($proxy, $state, "$failure, {$state['streak']} in a row");
+        }
+    }
+    apcu_store('hijacker_proxy_' . md5($proxy), $state, PROXY_STATS_TTL);
+}
+
+function proxy_pool_eject($proxy, array &$state, $reason) {
+    $state['ejections']++;
+    $base = (int)(getenv('FOURGET_PROXY_EJECT_FOR') ?: PROXY_DEFAULT_EJECT_FOR);
+    $for = min(PROXY_MAX_EJECT_FOR, $base * 2 ** ($state['ejections'] - 1));
+    $state['ejected_until'] = microtime(true) + $for;
+    $state['streak'] = 0;
+    $state['last_error'] = $reason;
+    proxy_pool_count('ejections');
+    error_log("Hijacker Proxy: ejecting " . proxy_pool_label($proxy) . " for {$for}s ($reason)");
+}
+
+function proxy_pool_stats() {
+    $now = microtime(true);
+    $proxies = [];
+    $weights = [];
+    foreach (proxy_pool_list() as $proxy) {
+        $state = proxy_pool_state($proxy);
+        $ejected = $state['ejected_until'] > $now;
+        $weights[$proxy] = $ejected ? 0.0 : proxy_pool_weight($state);
+        $proxies[proxy_pool_label($proxy)] = [
+            'latency_ms' => $state['latency'] === null ? null : round($state['latency'], 1),
+            'error_rate' => round($state['errors'], 3),
+            'requests' => $state['requests'],
+            'failures' => $state['failures'],
+            'ejected_for' => $ejected ? round($state['ejected_until'] - $now, 1) : 0,
+            'ejections' => $state['ejections'],
+            'last_error' => $state['last_error']
+        ];
+    }
+    $total = array_sum($weights);
+    foreach (proxy_pool_list() as $proxy) {
+        $proxies[proxy_pool_label($proxy)]['share'] = $total ? round($weights[$proxy] / $total, 3) : 0.0;
+    }
+    return [
+        'rate' => (float)getenv('FOURGET_PROXY_RATE') ?: null,
+        'paced' => (int)apcu_fetch('hijacker_proxy_paced'),
+        'pacing_overflow' => (int)apcu_fetch('hijacker_proxy_pacing_overflow'),
+        'all_ejected' => (int)apcu_fetch('hijacker_proxy_all_ejected'),
+        'ejections' => (int)apcu_fetch('hijacker_proxy_ejections'),
+        'proxies' => $proxies
+    ];
+}
@@ -0,0 +1,92 @@
+<?php
+// Phase timings for one harness request, sent back as a Server-Timing header:
+//   manifest  manifest lookup
+//   include   scraper require + instantiate
+//   upstream  curl time of the scraper's requests (handles seen by backend::assign_proxy)
+//   parse     the rest of the scraper call, i.e. mostly fuckhtml
+//   project   field projection of the result (project.php), when the client sent one
+//   encode    wire_encode + compression
+//   total     request start to header
+// plus `mem` with memory_get_peak_usage() in its description.
+
+function &timing_state() {
+    static $state = null;
+    if ($state === null) {
+        $start = isset($_SERVER['REQUEST_TIME_FLOAT']) ? null : hrtime(true);
+        $state = ['phases' => [], 'open' => [], 'curls' => [], 'start' => $start];
+    }
+    return $state;
+}
+
+// worker.php: a fresh clock and phase table for each request a long-lived process serves
+function timing_reset() {
+    $state = &timing_state();
+    $state = ['phases' => [], 'open' => [], 'curls' => [], 'start' => hrtime(true)];
+    if (function_exists('memory_reset_peak_usage')) {
+        memory_reset_peak_usage();
+    }
+}
+
+function timing_start($phase) {
+    $state = &timing_state();
+    $state['open'][$phase] = hrtime(true);
+}
+
+function timing_stop($phase) {
+    $state = &timing_state();
+    if (!isset($state['open'][$phase])) {
+        return;
+    }
+    timing_add($phase, (hrtime(true) - $state['open'][$phase]) / 1e6);
+    unset($state['open'][$phase]);
+}
+
+function timing_add($phase, $ms) {
+    $state = &timing_state();
+    $state['phases'][$phase] = ($state['phases'][$phase] ?? 0.0) + $ms;
+}
+
+// Called from backend::assign_proxy, which every 4get scraper runs on each curl handle it builds
+function timing_watch_curl($curl) {
+    $state = &timing_state();
+    $state['curls'][] = $curl;
+}
+
+// Run one scraper call and split its time into upstream and parse
+function timing_scrape(callable $fn) {
+    $state = &timing_state();
+    $state['curls'] = [];
+    $started = hrtime(true);
+    try {
+        return $fn();
+    } finally {
+        $elapsed = (hrtime(true) - $started) / 1e6;
+        $upstream = 0.0;
+        foreach ($state['curls'] as $curl) {
+            // HAZARD: curl_close() is a no-op since PHP 8, so the handle still answers getinfo here.
+            $us = @curl_getinfo($curl, CURLINFO_TOTAL_TIME_T);
+            if ($us) {
+                $upstream += $us / 1000;
+            }
+        }
+        $state['curls'] = [];
+        // curl_multi scrapers overlap their requests; upstream can't exceed the call itself
+        $upstream = min($upstream, $elapsed);
+        timing_add('upstream', $upstream);
+        timing_add('parse', $elapsed - $upstream);
+    }
+}
+
+function timing_header() {
+    $state = &timing_state();
+    $parts = [];
+    foreach ($state['phases'] as $phase => $ms) {
+        $parts[] = sprintf('%s;dur=%.2f', $phase, $ms);
+    }
+    $total = ($state['start'] === null)
+        ? (microtime(true) - $_SERVER['REQUEST_TIME_FLOAT']) * 1000
+        : (hrtime(true) - $state['start']) / 1e6;
+    $parts[] = sprintf('total;dur=%.2f', $total);
+    $parts[] = sprintf('mem;desc="%d"', memory_get_peak_usage());
+    return implode(', ', $parts);
+}
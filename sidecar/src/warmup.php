@@ -0,0 +1,15 @@
+<?php
+// Requested once by entrypoint.sh after Apache starts (see warmup_run in core.php). Loopback only.
+header('Content-Type: application/json');
+
+require_once __DIR__ . '/core.php';
+
+if (!in_array($_SERVER['REMOTE_ADDR'] ?? '', ['127.0.0.1', '::1'], true)) {
+    http_response_code(403);
+    echo json_encode(['status' => 'error', 'message' => 'warmup.php is loopback only']);
+    exit;
+}
+
+$ready = warmup_run();
+http_response_code(isset($ready['status']) ? 500 : 200);
+echo json_encode($ready, JSON_PRETTY_PRINT);
@@ -0,0 +1,101 @@
+<?php
+// Response encoding for harness.php / batch.php (and worker.php).
+// Picks msgpack over JSON when the client accepts it and the extension is
+// loaded, then zstd or gzip for bodies worth compressing. JSON is always the fallback.
+
+const WIRE_COMPRESS_MIN_BYTES = 1024;
+const WIRE_GZIP_LEVEL = 1;   // speed over ratio, this sits on the request path
+const WIRE_ZSTD_LEVEL = 3;
+
+function wire_accepts($header, $token) {
+    foreach (explode(',', strtolower($header)) as $part) {
+        $part = trim($part);
+        if ($part === '' || strpos($part, $token) !== 0) {
+            continue;
+        }
+        // honour an explicit q=0 opt-out
+        if (preg_match('/;\s*q=0(\.0+)?\s*$/', $part)) {
+            return false;
+        }
+        return true;
+    }
+    return false;
+}
+
+function wire_encode($data, &$content_type, $accept) {
+    if (function_exists('msgpack_pack') && wire_accepts($accept, 'application/x-msgpack')) {
+        $content_type = 'application/x-msgpack';
+        return msgpack_pack($data);
+    }
+
+    $content_type = 'application/json';
+    return json_encode($data);
+}
+
+function wire_compress($body, &$content_encoding, $accept_encoding) {
+    $content_encoding = null;
+    if (strlen($body) < WIRE_COMPRESS_MIN_BYTES) {
+        return $body;
+    }
+
+    if (function_exists('zstd_compress') && wire_accepts($accept_encoding, 'zstd')) {
+        $packed = zstd_compress($body, WIRE_ZSTD_LEVEL);
+        if ($packed !== false) {
+            $content_encoding = 'zstd';
+            return $packed;
+        }
+    }
+
+    if (function_exists('gzencode') && wire_accepts($accept_encoding, 'gzip')) {
+        $packed = gzencode($body, WIRE_GZIP_LEVEL);
+        if ($packed !== false) {
+            $content_encoding = 'gzip';
+            return $packed;
+        }
+    }
+
+    return $body;
+}
+
+// Encode and compress for a client sending these Accept headers; returns [header lines, body].
+// $fallback is sent verbatim (as JSON) if encoding fails. With timing.php loaded,
+// the phase breakdown goes out as Server-Timing; with project.php, the bytes projection saved.
+function wire_pack($data, $fallback, $accept, $accept_encoding) {
+    $started = hrtime(true);
+    $content_type = 'application/json';
+    $body = wire_encode($data, $content_type, $accept);
+
+    if ($body === false || $body === null || $body === '') {
+        $content_type = 'application/json';
+        $body = $fallback;
+    }
+
+    $body = wire_compress($body, $content_encoding, $accept_encoding);
+
+    $headers = [];
+    if (function_exists('timing_header')) {
+        timing_add('encode', (hrtime(true) - $started) / 1e6);
+        $headers[] = 'Server-Timing: ' . timing_header();
+    }
+    if (function_exists('project_saved') && project_saved() > 0) {
+        $headers[] = 'X-Fourget-Projected: ' . project_saved();
+    }
+    $headers[] = 'Content-Type: ' . $content_type;
+    $headers[] = 'Vary: Accept, Accept-Encoding';
+    if ($content_encoding !== null) {
+        $headers[] = 'Content-Encoding: ' . $content_encoding;
+    }
+    $headers[] = 'Content-Length: ' . strlen($body);
+
+    return [$headers, $body];
+}
+
+// Send $data as the answer to the current Apache request
+function wire_emit($data, $fallback = '{"web":[]}') {
+    [$headers, $body] = wire_pack($data, $fallback, $_SERVER['HTTP_ACCEPT'] ?? '', $_SERVER['HTTP_ACCEPT_ENCODING'] ?? '');
+    foreach ($headers as $header) {
+        header($header);
+    }
+
+    echo $body;
+}
@@ -0,0 +1,474 @@
+<?php
+// Pre-forked PHP CLI server for the sidecar (FOURGET_SIDECAR_MODE=worker).
+//
+// Under Apache every harness request loads mock.php and fuckhtml, fetches the
+// manifest, includes the scraper file and constructs the scraper. Here a master
+// binds the port and forks FOURGET_WORKERS children that accept on the shared
+// socket and loop: the includes, the manifest and one prototype instance per
+// scraper class stay in memory for FOURGET_WORKER_MAX_REQUESTS requests, then
+// the child exits and the master forks a fresh one (leaks in scrapers stay bounded).
+//
+// Serves the same paths as Apache (harness.php, batch.php, health.php, local.json)
+// over HTTP/1.1 with keep-alive, so the client needs no changes. Batch jobs run in
+// forks of the child that took the batch, not on the pool (see worker_batch_jobs).
+//
+//   php worker.php            # FOURGET_WORKER_LISTEN=tcp://0.0.0.0:80 by default
+
+ini_set('memory_limit', '256M');
+ini_set('display_errors', 0);
+ini_set('log_errors', 1);
+
+require_once __DIR__ . '/core.php';
+
+const WORKER_DEFAULT_LISTEN = 'tcp://0.0.0.0:80';
+const WORKER_DEFAULT_COUNT = 16;
+const WORKER_DEFAULT_MAX_REQUESTS = 1000;
+const WORKER_KEEPALIVE = 5;          // seconds an idle connection may hold a child, like Apache's KeepAliveTimeout
+const WORKER_MAX_HEADER_BYTES = 65536;
+const WORKER_MAX_BODY_BYTES = 1048576;
+
+const WORKER_REASONS = [
+    200 => 'OK', 400 => 'Bad Request', 404 => 'Not Found', 405 => 'Method Not Allowed',
+    411 => 'Length Required', 413 => 'Payload Too Large', 500 => 'Internal Server Error', 503 => 'Service Unavailable'
+];
+
+$worker_stop = false;
+$worker_served = 0;
+
+function worker_stats() {
+    return [
+        'pid' => getmypid(),
+        'children' => (int)(getenv('FOURGET_WORKERS') ?: WORKER_DEFAULT_COUNT),
+        'served_by_this_child' => $GLOBALS['worker_served'],
+        'requests' => (int)apcu_fetch('hijacker_worker_requests'),
+        'respawns' => (int)apcu_fetch('hijacker_worker_respawns')
+    ];
+}
+
+// --- HTTP ---
+
+// [method, path, headers (lowercase names), body] or null when the peer went away
+function worker_read_request($conn) {
+    $line = fgets($conn, 8192);
+    if ($line === false || trim($line) === '') {
+        return null;
+    }
+    $parts = explode(' ', trim($line));
+    if (count($parts) !== 3) {
+        return [null, null, [], ''];
+    }
+    [$method, $target] = $parts;
+
+    $headers = [];
+    $size = strlen($line);
+    while (($line = fgets($conn, 8192)) !== false) {
+        $size += strlen($line);
+        if ($size > WORKER_MAX_HEADER_BYTES) {
+            return [null, null, [], ''];
+        }
+        $line = rtrim($line, "\r\n");
+        if ($line === '') {
+            break;
+        }
+        [$name, $value] = array_pad(explode(':', $line, 2), 2, '');
+        $headers[strtolower(trim($name))] = trim($value);
+    }
+    if ($line === false) {
+        return null;
+    }
+
+    $body = '';
+    $length = (int)($headers['content-length'] ?? 0);
+    if ($length > 0) {
+        if ($length > WORKER_MAX_BODY_BYTES) {
+            return [$method, $target, $headers, false];
+        }
+        while (strlen($body) < $length && !feof($conn)) {
+            $chunk = fread($conn, $length - strlen($body));
+            if ($chunk === false || $chunk === '') {
+                return null;
+            }
+            $body .= $chunk;
+        }
+    }
+
+    $path = parse_url($target, PHP_URL_PATH) ?: '/';
+    return [$method, $path, $headers, $body];
+}
+
+function worker_write($conn, $status, array $headers, $body, $keep_alive) {
+    $head = 'HTTP/1.1 ' . $status . ' ' . (WORKER_REASONS[$status] ?? 'OK') . "\r\n";
+    $has_length = false;
+    foreach ($headers as $header) {
+        $has_length = $has_length || stripos($header, 'content-length:') === 0;
+        $head .= $header . "\r\n";
+    }
+    if (!$has_length) {
+        $head .= 'Content-Length: ' . strlen($body) . "\r\n";
+    }
+    $head .= 'Connection: ' . ($keep_alive ? 'keep-alive' : 'close') . "\r\n\r\n";
+
+    $out = $head . $body;
+    while ($out !== '') {
+        $written = @fwrite($conn, $out);
+        if ($written === false || $written === 0) {
+            return false;
+        }
+        $out = substr($out, $written);
+    }
+    return true;
+}
+
+function worker_json($status, $data) {
+    return [$status, ['Content-Type: application/json'], json_encode($data)];
+}
+
+// [status, header lines, body, after]
+function worker_dispatch($conn, $method, $path, array $headers, $body) {
+    if ($method === null) {
+        return array_merge(worker_json(400, ['status' => 'error', 'message' => 'Malformed request']), [null]);
+    }
+    if ($body === false) {
+        return array_merge(worker_json(413, ['status' => 'error', 'message' => 'Request body too large']), [null]);
+    }
+
+    $accept = $headers['accept'] ?? '';
+    $accept_encoding = $headers['accept-encoding'] ?? '';
+
+    switch ($path) {
+        case '/harness.php':
+        case '/batch.php':
+            if ($method !== 'POST') {
+                return array_merge(worker_json(405, ['status' => 'error', 'message' => 'POST only']), [null]);
+            }
+            if (isset($headers['transfer-encoding'])) {
+                return array_merge(worker_json(411, ['status' => 'error', 'message' => 'Content-Length required']), [null]);
+            }
+            // wire.php and anything else reading request headers looks here, as under Apache
+            $_SERVER['HTTP_ACCEPT'] = $accept;
+            $_SERVER['HTTP_ACCEPT_ENCODING'] = $accept_encoding;
+
+            // see guard.php: hang-ups abort the scraper's transfers, a fatal still gets an answer out
+            guard_set_probe(function () use ($conn) {
+                $read = [$conn];
+                $write = $except = null;
+                if (@stream_select($read, $write, $except, 0) !== 1) {
+                    return false;
+                }
+                $peek = @stream_socket_recvfrom($conn, 1, STREAM_PEEK);
+                return $peek === '' || $peek === false;
+            });
+            guard_on_fatal(function ($response) use ($conn, $accept, $accept_encoding) {
+                [$wire_headers, $wire_body] = wire_pack($response, '{"web":[]}', $accept, $accept_encoding);
+                worker_write($conn, 200, $wire_headers, $wire_body, false);
+            });
+
+            $after = null;
+            $level = ob_get_level();
+            ob_start();
+            try {
+                if ($path === '/harness.php') {
+                    $data = harness_handle(json_decode($body, true), $after);
+                    $fallback = '{"web":[]}';
+                } else {
+                    $data = batch_handle(json_decode($body, true));
+                    $fallback = '{"results":{}}';
+                }
+            } finally {
+                harness_drain($level);
+                // INVARIANT: Nothing from one request may still be set when the next one starts.
+                backend::$context = [];
+                guard_set_probe(null);
+            }
+            [$wire_headers, $wire_body] = wire_pack($data, $fallback, $accept, $accept_encoding);
+            return [200, $wire_headers, $wire_body, $after];
+
+        case '/health.php':
+        case '/':
+            [$code, $health] = health_report();
+            return [$code, ['Content-Type: application/json'], json_encode($health, JSON_PRETTY_PRINT), null];
+
+        case '/local.json':
+            return [200, ['Content-Type: application/json'], file_get_contents(__DIR__ . '/local.json'), null];
+    }
+
+    return array_merge(worker_json(404, ['status' => 'error', 'message' => "No such path $path"]), [null]);
+}
+
+// --- batch jobs ---
+
+// batch_handle's fan-out in worker mode: one fork of this child per job, answering over a
+// socket pair. A loopback request to harness.php would wait for a free child of this pool,
+// which a batch already holds one of; with FOURGET_WORKERS at or below the batch size (or
+// enough concurrent batches) every child would end up waiting on the others.
+// [job id => [result, Server-Timing, projected bytes]], in the order of $inputs.
+function worker_batch_jobs(array $inputs, $timeout) {
+    // jobs still prefetching after their answer were left running last time
+    while (pcntl_waitpid(-1, $status, WNOHANG) > 0);
+
+    $pipes = [];
+    $pids = [];
+    $buffers = [];
+    $failed = [];
+    foreach ($inputs as $id => $input) {
+        $pair = stream_socket_pair(STREAM_PF_UNIX, STREAM_SOCK_STREAM, STREAM_IPPROTO_IP);
+        $pid = $pair === false ? -1 : pcntl_fork();
+        if ($pid === 0) {
+            fclose($pair[0]);
+            worker_batch_job($pair[1], $input);
+        }
+        if ($pid < 0) {
+            if ($pair !== false) {
+                fclose($pair[0]);
+                fclose($pair[1]);
+            }
+            $failed[$id] = 'fork failed';
+            continue;
+        }
+        fclose($pair[1]);
+        $pipes[$id] = $pair[0];
+        $pids[$id] = $pid;
+        $buffers[$id] = '';
+    }
+
+    $deadline = microtime(true) + $timeout;
+    while ($pipes && ($left = $deadline - microtime(true)) > 0) {
+        $read = $pipes;
+        $write = $except = null;
+        // false on EINTR (SIGTERM); the deadline still bounds the loop
+        if (!@stream_select($read, $write, $except, (int)$left, (int)(fmod($left, 1) * 1000000))) {
+            continue;
+        }
+        foreach ($read as $id => $pipe) {
+            $chunk = fread($pipe, 65536);
+            if ($chunk !== false && $chunk !== '') {
+                $buffers[$id] .= $chunk;
+            } elseif (feof($pipe)) {
+                fclose($pipe);
+                unset($pipes[$id]);
+            }
+        }
+    }
+    foreach ($pipes as $id => $pipe) {
+        posix_kill($pids[$id], SIGKILL);
+        pcntl_waitpid($pids[$id], $status);
+        fclose($pipe);
+        unset($pids[$id]);
+        $failed[$id] = 'timed out';
+    }
+    foreach ($pids as $pid) {
+        pcntl_waitpid($pid, $status, WNOHANG);
+    }
+
+    $out = [];
+    foreach ($inputs as $id => $input) {
+        $answer = isset($failed[$id]) ? false : @unserialize($buffers[$id], ['allowed_classes' => false]);
+        if (!is_array($answer)) {
+            $msg = $failed[$id] ?? 'job process died';
+            error_log("Hijacker Batch: job '$id' failed: $msg");
+            // transport failures are ours, not the engine's; don't ask the client to suspend it
+            $answer = [['status' => 'error', 'message' => "batch job failed: $msg", 'suspend' => 0], null, 0];
+        }
+        $out[$id] = $answer;
+    }
+    return $out;
+}
+
+// One batch job in its own process; never returns
+function worker_batch_job($pipe, $input) {
+    $send = function ($response, $timing, $saved) use ($pipe) {
+        $out = serialize([$response, $timing, $saved]);
+        while ($out !== '') {
+            $written = @fwrite($pipe, $out);
+            if ($written === false || $written === 0) {
+                break;
+            }
+            $out = substr($out, $written);
+        }
+        fclose($pipe);
+    };
+    // the parent's connection belongs to the batch; only the parent answers on it
+    guard_set_probe(null);
+    guard_on_fatal(function ($response) use ($send) {
+        $send($response, null, 0);
+    });
+
+    timing_reset();
+    $after = null;
+    $level = ob_get_level();
+    ob_start();
+    try {
+        $response = harness_handle($input, $after);
+    } catch (Throwable $e) {
+        $response = harness_error($e->getMessage());
+    } finally {
+        harness_drain($level);
+    }
+    $send($response, timing_header(), project_saved());
+
+    // prefetch after the answer, as harness.php does
+    if ($after !== null) {
+        ob_start();
+        $after();
+        harness_drain($level);
+    }
+    exit(0);
+}
+
+function worker_serve_connection($conn, $max_requests) {
+    global $worker_stop, $worker_served;
+
+    stream_set_timeout($conn, WORKER_KEEPALIVE);
+    while (!$worker_stop && $worker_served < $max_requests) {
+        $request = worker_read_request($conn);
+        if ($request === null) {
+            return;
+        }
+        [$method, $path, $headers, $body] = $request;
+
+        timing_reset();
+        $worker_served++;
+        apcu_add('hijacker_worker_requests', 0, 0);
+        apcu_inc('hijacker_worker_requests');
+
+        try {
+            [$status, $out_headers, $out_body, $after] = worker_dispatch($conn, $method, $path, $headers, $body);
+        } catch (Throwable $e) {
+            error_log("Hijacker Worker: " . $e->getMessage());
+            [$status, $out_headers, $out_body] = worker_json(500, ['status' => 'error', 'message' => 'worker error', 'suspend' => 0]);
+            $after = null;
+        }
+
+        // prefetch runs after the client has its answer; close instead of making the next request wait for it
+        // an error may leave an unread body on the socket, so only clean answers keep the connection
+        $keep_alive = $after === null && $status < 400
+            && strtolower($headers['connection'] ?? '') !== 'close'
+            && !$worker_stop && $worker_served < $max_requests;
+
+        $sent = worker_write($conn, $status, $out_headers, $out_body, $keep_alive);
+
+        if ($after !== null) {
+            fclose($conn);
+            $level = ob_get_level();
+            ob_start();
+            $after();
+            harness_drain($level);
+            return;
+        }
+        if (!$sent || !$keep_alive) {
+            return;
+        }
+    }
+}
+
+// --- processes ---
+
+function worker_child($server, $max_requests) {
+    global $worker_stop, $worker_served;
+
+    pcntl_signal(SIGTERM, function () {
+        $GLOBALS['worker_stop'] = true;
+    });
+    pcntl_signal(SIGINT, SIG_IGN);
+
+    while (!$worker_stop && $worker_served < $max_requests) {
+        // SIGTERM interrupts accept(); the flag is checked on the way round
+        $conn = @stream_socket_accept($server, -1);
+        if ($conn === false) {
+            continue;
+        }
+        worker_serve_connection($conn, $max_requests);
+        if (is_resource($conn)) {
+            fclose($conn);
+        }
+    }
+    exit(0);
+}
+
+function worker_drop_privileges() {
+    $user = getenv('FOURGET_WORKER_USER') ?: 'www-data';
+    if (!function_exists('posix_getuid') || posix_getuid() !== 0) {
+        return;
+    }
+    $pw = posix_getpwnam($user);
+    if ($pw === false) {
+        error_log("Hijacker Worker: user '$user' not found, staying root");
+        return;
+    }
+    posix_setgid($pw['gid']);
+    posix_setuid($pw['uid']);
+}
+
+function worker_main() {
+    if (!function_exists('pcntl_fork')) {
+        fwrite(STDERR, "worker.php needs the pcntl extension\n");
+        exit(1);
+    }
+
+    $listen = getenv('FOURGET_WORKER_LISTEN') ?: WORKER_DEFAULT_LISTEN;
+    $count = max(1, (int)(getenv('FOURGET_WORKERS') ?: WORKER_DEFAULT_COUNT));
+    $max_requests = max(1, (int)(getenv('FOURGET_WORKER_MAX_REQUESTS') ?: WORKER_DEFAULT_MAX_REQUESTS));
+
+    $context = stream_context_create(['socket' => ['backlog' => 511]]);
+    $server = @stream_socket_server($listen, $errno, $errstr, STREAM_SERVER_BIND | STREAM_SERVER_LISTEN, $context);
+    if ($server === false) {
+        fwrite(STDERR, "worker.php: cannot listen on $listen: $errstr\n");
+        exit(1);
+    }
+
+    worker_drop_privileges();
+
+    // Load every scraper before forking: children start warm and share the compiled code copy-on-write
+    $warm = warmup_run();
+    error_log("Hijacker Worker: warmed up in " . ($warm['ms'] ?? '?') . " ms");
+
+    pcntl_async_signals(true);
+    $running = true;
+    $children = [];
+
+    $spawn = function () use ($server, $max_requests, &$children) {
+        $pid = pcntl_fork();
+        if ($pid === 0) {
+            worker_child($server, $max_requests);
+        }
+        if ($pid > 0) {
+            $children[$pid] = true;
+        }
+        return $pid;
+    };
+
+    $shutdown = function () use (&$running, &$children) {
+        $running = false;
+        foreach (array_keys($children) as $pid) {
+            posix_kill($pid, SIGTERM);
+        }
+    };
+    pcntl_signal(SIGTERM, $shutdown);
+    pcntl_signal(SIGINT, $shutdown);
+
+    for ($i = 0; $i < $count; $i++) {
+        $spawn();
+    }
+    error_log("Hijacker Worker: $count workers on $listen, $max_requests requests each");
+
+    while ($running || $children) {
+        $pid = pcntl_wait($status);
+        if ($pid <= 0) {
+            continue;
+        }
+        unset($children[$pid]);
+        if ($running) {
+            apcu_add('hijacker_worker_respawns', 0, 0);
+            apcu_inc('hijacker_worker_respawns');
+            if (!pcntl_wifexited($status) || pcntl_wexitstatus($status) !== 0) {
+                error_log("Hijacker Worker: child $pid died, respawning");
+            }
+            $spawn();
+        }
+    }
+    exit(0);
+}
+
+if (PHP_SAPI === 'cli' && realpath($_SERVER['SCRIPT_FILENAME'] ?? '') === __FILE__) {
+    worker_main();
+}
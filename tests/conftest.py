@@ -0,0 +1,26 @@
+import os
+import sys
+import time
+
+import pytest
+
+# the engines import each other as top-level modules, the way SearXNG loads them
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "searx", "engines"))
+
+
+class Clock:
+    """Stands in for time.time and time.monotonic; advance with `clock.now += seconds`."""
+
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(time, "time", clock)
+    monkeypatch.setattr(time, "monotonic", clock)
+    return clock
@@ -0,0 +1,42 @@
+import time
+
+from fourget_batch import BatchCoalescer
+
+
+def make(**kwargs):
+    return BatchCoalescer(enabled=True, window=0.0, **kwargs)
+
+
+def test_followers_share_the_leaders_batch():
+    bc = make()
+    batch, leader_job, leader = bc.join("search", "google", "web", {"s": "q"})
+    _, follower_job, follows = bc.join("search", "brave", "web", {"s": "q"})
+    assert leader and not follows
+    assert [job["id"] for job in bc.collect(batch)] == [leader_job, follower_job]
+    batch.resolve({follower_job: {"status": "ok", "web": [1]}})
+    assert bc.await_result(batch, follower_job) == {"status": "ok", "web": [1]}
+
+
+def test_follower_wait_is_capped_by_its_budget():
+    bc = make(wait=3.0)
+    batch, _, _ = bc.join("search", "google", "web", {})
+    _, job, _ = bc.join("search", "brave", "web", {})
+    started = time.monotonic()
+    assert bc.await_result(batch, job, budget=0.05) is None
+    assert time.monotonic() - started < 1.0
+    assert bc.follower_timeouts == 1
+
+
+def test_abandoned_leader_fails_the_batch():
+    bc = make(wait=3.0)
+    batch, _, _ = bc.join("search", "google", "web", {})
+    _, job, _ = bc.join("search", "brave", "web", {})
+    bc.collect(batch)
+    bc.watch(batch, 0.05)
+    started = time.monotonic()
+    assert bc.await_result(batch, job) is None
+    assert time.monotonic() - started < 1.0
+    assert bc.stats()["abandoned"] == 1
+    # a response landing after that doesn't change what followers already saw
+    batch.resolve({job: {"status": "ok"}})
+    assert batch.results == {}
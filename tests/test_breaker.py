@@ -0,0 +1,67 @@
+from fourget_breaker import CLOSED, EMPTY, ERROR, HALF_OPEN, OK, OPEN, CircuitBreaker, classify
+
+
+def make(**kwargs):
+    return CircuitBreaker(enabled=True, use_valkey=False, **kwargs)
+
+
+def test_classify():
+    assert classify({"status": "error"}) == ERROR
+    assert classify({"web": [{"url": "u"}]}) == OK
+    assert classify({"web": []}) == EMPTY
+    assert classify({"web": []}, first_page=False) is None
+
+
+def test_trips_after_consecutive_errors(clock):
+    breaker = make(errors=3, cooldown=60)
+    for _ in range(2):
+        breaker.record("google", ERROR)
+    assert breaker.allow("google") is None
+    breaker.record("google", ERROR)
+    assert breaker.state("google")["state"] == OPEN
+    assert breaker.allow("google") is False
+
+
+def test_success_resets_the_count(clock):
+    breaker = make(errors=2)
+    breaker.record("google", ERROR)
+    breaker.record("google", OK)
+    breaker.record("google", ERROR)
+    assert breaker.state("google")["state"] == CLOSED
+
+
+def test_one_probe_after_cooldown_then_close_on_success(clock):
+    breaker = make(errors=1, cooldown=60)
+    breaker.record("google", ERROR)
+    clock.now += 61
+    assert breaker.state("google")["state"] == HALF_OPEN
+    assert breaker.allow("google") is True
+    assert breaker.allow("google") is False
+    breaker.record("google", OK)
+    assert breaker.state("google")["state"] == CLOSED
+    assert breaker.allow("google") is None
+
+
+def test_failed_probe_doubles_the_cooldown(clock):
+    breaker = make(errors=1, cooldown=60, max_cooldown=900)
+    breaker.record("google", ERROR)
+    clock.now += 61
+    assert breaker.allow("google") is True
+    breaker.record("google", ERROR)
+    state = breaker.state("google")
+    assert state["state"] == OPEN and state["cooldown"] == 120 and state["trips"] == 2
+
+
+def test_suspend_trips_right_away(clock):
+    breaker = make(errors=5)
+    breaker.record("google", ERROR, suspend=300)
+    state = breaker.state("google")
+    assert state["state"] == OPEN and state["cooldown"] == 300
+
+
+def test_empty_later_pages_are_ignored(clock):
+    breaker = make(empties=1)
+    breaker.record("google", classify({"web": []}, first_page=False))
+    assert breaker.state("google")["state"] == CLOSED
+    breaker.record("google", classify({"web": []}))
+    assert breaker.state("google")["state"] == OPEN
@@ -0,0 +1,93 @@
+import pytest
+
+import fourget_cache
+from fourget_cache import LRUStore, ResultCache, SharedStore, SideArrays, request_key
+
+
+WEB = {"web": [{"url": "https://example.com", "title": "Example"}]}
+
+
+def test_request_key_ignores_query_case_whitespace_and_param_order():
+    a = request_key("google", "web", {"s": "Hello  World", "lang": "en", "nsfw": "yes"})
+    b = request_key("google", "web", {"nsfw": "yes", "s": " hello world ", "lang": "en"})
+    assert a == b
+    assert a.startswith("google:web:")
+
+
+def test_request_key_separates_engine_category_and_params():
+    params = {"s": "q"}
+    assert request_key("google", "web", params) != request_key("brave", "web", params)
+    assert request_key("google", "web", params) != request_key("google", "image", params)
+    assert request_key("google", "web", params) != request_key("google", "web", dict(params, offset=10))
+
+
+def test_request_key_buckets_time_ranges():
+    day = 86400
+    older = 1_700_000_000
+    first = request_key("google", "web", {"s": "q", "newer": older - day, "older": older})
+    # the same search a few seconds later: both stamps moved, the key didn't
+    later = request_key("google", "web", {"s": "q", "newer": older - day + 5, "older": older + 5})
+    week = request_key("google", "web", {"s": "q", "newer": older - 7 * day, "older": older})
+    assert first == later
+    assert first != week
+
+
+def test_lru_store_expires_and_evicts(clock):
+    store = LRUStore(maxsize=2)
+    store.set("a", 1, ttl=10)
+    clock.now += 11
+    assert store.get("a") is None
+
+    store.set("a", 1)
+    store.set("b", 2)
+    store.get("a")
+    store.set("c", 3)
+    assert store.get("b") is None and store.get("a") == 1
+    assert store.evictions == 1
+
+
+@pytest.mark.parametrize("category, ttl", [("news", 300), ("web", 3600), ("image", 21600), ("other", 1800)])
+def test_result_cache_ttl_per_category(clock, category, ttl):
+    cache = ResultCache(use_valkey=False)
+    cache.put("k", category, WEB)
+    clock.now += ttl - 1
+    assert cache.get("k") == WEB
+    clock.now += 2
+    assert cache.get("k") is None
+
+
+def test_result_cache_negative_entries_and_errors(clock):
+    cache = ResultCache(use_valkey=False)
+    cache.put("empty", "web", {"web": []})
+    assert cache.get("empty") == []
+    clock.now += ResultCache.NEGATIVE_TTL + 1
+    assert cache.get("empty") is None
+
+    cache.put("error", "web", {"status": "error", "message": "captcha"})
+    assert cache.get("error") is None
+    assert cache.stats()["negative_hits"] == 1
+
+
+def test_side_arrays_serve_a_full_stash_only(clock):
+    side = SideArrays(enabled=True, minimums={"image": 2, "video": 2, "news": 2}, use_valkey=False)
+    key = SideArrays.key("google", {"s": "q"})
+    side.put(key, dict(WEB, image=[{"url": "1"}, {"url": "2"}], video=[{"url": "v"}]))
+    assert side.get(key, "image") == {"image": [{"url": "1"}, {"url": "2"}]}
+    assert side.get(key, "video") is None
+    assert side.get(key, "web") is None
+    clock.now += SideArrays.DEFAULT_TTL + 1
+    assert side.get(key, "image") is None
+    assert side.stats()["categories"]["video"]["short"] == 1
+
+
+def test_missing_valkey_is_looked_up_once_per_interval(clock, monkeypatch):
+    calls = []
+    monkeypatch.setattr(fourget_cache, "valkey_client", lambda: calls.append(1))
+    store = SharedStore("t")
+    for _ in range(5):
+        store.set("k", 1, 10)
+        store.get("k")
+    assert len(calls) == 1
+    clock.now += SharedStore.VALKEY_RETRY
+    store.get("k")
+    assert len(calls) == 2
@@ -0,0 +1,41 @@
+from fourget_dedup import ResultIndex
+
+
+def test_duplicate_urls_merge_into_the_first_slot():
+    results = []
+    index = ResultIndex(results)
+    assert index.add({"url": "https://Example.com/page/", "title": "plain"})
+    assert index.add({"url": "https://other.com", "title": "other"})
+    # same page behind a different scheme case, trailing slash and fragment; richer, so it wins
+    assert not index.add({"url": "https://example.com/page#top", "title": "rich", "content": "text",
+                          "thumbnail": "https://example.com/t.jpg"})
+    assert [r["title"] for r in results] == ["rich", "other"]
+    assert results[0]["thumbnail"] == "https://example.com/t.jpg"
+    assert index.unique == 2 and index.duplicates == 1
+
+
+def test_poorer_duplicate_fills_in_missing_fields():
+    results = []
+    index = ResultIndex(results)
+    index.add({"url": "https://example.com", "title": "t", "content": "c", "author": "a"})
+    index.add({"url": "https://example.com", "title": "t", "publishedDate": "2024-01-01"})
+    assert len(results) == 1
+    assert results[0]["author"] == "a"
+    assert results[0]["publishedDate"] == "2024-01-01"
+
+
+def test_images_dedup_on_img_src_not_page_url():
+    results = []
+    index = ResultIndex(results)
+    index.add({"url": "https://site.com/gallery", "img_src": "https://cdn.com/1.jpg", "template": "images.html"})
+    index.add({"url": "https://site.com/gallery", "img_src": "https://cdn.com/2.jpg", "template": "images.html"})
+    index.add({"url": "https://other.com", "img_src": "https://cdn.com/1.jpg", "template": "images.html"})
+    assert [r["img_src"] for r in results] == ["https://cdn.com/1.jpg", "https://cdn.com/2.jpg"]
+
+
+def test_disabled_index_keeps_everything():
+    results = []
+    index = ResultIndex(results, enabled=False)
+    index.add({"url": "https://example.com"})
+    index.add({"url": "https://example.com"})
+    assert len(results) == 2
@@ -0,0 +1,41 @@
+import importlib.util
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_spec = importlib.util.spec_from_file_location("extractor", os.path.join(ROOT, "4get_capabilities_extractor.py"))
+extractor = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(extractor)
+
+# shaped like google's video(): views starts out null and is filled in for some results
+MIXED = '''<?php
+class google {
+    public function video($get) {
+        $out = ["status" => "ok", "video" => []];
+        foreach ($items as $item) {
+            $out["video"][] = [
+                "title" => $title,
+                "views" => null,
+                "author" => null,
+            ];
+            $last = count($out["video"]) - 1;
+            $out["video"][] = [
+                "title" => $title,
+                "views" => (int)$views,
+                "author" => null,
+            ];
+        }
+        return $out;
+    }
+}
+'''
+
+
+def test_field_set_anywhere_is_supported():
+    fields = extractor.analyze_content(MIXED)["outputs"]["video"]
+    assert fields["views"] is True
+    assert fields["title"] is True
+
+
+def test_field_only_ever_null_is_unsupported():
+    fields = extractor.analyze_content(MIXED)["outputs"]["video"]
+    assert fields["author"] is False
@@ -0,0 +1,53 @@
+import threading
+
+from fourget_flight import Singleflight
+
+
+def make(wait=0.2):
+    return Singleflight(enabled=True, wait=wait, use_valkey=False)
+
+
+def test_follower_gets_copy_of_leader_results():
+    sf = make(wait=1.0)
+    flight, leader = sf.join("k")
+    assert leader
+    follower, leads = sf.join("k")
+    assert follower is flight and not leads
+
+    results = [{"url": "https://example.com"}]
+    threading.Timer(0.02, sf.finish, (flight, results)).start()
+    got = sf.await_results(follower)
+    assert got == results and got is not results
+    assert sf.stats()["in_flight"] == 0
+
+
+def test_failed_leader_sends_followers_their_own_way():
+    sf = make()
+    flight, _ = sf.join("k")
+    sf.join("k")
+    sf.finish(flight, None)
+    assert sf.await_results(flight) is None
+    assert sf.fallbacks == 1
+
+
+def test_leader_that_never_lands_is_evicted_by_its_follower():
+    sf = make(wait=0.05)
+    flight, _ = sf.join("k")
+    follower, leads = sf.join("k")
+    assert not leads
+    assert sf.await_results(follower) is None
+    # the next identical request leads instead of queueing behind the dead flight
+    fresh, leads = sf.join("k")
+    assert leads and fresh is not flight
+
+
+def test_stale_flight_is_replaced_on_join():
+    sf = make(wait=3.0)
+    flight, _ = sf.join("k")
+    flight.started -= 10
+    fresh, leads = sf.join("k")
+    assert leads and fresh is not flight
+    assert sf.stats()["abandoned"] == 1
+    # the abandoned leader landing late must not retire the new flight
+    sf.finish(flight, [])
+    assert sf.join("k")[0] is fresh
@@ -0,0 +1,24 @@
+import pytest
+
+client = pytest.importorskip("fourget_hijacker_client")
+C = client.FourgetHijackerClient
+
+
+@pytest.fixture
+def google_spec(monkeypatch):
+    # google's real spec entry: views false although the scraper sets it for most videos
+    spec = {"outputs": {"video": {"title": True, "url": False, "views": False, "author": True, "duration": True}}}
+    monkeypatch.setattr(client, "engine_spec", lambda engine_id: spec)
+    C._PLANS.clear()
+    yield spec
+    C._PLANS.clear()
+
+
+def test_plan_prunes_types_but_keeps_fields(google_spec):
+    plan = C._compile_plan("google", "video")
+    assert "video" in plan and "news" not in plan
+    result = plan["video"]({"url": "https://example.com/v", "title": "t", "views": 1234, "author": "a",
+                            "duration": 61})
+    assert result is not None
+    assert result["views"] == "1234"
+    assert result["length"] == 61
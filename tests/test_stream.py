@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from fourget_stream import HarnessStreamParser, ResponseStats, StreamTruncated
+
+PAYLOAD = {
+    "status": "ok",
+    "npt": "token",
+    "web": [{"url": "https://example.com/1", "title": "One"}, {"url": "https://example.com/2", "title": "Zwei ü"}],
+    "image": [{"url": "https://example.com/a.jpg", "views": 300}],
+    "related": ["a", "b"],
+}
+BODY = json.dumps(PAYLOAD, ensure_ascii=False, indent=1).encode("utf-8")
+
+
+def chunked(body, size):
+    return [body[i:i + size] for i in range(0, len(body), size)]
+
+
+def events(chunks, **kwargs):
+    return list(HarnessStreamParser(chunks, **kwargs).events())
+
+
+def test_items_and_meta_in_body_order():
+    got = events([BODY])
+    assert got == [
+        ("meta", "status", "ok"),
+        ("meta", "npt", "token"),
+        ("item", "web", PAYLOAD["web"][0]),
+        ("item", "web", PAYLOAD["web"][1]),
+        ("item", "image", PAYLOAD["image"][0]),
+        ("meta", "related", ["a", "b"]),
+    ]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64])
+def test_chunk_boundaries_do_not_change_the_result(size):
+    # splits land inside strings, multi-byte characters and numbers ("300")
+    assert events(chunked(BODY, size)) == events([BODY])
+
+
+def test_empty_array_body_has_no_events():
+    assert events([b"[]"]) == []
+
+
+def test_truncated_body_raises():
+    with pytest.raises(StreamTruncated):
+        events(chunked(BODY[:len(BODY) // 2], 16))
+
+
+def test_byte_budget_stops_reading():
+    stats = ResponseStats()
+    parser = HarnessStreamParser(chunked(BODY, 8), byte_budget=40, stats=stats)
+    with pytest.raises(StreamTruncated):
+        list(parser.events())
+    assert stats.stop_reason == "bytes"
+    assert stats.bytes_read < len(BODY)